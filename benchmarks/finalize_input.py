@@ -0,0 +1,104 @@
+"""
+micro-benchmark of the parameter finalization of multistep stages
+
+Schedules the map stages of the mapreduce and cartesian_mapreduce testspecs
+and times finalize_input on the scattered parameter sets, compared to the
+previous implementation that deep-copied the parameters. Run from the
+repository root, with yadage installed or on the PYTHONPATH:
+
+    python benchmarks/finalize_input.py [size]
+"""
+
+import copy
+import sys
+import tempfile
+import timeit
+
+import yadage.workflow_loader
+from packtivity.statecontexts.posixfs_context import LocalFSState
+from yadage.controllers import YadageController
+from yadage.handlers.scheduler_handlers import (
+    finalize_input,
+    finalize_value,
+    get_parameters,
+    scatter,
+    select_parameter,
+)
+from yadage.state_providers.localposix import LocalFSProvider
+from yadage.utils import leaf_iterator_jsonlike
+from yadage.wflow import YadageWorkflow
+
+
+def deepcopy_finalize_input(jsondata, wflowview):
+    result = copy.deepcopy(jsondata)
+    inputs = []
+    for leaf_pointer, leaf_value in leaf_iterator_jsonlike(jsondata):
+        v = finalize_value(wflowview, leaf_value, inputs)
+        if leaf_pointer.path == "":
+            return v, inputs
+        leaf_pointer.set(result, v)
+    return result, inputs
+
+
+def scattered_parameters(specdir, initdata):
+    """
+    :return: the view of the map stage and its scattered parameter sets
+    """
+    data = yadage.workflow_loader.workflow("workflow.yml", specdir)
+    workdir = tempfile.mkdtemp()
+    provider = LocalFSProvider(LocalFSState([workdir]), ensure=True)
+    wflow = YadageWorkflow.createFromJSON(data, provider)
+    wflow.view().init(initdata)
+    wflow.view().rules[-1].apply(wflow)
+    YadageController(wflow).sync_backend()
+
+    rule = wflow.rules[0]
+    assert rule.applicable(wflow)
+    spec = rule.rule.stagespec
+    view = wflow.view(rule.offset)
+    parameters = {
+        k: select_parameter(view, v)
+        for k, v in get_parameters(spec["parameters"]).items()
+    }
+    return view, scatter(parameters, spec["scatter"])
+
+
+def bench(name, view, singlesteppars, number=3):
+    for pars in singlesteppars:
+        old, oldinputs = deepcopy_finalize_input(pars, view)
+        new, newinputs = finalize_input(pars, view)
+        assert old == new
+        assert [x.json() for x in oldinputs] == [x.json() for x in newinputs]
+
+    for label, func in [("deepcopy", deepcopy_finalize_input), ("new", finalize_input)]:
+        seconds = min(
+            timeit.repeat(
+                lambda: [func(pars, view) for pars in singlesteppars],
+                number=1,
+                repeat=number,
+            )
+        )
+        print(
+            "{:<24} {:<8} {:>6} steps {:>9.2f} ms".format(
+                name, label, len(singlesteppars), seconds * 1000
+            )
+        )
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    view, pars = scattered_parameters(
+        "tests/testspecs/mapreduce", {"input": list(range(size))}
+    )
+    bench("mapreduce", view, pars)
+
+    factor = int(size**0.5)
+    view, pars = scattered_parameters(
+        "tests/testspecs/cartesian_mapreduce",
+        {"factor_one": list(range(factor)), "factor_two": list(range(factor))},
+    )
+    bench("cartesian_mapreduce", view, pars)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+memory benchmark of the workflow nodes and their tasks
+
+Creates nodes the way a multistep stage does (shared spec and state, a
+small parameter set each) and reports the memory they take per 100k nodes,
+compared to the previous task implementation that kept its metadata in a
+plain dict. The packtivity parameter normalization is slow, so by default
+10k nodes are created and the result is scaled. Run from the repository
+root, with yadage installed or on the PYTHONPATH:
+
+    python benchmarks/task_memory.py [nnodes]
+"""
+
+import gc
+import sys
+import tempfile
+import tracemalloc
+
+from packtivity import datamodel
+from packtivity.statecontexts.posixfs_context import LocalFSState
+from yadage.tasks import packtivity_task
+from yadage.wflownode import YadageNode
+
+SPEC = {
+    "process": {"process_type": "string-interpolated-cmd", "cmd": "echo {input}"},
+    "environment": {"environment_type": "localproc-env"},
+    "publisher": {"publisher_type": "frompar-pub", "outputmap": {"out": "input"}},
+}
+
+
+class dict_task(object):
+    """
+    the previous task implementation, with a per-instance dict and free-form
+    metadata
+    """
+
+    def __init__(self, name, spec, state, parameters=None, inputs=None):
+        self.metadata = {"name": name}
+        self.inputs = inputs or []
+        self.parameters = datamodel.create(
+            parameters or {}, state.datamodel if state else None
+        )
+        self.spec = spec
+        self.state = state
+
+
+def make_nodes(taskclass, nnodes, state):
+    nodes = []
+    for i in range(nnodes):
+        task = taskclass("map", SPEC, state, {"input": i})
+        node = YadageNode("map", task, identifier="{:040x}".format(i))
+        task.metadata["wflow_node_id"] = node.identifier
+        task.metadata["wflow_offset"] = "".join(["sub", "flow"])
+        task.metadata["wflow_stage"] = "".join(["m", "ap"])
+        task.metadata["wflow_stage_node_idx"] = i
+        task.metadata["wflow_hints"] = {"is_purepub": False}
+        nodes.append(node)
+    return nodes
+
+
+def measure(taskclass, nnodes, state):
+    gc.collect()
+    tracemalloc.start()
+    nodes = make_nodes(taskclass, nnodes, state)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del nodes
+    return size
+
+
+def main():
+    nnodes = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    state = LocalFSState([tempfile.mkdtemp()])
+    for label, taskclass in [("dict", dict_task), ("slotted", packtivity_task)]:
+        size = measure(taskclass, nnodes, state)
+        print(
+            "{:<8} {:>8} nodes {:>9.1f} MB per 100k nodes".format(
+                label, nnodes, size * 100000.0 / nnodes / 2**20
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import pytest
 
+import copy
 import os
 import yadage.workflow_loader
 from packtivity.statecontexts.posixfs_context import LocalFSState
@@ -82,6 +83,17 @@ def cartesian_mapreduce(tmpdir, localfs_state_provider):
     return wflow
 
 
+@pytest.fixture()
+def windowed_cartesian_mapreduce(tmpdir, localfs_state_provider):
+    """a cartesian map-reduce workflow with at most two unfinished map steps"""
+    data = yadage.workflow_loader.workflow(
+        "workflow.yml", "tests/testspecs/cartesian_mapreduce"
+    )
+    data["stages"][0]["scheduler"]["window"] = 2
+    wflow = YadageWorkflow.createFromJSON(data, localfs_state_provider)
+    return wflow
+
+
 @pytest.fixture()
 def batched_zip_mapreduce(tmpdir, localfs_state_provider):
     """a workflow object with horizontally scalable map stage scheduling sub-workflows"""
@@ -118,6 +130,52 @@ def simple_mapreduce(tmpdir, localfs_state_provider):
     return wflow
 
 
+@pytest.fixture()
+def pipelined_mapreduce(tmpdir, localfs_state_provider):
+    """a map-reduce workflow with a second map stage pipelined after the first"""
+    data = yadage.workflow_loader.workflow("workflow.yml", "tests/testspecs/mapreduce")
+    mapstage, reducestage = data["stages"]
+    map2 = copy.deepcopy(mapstage)
+    map2["name"] = "map2"
+    map2["dependencies"]["expressions"] = ["map"]
+    map2["scheduler"]["pipeline"] = True
+    map2["scheduler"]["parameters"] = [
+        {
+            "key": "input",
+            "value": {
+                "expression_type": "stage-output-selector",
+                "stages": "map",
+                "output": "outputA",
+            },
+        }
+    ]
+    reducestage["dependencies"]["expressions"] = ["map2"]
+    reducestage["scheduler"]["parameters"][0]["value"]["stages"] = "map2"
+    data["stages"] = [mapstage, map2, reducestage]
+    wflow = YadageWorkflow.createFromJSON(data, localfs_state_provider)
+    return wflow
+
+
+@pytest.fixture()
+def treereduce_mapreduce(tmpdir, localfs_state_provider):
+    """a map-reduce workflow with the reduce stage as a tree reduction"""
+    data = yadage.workflow_loader.workflow("workflow.yml", "tests/testspecs/mapreduce")
+    reducestage = data["stages"][1]["scheduler"]
+    reducestage["scheduler_type"] = "treereduce-stage"
+    reducestage["reduce"] = {"parameter": "input", "fanin": 2, "output": "outputA"}
+    wflow = YadageWorkflow.createFromJSON(data, localfs_state_provider)
+    return wflow
+
+
+@pytest.fixture()
+def autobatch_mapreduce(tmpdir, localfs_state_provider):
+    """a map-reduce workflow with the map stage batched to steps of 10 seconds"""
+    data = yadage.workflow_loader.workflow("workflow.yml", "tests/testspecs/mapreduce")
+    data["stages"][0]["scheduler"]["autobatch"] = 10
+    wflow = YadageWorkflow.createFromJSON(data, localfs_state_provider)
+    return wflow
+
+
 @pytest.fixture()
 def singlestage_cases(tmpdir, localfs_state_provider):
     """a workflow object with horizontally scalable map stage scheduling sub-workflows"""
@@ -156,3 +214,11 @@ def checksum_cached_multiproc(tmpdir):
     backend = setupbackend_fromstring("multiproc:4")
     backend.enable_cache("checksums:" + cache)
     return backend
+
+
+@pytest.fixture()
+def store_cached_multiproc(tmpdir):
+    cache = str(tmpdir.join("cache"))
+    backend = setupbackend_fromstring("multiproc:4")
+    backend.enable_cache("store:" + cache)
+    return backend
@@ -1,7 +1,160 @@
+import gc
+import threading
+
+from adage import nodestate
+
 from yadage.utils import setupbackend_fromstring
+from yadage.backends.federatedbackend import FederatedBackend
 from yadage.backends.packtivitybackend import PacktivityBackend
+from yadage.backends.threadpoolbackend import ThreadPoolBackend
+from yadage.controllers import YadageController
 
 
 def test_mytest():
     backend = setupbackend_fromstring("multiproc:4")
     assert type(backend) == PacktivityBackend
+
+
+class BatchRecorder(object):
+    """packtivity backend wrapper that records batch submissions"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.batches = []
+
+    def batch_submit(self, specs, parameters, states, metadatas):
+        self.batches.append([m["wflow_stage"] for m in metadatas])
+        return [
+            self.backend.submit(*x) for x in zip(specs, parameters, states, metadatas)
+        ]
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+def run_batched(wflow, backend):
+    wflow.view().init({"input": [1, 2, 3]})
+    ctrl = YadageController(wflow, backend)
+    while not ctrl.finished():
+        ctrl.sync_backend()
+        ctrl.apply_rules(ctrl.applicable_rules())
+        ctrl.submit_nodes(list(ctrl.submittable_nodes()))
+    assert ctrl.successful()
+
+
+def test_batch_submit(nested_mapreduce_wflow):
+    recorder = BatchRecorder(
+        setupbackend_fromstring("foregroundasync").backends["packtivity"]
+    )
+    backend = PacktivityBackend(packtivity_backend=recorder, backendopts={})
+    run_batched(nested_mapreduce_wflow, backend)
+
+    # pure-publishing init steps are not sent to the packtivity backend
+    assert recorder.batches == [["stage1"] * 3, ["reduce"]]
+
+
+def test_batch_submit_cached(tmpdir, nested_mapreduce_wflow):
+    recorder = BatchRecorder(
+        setupbackend_fromstring("foregroundasync").backends["packtivity"]
+    )
+    backend = PacktivityBackend(packtivity_backend=recorder, backendopts={})
+    backend.enable_cache("checksums:" + str(tmpdir.join("cache.json")))
+    run_batched(nested_mapreduce_wflow, backend)
+    assert recorder.batches == [["stage1"] * 3, ["reduce"]]
+
+
+class StatusRecorder(BatchRecorder):
+    """packtivity backend wrapper with a bulk status API"""
+
+    def __init__(self, backend):
+        super(StatusRecorder, self).__init__(backend)
+        self.calls = []
+
+    def batch_ready(self, proxies):
+        self.calls.append(("ready", len(proxies)))
+        return [self.backend.ready(p) for p in proxies]
+
+    def batch_successful(self, proxies):
+        self.calls.append(("successful", len(proxies)))
+        return [self.backend.successful(p) for p in proxies]
+
+    def ready(self, proxy):
+        raise AssertionError("per-proxy status query")
+
+
+def test_batch_status(nested_mapreduce_wflow):
+    recorder = StatusRecorder(
+        setupbackend_fromstring("foregroundasync").backends["packtivity"]
+    )
+    backend = PacktivityBackend(packtivity_backend=recorder, backendopts={})
+    routed = []
+    routeproxy = backend.routeproxy
+    backend.routeproxy = lambda proxy: routed.append(proxy) or routeproxy(proxy)
+
+    wflow = nested_mapreduce_wflow
+    wflow.view().init({"input": [1, 2, 3]})
+    ctrl = YadageController(wflow, backend)
+    while not recorder.batches:
+        ctrl.sync_backend()
+        ctrl.apply_rules(ctrl.applicable_rules())
+        ctrl.submit_nodes(list(ctrl.submittable_nodes()))
+
+    del recorder.calls[:]
+    ctrl.sync_backend()
+    # only the stage1 steps are routed to the packtivity backend
+    assert recorder.calls == [("ready", 3), ("successful", 3)]
+    nrouted = len(routed)
+    ctrl.sync_backend()
+    assert len(routed) == nrouted == len(wflow.dag)
+    assert all(
+        wflow.dag.getNode(n).state == nodestate.SUCCESS for n in wflow.dag.nodes()
+    )
+
+
+def test_subscribe_multiproc(nested_mapreduce_wflow):
+    backend = setupbackend_fromstring("multiproc:2")
+    finished = threading.Event()
+    assert backend.subscribe(lambda *args: finished.set())
+
+    nested_mapreduce_wflow.view().init({"input": [1, 2, 3]})
+    ctrl = YadageController(nested_mapreduce_wflow, backend)
+    # run the pure-publishing steps until a step runs in the pool
+    for _ in range(10):
+        ctrl.sync_backend()
+        ctrl.apply_rules(ctrl.applicable_rules())
+        nodes = list(ctrl.submittable_nodes())
+        ctrl.submit_nodes(nodes)
+        if any(not n.task.is_purepub for n in nodes):
+            break
+    assert finished.wait(30)
+
+
+def test_subscribe_unsupported():
+    backend = setupbackend_fromstring("multiproc:2")
+    backend.backends["packtivity"] = object()
+    assert not backend.subscribe(lambda *args: None)
+
+
+def test_threadpool_backend_lock():
+    backend = setupbackend_fromstring("multiproc:2")
+    one, two = ThreadPoolBackend(backend), ThreadPoolBackend(backend)
+    assert one.lock is two.lock
+    assert (
+        ThreadPoolBackend(setupbackend_fromstring("multiproc:2")).lock is not one.lock
+    )
+
+
+def test_federated_routes_collected():
+    class Proxy(object):
+        pass
+
+    backend = FederatedBackend({"only": None})
+    backend.routeproxy = lambda proxy: ("only", proxy)
+    proxies = [Proxy() for _ in range(10)]
+    for proxy in proxies:
+        assert backend.route(proxy) == ("only", proxy)
+    assert len(backend.routes) == 10
+
+    del proxies, proxy
+    gc.collect()
+    assert len(backend.routes) == 0
@@ -1,7 +1,9 @@
+import json
 import os
 import pytest
 from yadage.utils import setupbackend_fromstring
 from yadage.steering_api import steering_ctx
+from yadage.backends.caching import ShardedCacheStore
 
 
 def test_cached(tmpdir, checksum_cached_multiproc):
@@ -40,6 +42,31 @@ def test_cached(tmpdir, checksum_cached_multiproc):
     run_workflow()
 
 
+def test_cached_runtimes(tmpdir, monkeypatch, checksum_cached_multiproc):
+    statsfile = str(tmpdir.join("runtimes.json"))
+    monkeypatch.setenv("YADAGE_RUNTIME_STATS", statsfile)
+    workdir = os.path.join(str(tmpdir), "workdir")
+
+    def run_workflow():
+        with steering_ctx(
+            "local:" + workdir,
+            "workflow.yml",
+            {"par": "value"},
+            "tests/testspecs/local-helloworld",
+            checksum_cached_multiproc,
+            accept_metadir=True,
+        ) as ys:
+            ys.adage_argument(default_trackers=False)
+
+    run_workflow()
+    checksum_cached_multiproc.backends["packtivity"].cache.todisk()
+    run_workflow()
+
+    # neither the init step nor the cached run of the step are recorded
+    stats = json.load(open(statsfile))
+    assert [x["elements"] for x in stats.values()] == [1]
+
+
 def test_cached_fromstring(tmpdir):
     workdir = os.path.join(str(tmpdir), "workdir")
 
@@ -70,3 +97,115 @@ def test_nonexisting_cache():
     with pytest.raises(RuntimeError):
         backend = setupbackend_fromstring("multiproc:4")
         backend.enable_cache("nonexistent:config")
+
+
+def test_store_cached(tmpdir, store_cached_multiproc):
+    workdir = os.path.join(str(tmpdir), "workdir")
+
+    def run_workflow():
+        with steering_ctx(
+            "local:" + workdir,
+            "workflow.yml",
+            {"par": "value"},
+            "tests/testspecs/local-helloworld",
+            store_cached_multiproc,
+            accept_metadir=True,
+        ) as ys:
+            ys.adage_argument(default_trackers=False)
+
+    run_workflow()
+    assert tmpdir.join("workdir/hello_world/hello_world.txt").check()
+    entries = tmpdir.join("cache").visit(
+        "*.json", rec=lambda d: d.basename != "_manifests"
+    )
+    assert len(list(entries)) == 1
+
+    # a fresh cache on the same directory finds the stored results
+    store_cached_multiproc.enable_cache("store:" + str(tmpdir.join("cache")))
+    store_cached_multiproc.backends["packtivity"].primary_enabled = False
+    run_workflow()
+    assert tmpdir.join("workdir/hello_world/hello_world.txt").check()
+
+
+def test_sharded_store(tmpdir):
+    directory = str(tmpdir.join("cache"))
+    store = ShardedCacheStore(directory)
+    store["abcdef"] = {"task": {}}
+    store["abcxyz"] = {"task": {}, "result": {"status": "SUCCESS"}}
+    store.flush()
+    assert tmpdir.join("cache/ab/abcxyz.json").check()
+    assert not tmpdir.join("cache/ab/abcdef.json").check()
+
+    other = ShardedCacheStore(directory)
+    assert "abcdef" not in other
+    assert other["abcxyz"] == {"task": {}, "result": {"status": "SUCCESS"}}
+    assert set(store) == {"abcdef", "abcxyz"}
+
+    del other["abcxyz"]
+    assert not tmpdir.join("cache/ab/abcxyz.json").check()
+
+    # results cached by another store are picked up for registered tasks
+    assert store.dirty == set()
+    other["abcdef"] = {"task": {}, "result": {"status": "FAILED"}}
+    other.flush()
+    assert store["abcdef"] == {"task": {}, "result": {"status": "FAILED"}}
+
+
+def test_incremental_state_hash(tmpdir, monkeypatch):
+    import checksumdir
+    import yadage.statehash
+    from packtivity.statecontexts.posixfs_context import LocalFSState
+
+    workdir = tmpdir.join("workdir")
+    for i in range(5):
+        f = workdir.join("sub{}".format(i % 2), "file{}.txt".format(i))
+        f.write("content {}".format(i), ensure=True)
+        f.setmtime(1000000000)
+    state = LocalFSState([str(workdir)])
+
+    hashed = []
+    original_file_hash = yadage.statehash.file_hash
+
+    def file_hash(path):
+        hashed.append(path)
+        return original_file_hash(path)
+
+    monkeypatch.setattr(yadage.statehash, "file_hash", file_hash)
+
+    manifestdir = str(tmpdir.join("manifests"))
+    hasher = yadage.statehash.StateHasher(manifestdir)
+    full = hasher.state_hash(state)
+    assert full == state.state_hash()
+    assert len(hashed) == 5
+    hasher.todisk()
+
+    # a fresh hasher re-hashes only the changed files
+    hashed[:] = []
+    hasher = yadage.statehash.StateHasher(manifestdir)
+    assert hasher.state_hash(state) == full
+    assert hashed == []
+
+    changed = workdir.join("sub0", "file2.txt")
+    changed.write("changed")
+    changed.setmtime(1000000001)
+    assert hasher.state_hash(state) == state.state_hash()
+    assert hashed == [str(changed)]
+    hasher.todisk()
+
+    # the manifests also serve the checksumdir reduction of older packtivity versions
+    hasher = yadage.statehash.StateHasher(manifestdir, method="checksumdir")
+    assert hasher.dirhash(str(workdir)) == checksumdir.dirhash(str(workdir), "sha1")
+    assert hashed == [str(changed)]
+
+
+def test_tree_hash_broken_link(tmpdir):
+    import dirhash
+    from yadage.statehash import StateHasher
+
+    workdir = tmpdir.join("workdir")
+    workdir.join("sub", "file.txt").write("content", ensure=True)
+    expected = dirhash.dirhash(str(workdir), "sha1")
+
+    workdir.join("sub", "broken").mksymlinkto(str(tmpdir.join("missing")))
+    assert dirhash.dirhash(str(workdir), "sha1") == expected
+    assert StateHasher(method="dirhash").dirhash(str(workdir)) == expected
@@ -1,4 +1,7 @@
-from yadage.controllers import PersistentController
+import pytest
+
+from yadage.controllers import PersistentController, YadageController
+from yadage.reset import reset_node_state
 from yadage.wflowstate import FileBackedModel
 from yadage.state_providers import load_provider
 
@@ -36,3 +39,109 @@ def test_persistent_controller(
 
     # assert pers_ctrl.adageobj.dag.getNode(pers_ctrl.submittable_nodes()[0]).task.state.json() == 11
     # pers_ctrl.submit_nodes(pers_ctrl.submittable_nodes())
+
+
+def test_persistent_controller_reuses_state(
+    tmpdir, local_helloworld_wflow_w_init, foregroundasync_backend
+):
+    filename = str(tmpdir.join("wflowstate"))
+    model = FileBackedModel(filename=filename, initmodel=local_helloworld_wflow_w_init)
+    pers_ctrl = PersistentController(model, foregroundasync_backend)
+
+    loads = []
+    load = model.load
+    model.load = lambda: loads.append(1) or load()
+
+    pers_ctrl.apply_rules(pers_ctrl.applicable_rules())
+    pers_ctrl.submit_nodes(pers_ctrl.submittable_nodes())
+    assert loads == []
+
+    other_ctrl = PersistentController(
+        FileBackedModel(filename=filename), foregroundasync_backend
+    )
+    other_ctrl.apply_rules(other_ctrl.applicable_rules())
+    pers_ctrl.sync_backend()
+    assert loads == [1]
+    assert len(pers_ctrl.submittable_nodes()) == 1
+
+    try:
+        with pers_ctrl.transaction():
+            raise RuntimeError("failed operation")
+    except RuntimeError:
+        pass
+    pers_ctrl.sync_backend()
+    assert loads == [1, 1]
+
+
+def test_persistent_controller_batch(
+    tmpdir, local_helloworld_wflow_w_init, foregroundasync_backend
+):
+    model = FileBackedModel(
+        filename=str(tmpdir.join("wflowstate")), initmodel=local_helloworld_wflow_w_init
+    )
+    pers_ctrl = PersistentController(model, foregroundasync_backend)
+
+    commits = []
+    commit = model.commit
+    model.commit = lambda data: commits.append(1) or commit(data)
+
+    with pers_ctrl.batch():
+        pers_ctrl.apply_rules(pers_ctrl.applicable_rules())
+        pers_ctrl.submit_nodes(pers_ctrl.submittable_nodes())
+        pers_ctrl.sync_backend()
+        pers_ctrl.apply_rules(pers_ctrl.applicable_rules())
+        assert commits == []
+    assert commits == [1]
+
+    pers_ctrl = PersistentController(
+        FileBackedModel(filename=str(tmpdir.join("wflowstate"))),
+        foregroundasync_backend,
+    )
+    assert len(pers_ctrl.adageobj.applied_rules) == 2
+    assert len(pers_ctrl.submittable_nodes()) == 1
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_prepublish_cached(nested_mapreduce_wflow, foregroundasync_backend, workers):
+    wflow = nested_mapreduce_wflow
+    wflow.view().init({"input": [1, 2, 3]})
+    ctrl = YadageController(wflow, foregroundasync_backend, prepublish_workers=workers)
+
+    prepublished = []
+    prepublish = ctrl.prepublishing_backend.prepublish
+
+    def counting_prepublish(spec, parameters, state):
+        prepublished.append(1)
+        return prepublish(spec, parameters, state)
+
+    ctrl.prepublishing_backend.prepublish = counting_prepublish
+
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.sync_backend()
+    assert len(prepublished) == len(wflow.dag) == 1
+    ctrl.sync_backend()
+    assert len(prepublished) == 1
+
+    ctrl.submit_nodes(list(ctrl.submittable_nodes()))
+    ctrl.sync_backend()
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.sync_backend()
+    assert len(prepublished) == len(wflow.dag) == 4
+
+    # nodes holding an expected result are not re-hashed on sync
+    keys = []
+    prepublish_key = ctrl.prepublish_key
+    ctrl.prepublish_key = lambda node: keys.append(node) or prepublish_key(node)
+    ctrl.sync_backend()
+    assert keys == []
+
+    node = wflow.dag.getNode(list(wflow.dag.nodes())[-1])
+    expected = node.expected_result
+    reset_node_state(node)
+    assert node.expected_result is None
+    ctrl.sync_backend()
+    assert len(prepublished) == 4
+    assert node.expected_result == expected
+    assert keys == [node]
@@ -1,4 +1,7 @@
+import json
+
 import pytest
+import yadageschemas.dialects
 import yadage.workflow_loader
 import jsonschema.exceptions
 
@@ -17,3 +20,48 @@ def test_load_failt():
 def test_validate_fail():
     with pytest.raises(jsonschema.exceptions.ValidationError):
         yadage.workflow_loader.validate({})
+
+
+def test_load_streaming_schedulers():
+    data = yadage.workflow_loader.workflow(
+        "workflow.yml", "tests/testspecs/streaming_mapreduce"
+    )
+    mapstage, map2, reducestage = [x["scheduler"] for x in data["stages"]]
+    assert mapstage["window"] == 2
+    assert mapstage["autobatch"] == 10
+    assert map2["pipeline"] is True
+    assert reducestage["reduce"]["fanin"] == 2
+    assert reducestage["parameters"][0]["key"] == "input"
+    assert (
+        reducestage["parameters"][0]["value"]["expression_type"]
+        == "stage-output-selector"
+    )
+    yadage.workflow_loader.validate(data)
+
+
+def test_validate_streaming_fail():
+    data = yadage.workflow_loader.workflow(
+        "workflow.yml", "tests/testspecs/streaming_mapreduce"
+    )
+    data["stages"][2]["scheduler"]["reduce"]["fanin"] = 1
+    with pytest.raises(jsonschema.exceptions.ValidationError):
+        yadage.workflow_loader.validate(data)
+
+
+def test_load_without_defaults(monkeypatch):
+    from yadageschemas.dialects.raw_with_defaults import loader
+    from yadageschemas.utils import WithJsonRefEncoder
+
+    def raw_dialect(spec, specopts):
+        return loader(specopts["toplevel"])(spec, specopts["load_as_ref"])
+
+    monkeypatch.setitem(yadageschemas.dialects.handlers, "raw", raw_dialect)
+    toplevel = "tests/testspecs/streaming_mapreduce"
+    raw = json.loads(
+        json.dumps(
+            raw_dialect("workflow.yml", {"toplevel": toplevel, "load_as_ref": False}),
+            cls=WithJsonRefEncoder,
+        )
+    )
+    data = yadage.workflow_loader.workflow("raw:workflow.yml", toplevel, validate=False)
+    assert data == raw
@@ -62,3 +62,46 @@ def test_repr(basic_packtivity_spec, localfs_state):
     )
     node = YadageNode("myname", step, "identiifer")
     assert repr(node)
+
+
+def test_task_metadata(basic_packtivity_spec, localfs_state):
+    step = packtivity_task("myname", basic_packtivity_spec, localfs_state)
+    assert not hasattr(step, "__dict__")
+    assert dict(step.metadata) == {"name": "myname"}
+
+    step.metadata["wflow_offset"] = "sub"
+    step.metadata["wflow_stage"] = "map"
+    step.metadata["wflow_stage_node_idx"] = 0
+    step.metadata["wflow_hints"] = {"is_purepub": True}
+    step.metadata["custom"] = {"key": "value"}
+    assert step.offset == "sub"
+    assert step.stage_node_idx == 0
+    assert step.is_purepub
+    assert step.metadata["wflow_hints"] == {"is_purepub": True}
+    assert step.metadata.get("wflow_node_id", "-") == "-"
+
+    del step.metadata["wflow_offset"]
+    assert "wflow_offset" not in step.metadata
+    assert step.metadata == {
+        "name": "myname",
+        "wflow_stage": "map",
+        "wflow_stage_node_idx": 0,
+        "wflow_hints": {"is_purepub": True},
+        "custom": {"key": "value"},
+    }
+
+    loaded = packtivity_task.fromJSON(step.json())
+    assert loaded.json() == step.json()
+    assert loaded.stage == "map"
+
+
+def test_task_hints_in_place(basic_packtivity_spec, localfs_state):
+    step = packtivity_task("myname", basic_packtivity_spec, localfs_state)
+    step.is_purepub = False
+    step.metadata["wflow_hints"]["backend"] = "special"
+    step.metadata["wflow_hints"]["is_purepub"] = True
+    assert step.is_purepub
+    assert step.metadata["wflow_hints"] == {"is_purepub": True, "backend": "special"}
+
+    loaded = packtivity_task.fromJSON(step.json())
+    assert loaded.metadata["wflow_hints"] == step.metadata["wflow_hints"]
@@ -0,0 +1,59 @@
+import networkx as nx
+from adage import nodestate
+
+from yadage.controllers import YadageController
+
+
+def brute_force_ready(dag):
+    ready = []
+    for n in nx.topological_sort(dag):
+        if dag.getNode(n).submit_time:
+            continue
+        upstream = [dag.getNode(x) for x in dag.predecessors(n)]
+        if all(x.submit_time and x.state == nodestate.SUCCESS for x in upstream):
+            ready.append(n)
+    return ready
+
+
+def test_matches_full_scan(nested_mapreduce_wflow, foregroundasync_backend):
+    wflow = nested_mapreduce_wflow
+    wflow.view().init({"input": [1, 2, 3]})
+    ctrl = YadageController(wflow, foregroundasync_backend)
+
+    while not ctrl.finished():
+        ctrl.sync_backend()
+        ready = [n.identifier for n in ctrl.submittable_nodes()]
+        assert sorted(ready) == sorted(brute_force_ready(wflow.dag))
+        ctrl.apply_rules(ctrl.applicable_rules())
+        ctrl.submit_nodes(list(ctrl.submittable_nodes())[:1])
+    assert ctrl.successful()
+    assert not wflow.ready_queue.queue
+    assert not wflow.ready_queue.running
+
+
+def test_only_running_nodes_polled(
+    monkeypatch, nested_mapreduce_wflow, foregroundasync_backend
+):
+    wflow = nested_mapreduce_wflow
+    wflow.view().init({"input": [1, 2, 3]})
+    ctrl = YadageController(wflow, foregroundasync_backend)
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.submit_nodes(list(ctrl.submittable_nodes()))
+    ctrl.sync_backend()
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.apply_rules(ctrl.applicable_rules())
+    assert len(list(ctrl.submittable_nodes())) == 3
+
+    polled = []
+    nodeStatus = wflow.dag.nodeStatus
+
+    def counting_status(ident):
+        polled.append(ident)
+        return nodeStatus(ident)
+
+    monkeypatch.setattr(wflow.dag, "nodeStatus", counting_status)
+    nodes = list(ctrl.submittable_nodes())
+    ctrl.submit_nodes(nodes[:1])
+    del polled[:]
+    assert len(list(ctrl.submittable_nodes())) == 2
+    assert sorted(polled) == sorted([n.identifier for n in nodes])
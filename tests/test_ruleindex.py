@@ -0,0 +1,59 @@
+from yadage.controllers import YadageController
+from yadage.stages import OffsetStage
+
+
+def test_unchanged_rules_skipped(
+    monkeypatch, nested_mapreduce_wflow, foregroundasync_backend
+):
+    wflow = nested_mapreduce_wflow
+    wflow.view().init({"input": [1, 2, 3]})
+    ctrl = YadageController(wflow, foregroundasync_backend)
+
+    evaluated = []
+    applicable = OffsetStage.applicable
+
+    def counting_applicable(rule, adageobj):
+        evaluated.append(rule.rule.name)
+        return applicable(rule, adageobj)
+
+    monkeypatch.setattr(OffsetStage, "applicable", counting_applicable)
+
+    assert [r.rule.name for r in ctrl.applicable_rules()] == ["init"]
+    assert sorted(evaluated) == ["init", "map", "reduce"]
+
+    del evaluated[:]
+    assert [r.rule.name for r in ctrl.applicable_rules()] == ["init"]
+    assert evaluated == ["init"]
+
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.submit_nodes(list(ctrl.submittable_nodes()))
+    ctrl.sync_backend()
+    del evaluated[:]
+    assert [r.rule.name for r in ctrl.applicable_rules()] == ["map"]
+    assert sorted(evaluated) == ["map", "reduce"]
+
+    ctrl.apply_rules(ctrl.applicable_rules())
+    del evaluated[:]
+    assert [r.rule.name for r in ctrl.applicable_rules()] == ["init"] * 3
+    assert "reduce" in evaluated
+
+    # rules within one of the map sub-workflows do not see the others
+    ctrl.apply_rules(ctrl.applicable_rules()[:1])
+    del evaluated[:]
+    ctrl.applicable_rules()
+    assert sorted(evaluated) == ["init", "init", "reduce", "stage1"]
+
+
+def test_index_matches_full_evaluation(nested_mapreduce_wflow, foregroundasync_backend):
+    wflow = nested_mapreduce_wflow
+    wflow.view().init({"input": [1, 2, 3]})
+    ctrl = YadageController(wflow, foregroundasync_backend)
+
+    while not ctrl.finished():
+        ctrl.sync_backend()
+        rules = ctrl.applicable_rules()
+        assert rules == [r for r in wflow.rules if r.applicable(wflow)]
+        ctrl.apply_rules(rules)
+        ctrl.submit_nodes(list(ctrl.submittable_nodes())[:1])
+    assert ctrl.successful()
+    assert not wflow.rules
@@ -1,6 +1,14 @@
+import json
+
+import jsonpointer
 import yadage.workflow_loader
 from yadage.wflow import YadageWorkflow
 from yadage.controllers import frommodel_controller
+from yadage.reset import undo_rules
+from yadage.runtimestats import RuntimeStats, runtime_stats
+import yadage.handlers.scheduler_handlers as scheduler_handlers
+from yadage.handlers.scheduler_handlers import finalize_input
+from yadage.utils import jq_compile, outputReference
 
 
 def test_singlestepstage_schedule_steps(local_helloworld_wflow):
@@ -174,6 +182,22 @@ def test_jq_stage(jqworkflow):
     assert len(wflow.dag.nodes()) == 1 + len(inputdata)
 
 
+def test_jq_programs_compiled_once(jqworkflow):
+    wflow = jqworkflow
+    inputdata = [1, 2, 3]
+    wflow.view().init({"parone": inputdata})
+    wflow.view().rules[-1].apply(wflow)
+    c = frommodel_controller("", {}, wflow)
+    c.sync_backend()
+
+    jq_compile.cache_clear()
+    wflow.rules[0].apply(wflow)
+    info = jq_compile.cache_info()
+    assert info.misses == info.currsize
+    # the postscript and the reference resolution run for each step
+    assert info.hits >= 2 * (len(inputdata) - 1)
+
+
 def test_jqnodestruct_stage(jqnodestruct):
     wflow = jqnodestruct
 
@@ -253,6 +277,24 @@ def test_multistepstage_zip_schedule_steps(simple_mapreduce):
     assert len(wflow.dag.nodes()) == 1 + len(inputdata)
 
 
+def test_finalize_input(simple_mapreduce):
+    wflow = simple_mapreduce
+    wflow.view().init({"input": [1, 2, 3]})
+    wflow.view().rules[-1].apply(wflow)
+    c = frommodel_controller("", {}, wflow)
+    c.sync_backend()
+
+    initid = wflow.stepsbystage["init"][0]["_nodeid"]
+    reference = outputReference(initid, jsonpointer.JsonPointer("/input/1"))
+    pars = {"const": {"a": [1, 2]}, "ref": [reference, 3]}
+    finalized, inputs = finalize_input(pars, wflow.view())
+    assert finalized == {"const": {"a": [1, 2]}, "ref": [2, 3]}
+    assert [x.json() for x in inputs] == [reference.json()]
+    # only the containers holding references are copied
+    assert finalized["const"] is pars["const"]
+    assert pars["ref"][0] is reference
+
+
 def test_multistepstage_cartesian_schedule_steps(cartesian_mapreduce):
     wflow = cartesian_mapreduce
 
@@ -271,3 +313,297 @@ def test_multistepstage_cartesian_schedule_steps(cartesian_mapreduce):
     assert wflow.rules[0].rule.stagespec["scheduler_type"] == "multistep-stage"
     wflow.rules[0].apply(wflow)
     assert len(wflow.dag.nodes()) == 1 + len(factor_one) * len(factor_two)
+
+
+def streaming_controller(wflow, backend):
+    """controller that runs the scheduled steps only when submitted explicitly"""
+    return frommodel_controller("", {"backend": backend, "disable_prepub": True}, wflow)
+
+
+def extend(c):
+    """applies rules until no more are applicable"""
+    c.sync_backend()
+    while c.applicable_rules():
+        c.apply_rules(c.applicable_rules())
+
+
+def stage_nodes(wflow, stage):
+    """the nodes of a stage by index, None for reserved steps"""
+    return [
+        wflow.dag.getNode(x["_nodeid"]) if "_nodeid" in x else None
+        for x in wflow.stepsbystage[stage]
+    ]
+
+
+def scheduled_nodes(wflow, stage):
+    """the scheduled nodes of a stage"""
+    return [n for n in stage_nodes(wflow, stage) if n is not None]
+
+
+def test_multistepstage_pipelined(pipelined_mapreduce, foregroundasync_backend):
+    wflow = pipelined_mapreduce
+    c = streaming_controller(wflow, foregroundasync_backend)
+    wflow.view().init({"input": [1, 2, 3]})
+
+    extend(c)
+    c.submit_nodes(list(c.submittable_nodes()))  # init
+    extend(c)
+    assert [n.name for n in stage_nodes(wflow, "map")] == ["map_0", "map_1", "map_2"]
+    assert stage_nodes(wflow, "map2") == [None, None, None]
+
+    # the second element goes downstream before the others are done
+    c.submit_nodes([stage_nodes(wflow, "map")[1]])
+    extend(c)
+    map2 = stage_nodes(wflow, "map2")
+    assert [n and n.name for n in map2] == [None, "map2_1", None]
+    assert list(wflow.dag.predecessors(map2[1].identifier)) == [
+        stage_nodes(wflow, "map")[1].identifier
+    ]
+    assert "reduce" not in wflow.stepsbystage
+
+    while not c.finished():
+        c.submit_nodes(list(c.submittable_nodes()))
+        extend(c)
+    assert c.successful()
+    assert [n.name for n in stage_nodes(wflow, "map2")] == [
+        "map2_0",
+        "map2_1",
+        "map2_2",
+    ]
+    assert [
+        n.task.metadata["wflow_stage_node_idx"] for n in stage_nodes(wflow, "map2")
+    ] == [0, 1, 2]
+    assert stage_nodes(wflow, "reduce")[0].task.parameters["input"] == ["output"] * 3
+
+
+def test_treereduce_stage(treereduce_mapreduce, foregroundasync_backend):
+    wflow = treereduce_mapreduce
+    c = streaming_controller(wflow, foregroundasync_backend)
+    wflow.view().init({"input": [1, 2, 3, 4, 5]})
+
+    extend(c)
+    c.submit_nodes(list(c.submittable_nodes()))  # init
+    extend(c)
+    assert len(stage_nodes(wflow, "reduce_partials")) == 3 + 2
+    assert stage_nodes(wflow, "reduce") == [None]
+
+    # the first group is merged while the other map steps are pending
+    c.submit_nodes(stage_nodes(wflow, "map")[:2])
+    extend(c)
+    partials = stage_nodes(wflow, "reduce_partials")
+    assert [n and n.name for n in partials] == ["reduce_partials_0_0"] + [None] * 4
+    assert set(wflow.dag.predecessors(partials[0].identifier)) == set(
+        n.identifier for n in stage_nodes(wflow, "map")[:2]
+    )
+
+    while not c.finished():
+        c.submit_nodes(list(c.submittable_nodes()))
+        extend(c)
+    assert c.successful()
+    partials = stage_nodes(wflow, "reduce_partials")
+    assert [n.name for n in partials] == [
+        "reduce_partials_0_0",
+        "reduce_partials_0_1",
+        "reduce_partials_0_2",
+        "reduce_partials_1_0",
+        "reduce_partials_1_1",
+    ]
+    final = stage_nodes(wflow, "reduce")[0]
+    assert final.name == "reduce"
+    assert final.task.parameters["input"] == ["output"] * 2
+    assert set(wflow.dag.predecessors(final.identifier)) == set(
+        n.identifier for n in partials[3:]
+    )
+    assert len(partials[2].task.parameters["input"]) == 1
+
+
+def test_scatter_element():
+    parameters = {"a": [1, 2, 3], "b": [4, 5], "c": 6}
+    for method in ["zip", "cartesian"]:
+        scatter = {"method": method, "parameters": ["a", "b"]}
+        for batchsize in [None, 2]:
+            expected = scheduler_handlers.scatter(parameters, scatter, batchsize)
+            commonpars, factors = scheduler_handlers.scatter_factors(
+                parameters, scatter, batchsize
+            )
+            assert scheduler_handlers.scatter_length(factors, scatter) == len(expected)
+            assert [
+                scheduler_handlers.scatter_element(commonpars, factors, scatter, i)
+                for i in range(len(expected))
+            ] == expected
+
+
+def test_multistepstage_windowed(
+    monkeypatch, windowed_cartesian_mapreduce, foregroundasync_backend
+):
+    selected = []
+    scatter_factors = scheduler_handlers.scatter_factors
+    monkeypatch.setattr(
+        scheduler_handlers,
+        "scatter_factors",
+        lambda *args: selected.append(args) or scatter_factors(*args),
+    )
+    wflow = windowed_cartesian_mapreduce
+    c = streaming_controller(wflow, foregroundasync_backend)
+    wflow.view().init({"factor_one": [1, 2, 3], "factor_two": [4, 5]})
+
+    extend(c)
+    c.submit_nodes(list(c.submittable_nodes()))  # init
+    extend(c)
+    assert [n.name for n in scheduled_nodes(wflow, "map")] == ["map_0", "map_1"]
+
+    c.submit_nodes(scheduled_nodes(wflow, "map")[:1])
+    extend(c)
+    assert [n.name for n in scheduled_nodes(wflow, "map")] == [
+        "map_0",
+        "map_1",
+        "map_2",
+    ]
+    assert "reduce" not in wflow.stepsbystage
+
+    while not c.finished():
+        unfinished = [n for n in scheduled_nodes(wflow, "map") if not n.has_result()]
+        assert len(unfinished) <= 2
+        c.submit_nodes(list(c.submittable_nodes()))
+        extend(c)
+    assert c.successful()
+    assert [n.name for n in scheduled_nodes(wflow, "map")] == [
+        "map_{}".format(i) for i in range(6)
+    ]
+    assert [
+        (n.task.parameters["input"], n.task.parameters["avalue"])
+        for n in scheduled_nodes(wflow, "map")
+    ] == [(1, 4), (1, 5), (2, 4), (2, 5), (3, 4), (3, 5)]
+    assert len(scheduled_nodes(wflow, "reduce")[0].task.parameters["input"]) == 6
+    # the continuations reuse the parameters selected on the first application
+    assert len(selected) == 1
+
+
+def test_undo_windowed_stage(windowed_cartesian_mapreduce, foregroundasync_backend):
+    wflow = windowed_cartesian_mapreduce
+    c = streaming_controller(wflow, foregroundasync_backend)
+    wflow.view().init({"factor_one": [1, 2, 3], "factor_two": [4, 5]})
+
+    extend(c)
+    c.submit_nodes(list(c.submittable_nodes()))  # init
+    extend(c)
+    c.submit_nodes(scheduled_nodes(wflow, "map")[:1])
+    extend(c)
+    assert len(scheduled_nodes(wflow, "map")) == 3
+
+    # undoing any rule of the stage undoes all its continuations
+    applied = [r for r in wflow.applied_rules if r.rule.name == "map"]
+    assert len(applied) == 2
+    undo_rules(wflow, [applied[-1].identifier])
+    assert [r.rule.name for r in wflow.applied_rules] == ["init"]
+    maprules = [r for r in wflow.rules if r.rule.name == "map"]
+    assert [r.identifier for r in maprules] == [applied[0].identifier]
+    assert "_window" not in maprules[0].rule.stagespec
+    assert "map" not in wflow.stepsbystage
+    assert len(wflow.dag.nodes()) == 1
+
+    extend(c)
+    assert [n.name for n in scheduled_nodes(wflow, "map")] == ["map_0", "map_1"]
+    while not c.finished():
+        c.submit_nodes(list(c.submittable_nodes()))
+        extend(c)
+    assert c.successful()
+    assert len(scheduled_nodes(wflow, "map")) == 6
+
+
+def test_undo_pipelined_stage(pipelined_mapreduce, foregroundasync_backend):
+    wflow = pipelined_mapreduce
+    c = streaming_controller(wflow, foregroundasync_backend)
+    wflow.view().init({"input": [1, 2, 3]})
+
+    extend(c)
+    c.submit_nodes(list(c.submittable_nodes()))  # init
+    extend(c)
+    c.submit_nodes([stage_nodes(wflow, "map")[1]])
+    extend(c)
+    assert [n and n.name for n in stage_nodes(wflow, "map2")] == [None, "map2_1", None]
+
+    # undoing the upstream stage undoes the pipelined one
+    undo_rules(wflow, [wflow.view().getRule(name="map").identifier])
+    assert [r.rule.name for r in wflow.applied_rules] == ["init"]
+    assert [r.rule.name for r in wflow.rules].count("map2") == 1
+    assert len(wflow.dag.nodes()) == 1
+
+    while not c.finished():
+        c.submit_nodes(list(c.submittable_nodes()))
+        extend(c)
+    assert c.successful()
+
+    # the applied pipelined stage stays applied when a downstream stage is undone
+    undo_rules(wflow, [wflow.view().getRule(name="reduce").identifier])
+    assert "map2" in [r.rule.name for r in wflow.applied_rules]
+    assert "reduce" not in wflow.stepsbystage
+    assert len(scheduled_nodes(wflow, "map2")) == 3
+
+
+def test_undo_treereduce_stage(treereduce_mapreduce, foregroundasync_backend):
+    wflow = treereduce_mapreduce
+    c = streaming_controller(wflow, foregroundasync_backend)
+    wflow.view().init({"input": [1, 2, 3, 4, 5]})
+
+    extend(c)
+    c.submit_nodes(list(c.submittable_nodes()))  # init
+    extend(c)
+    c.submit_nodes(stage_nodes(wflow, "map")[:2])
+    extend(c)
+    assert len(scheduled_nodes(wflow, "reduce_partials")) == 1
+
+    undo_rules(wflow, [wflow.view().getRule(name="reduce").identifier])
+    assert [r.rule.name for r in wflow.applied_rules] == ["init", "map"]
+    assert [r.rule.name for r in wflow.rules] == ["reduce"]
+    assert "reduce_partials" not in wflow.stepsbystage
+    assert "reduce" not in wflow.stepsbystage
+    assert len(wflow.dag.nodes()) == 1 + 5
+
+    while not c.finished():
+        c.submit_nodes(list(c.submittable_nodes()))
+        extend(c)
+    assert c.successful()
+
+    # the partial merges are undone along with the final one
+    undo_rules(wflow, [wflow.view().getRule(name="map").identifier])
+    assert [r.rule.name for r in wflow.applied_rules] == ["init"]
+    assert len(wflow.dag.nodes()) == 1
+
+
+def test_multistepstage_autobatch(
+    tmpdir, monkeypatch, autobatch_mapreduce, foregroundasync_backend
+):
+    statsfile = str(tmpdir.join("runtimes.json"))
+    monkeypatch.setenv("YADAGE_RUNTIME_STATS", statsfile)
+    wflow = autobatch_mapreduce
+    step = wflow.rules[0].rule.stagespec["step"]
+    runtime_stats().record(step, 5.0)
+
+    c = frommodel_controller("", {"backend": foregroundasync_backend}, wflow)
+    wflow.view().init({"input": [1, 2, 3, 4, 5]})
+    while not c.finished():
+        c.sync_backend()
+        c.apply_rules(c.applicable_rules())
+        c.submit_nodes(list(c.submittable_nodes()))
+    assert c.successful()
+
+    mapnodes = [wflow.dag.getNode(x["_nodeid"]) for x in wflow.stepsbystage["map"]]
+    assert [n.task.parameters["input"] for n in mapnodes] == [[1, 2], [3, 4], [5]]
+    assert [n.task.metadata["wflow_elements"] for n in mapnodes] == [2, 2, 1]
+
+    # the map and reduce steps run the same spec
+    stats = json.load(open(statsfile))
+    assert list(stats.values())[0]["elements"] == 1 + 5 + 1
+
+
+def test_runtime_stats_file(tmpdir):
+    statsfile = tmpdir.join("runtimes.json")
+    statsfile.write('{"abc": {"elements": 1, "runti')
+    stats = RuntimeStats(str(statsfile))
+    assert stats.stats == {}
+
+    stats.record({"process": None}, 2.0, 2)
+    stats.todisk()
+    assert RuntimeStats(str(statsfile)).estimate({"process": None}) == 1.0
+    assert tmpdir.listdir() == [statsfile]
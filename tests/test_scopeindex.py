@@ -0,0 +1,60 @@
+import jsonpointer
+
+from yadage.controllers import YadageController
+
+
+def brute_force_done(wflow, offset):
+    applied = [r.identifier for r in wflow.applied_rules]
+
+    def walk(bookkeeping):
+        for k, v in bookkeeping.items():
+            if k == "_meta":
+                if not all(x in applied for x in v["stages"]):
+                    return False
+                if not all(wflow.dag.getNode(x).has_result() for x in v["steps"]):
+                    return False
+            elif not walk(v):
+                return False
+        return True
+
+    return walk(jsonpointer.JsonPointer(offset).resolve(wflow.bookkeeping))
+
+
+def all_scopes(bookkeeping, offset=""):
+    yield offset
+    for k, v in bookkeeping.items():
+        if k != "_meta":
+            for x in all_scopes(v, offset + "/{}".format(k)):
+                yield x
+
+
+def test_matches_full_walk(nested_mapreduce_wflow, foregroundasync_backend):
+    wflow = nested_mapreduce_wflow
+    wflow.view().init({"input": [1, 2, 3]})
+    ctrl = YadageController(wflow, foregroundasync_backend)
+
+    while not ctrl.finished():
+        ctrl.sync_backend()
+        for offset in all_scopes(wflow.bookkeeping):
+            assert wflow.scope_index.done(offset) == brute_force_done(wflow, offset)
+        ctrl.apply_rules(ctrl.applicable_rules())
+        ctrl.submit_nodes(list(ctrl.submittable_nodes())[:1])
+    assert ctrl.successful()
+    assert wflow.scope_index.done("")
+
+
+def test_reopen_on_new_rule(nested_mapreduce_wflow, foregroundasync_backend):
+    wflow = nested_mapreduce_wflow
+    wflow.view().init({"input": [1, 2, 3]})
+    ctrl = YadageController(wflow, foregroundasync_backend)
+
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.submit_nodes(list(ctrl.submittable_nodes()))
+    ctrl.sync_backend()
+    assert wflow.scope_index.done("/init")
+
+    # the map stage adds sub-workflows with pending rules of their own
+    ctrl.apply_rules(ctrl.applicable_rules())
+    assert not wflow.scope_index.done("/map")
+    assert not wflow.scope_index.done("")
+    assert wflow.scope_index.done("/init")
@@ -1,3 +1,4 @@
+import yadage.utils
 import yadage.workflow_loader
 from yadage.wflow import YadageWorkflow
 from yadage.stages import JsonStage
@@ -47,3 +48,22 @@ def test_serialize_deserialize():
         JsonStage.fromJSON(wflow.rules[0].rule.json()).json()
         == wflow.rules[0].rule.json()
     )
+
+
+def test_queries_compiled_on_construction():
+    data = yadage.workflow_loader.workflow(
+        "workflow.yml", "tests/testspecs/nestedmapreduce"
+    )
+    yadage.utils.jsonpath_parse.cache_clear()
+    stages = {
+        s["name"]: JsonStage(
+            s, LocalFSProvider(LocalFSState(["/workdir"]), ensure=False)
+        )
+        for s in data["stages"]
+    }
+    compiled = yadage.utils.jsonpath_parse.cache_info().currsize
+    assert compiled == len({"init", "map", "map.[*].stage1"})
+
+    JsonStage.fromJSON(stages["reduce"].json())
+    assert yadage.utils.jsonpath_parse.cache_info().currsize == compiled
+    assert yadage.utils.jsonpath_parse.cache_info().misses == compiled
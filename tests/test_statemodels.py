@@ -1,7 +1,15 @@
 import json
+import pytest
 from click.testing import CliRunner
 from yadage.controllers import setup_controller, PersistentController
-from yadage.wflowstate import load_model_fromstring, FileBackedModel
+from adage import nodestate
+from yadage.wflowstate import (
+    load_model_fromstring,
+    FileBackedModel,
+    JournaledModel,
+    MongoBackedModel,
+    SQLiteBackedModel,
+)
 from yadage.wflow import YadageWorkflow
 from yadage.controllers import YadageController
 
@@ -34,3 +42,264 @@ def test_from_pythonctrl(tmpdir, local_helloworld_wflow):
     )
     assert type(ctrl) == PersistentController
     assert ctrl.model is not None
+
+
+def test_setup_journaled(tmpdir, local_helloworld_wflow):
+    thefile = tmpdir.join("state.json")
+    model = load_model_fromstring(
+        "journaled:" + str(thefile), initmodel=local_helloworld_wflow
+    )
+    assert type(model) == JournaledModel
+    assert model.load().json() == local_helloworld_wflow.json()
+    ctrl = setup_controller(model)
+    assert type(ctrl) == PersistentController
+
+
+def test_journaled_roundtrip(
+    tmpdir, local_helloworld_wflow_w_init, foregroundasync_backend
+):
+    thefile = tmpdir.join("state.json")
+    model = JournaledModel(
+        filename=str(thefile), initmodel=local_helloworld_wflow_w_init
+    )
+    ctrl = PersistentController(model, foregroundasync_backend)
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.submit_nodes(ctrl.submittable_nodes())
+    assert len(tmpdir.join("state.json.journal").readlines()) == 2
+
+    reloaded = JournaledModel(filename=str(thefile)).load()
+    assert reloaded.json() == ctrl.adageobj.json()
+
+    # committing does not deserialize untouched nodes
+    model.commit(reloaded)
+    assert len(tmpdir.join("state.json.journal").readlines()) == 2
+    assert not any(reloaded.dag.materialized(n) for n in reloaded.dag.nodes())
+
+    model.compact(model.committed)
+    assert tmpdir.join("state.json.journal").read() == ""
+    assert JournaledModel(filename=str(thefile)).load().json() == reloaded.json()
+
+
+def test_journaled_sequence(
+    tmpdir, local_helloworld_wflow_w_init, foregroundasync_backend
+):
+    thefile = tmpdir.join("state.json")
+    model = JournaledModel(
+        filename=str(thefile), initmodel=local_helloworld_wflow_w_init
+    )
+    ctrl = PersistentController(model, foregroundasync_backend)
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.submit_nodes(ctrl.submittable_nodes())
+    records = tmpdir.join("state.json.journal").readlines()
+    assert [json.loads(x)["seq"] for x in records] == [1, 2]
+
+    # an interrupted last record is ignored
+    tmpdir.join("state.json.journal").write("".join(records) + records[0][:10])
+    JournaledModel(filename=str(thefile)).load()
+
+    # missing and reordered records are not replayed
+    for journal in [records[1:], records[::-1], [records[0][:10] + "\n", records[1]]]:
+        tmpdir.join("state.json.journal").write("".join(journal))
+        with pytest.raises(RuntimeError):
+            JournaledModel(filename=str(thefile)).load()
+
+
+def test_journaled_compaction(tmpdir, local_helloworld_wflow_w_init):
+    thefile = tmpdir.join("state.json")
+    model = JournaledModel(
+        filename=str(thefile), initmodel=local_helloworld_wflow_w_init, compact_every=1
+    )
+    wflow = model.load()
+    wflow.view().getRule(name="init").apply(wflow)
+    model.commit(wflow)
+    assert tmpdir.join("state.json.journal").read() == ""
+    assert json.loads(thefile.read()) == wflow.json()
+
+
+def test_setup_sqlite(tmpdir, local_helloworld_wflow):
+    thefile = tmpdir.join("state.sqlite")
+    model = load_model_fromstring(
+        "sqlite:" + str(thefile), initmodel=local_helloworld_wflow
+    )
+    assert type(model) == SQLiteBackedModel
+    assert model.load().json() == local_helloworld_wflow.json()
+    ctrl = setup_controller(model)
+    assert type(ctrl) == PersistentController
+
+
+def test_sqlite_lazy_roundtrip(
+    tmpdir, local_helloworld_wflow_w_init, foregroundasync_backend
+):
+    thefile = tmpdir.join("state.sqlite")
+    model = SQLiteBackedModel(
+        filename=str(thefile), initmodel=local_helloworld_wflow_w_init
+    )
+    ctrl = PersistentController(model, foregroundasync_backend)
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.submit_nodes(ctrl.submittable_nodes())
+    ctrl.apply_rules(ctrl.applicable_rules())
+    assert len(ctrl.submittable_nodes()) == 1
+
+    wflow = SQLiteBackedModel(filename=str(thefile)).load()
+    nodeids = list(wflow.dag.nodes())
+    assert len(nodeids) == 2
+    assert not any(wflow.dag.materialized(n) for n in nodeids)
+    assert wflow.json() == YadageWorkflow.fromJSON(ctrl.adageobj.json()).json()
+    assert not any(wflow.dag.materialized(n) for n in nodeids)
+
+
+def test_sqlite_commit_touched_only(
+    tmpdir, local_helloworld_wflow_w_init, foregroundasync_backend
+):
+    thefile = tmpdir.join("state.sqlite")
+    model = SQLiteBackedModel(
+        filename=str(thefile), initmodel=local_helloworld_wflow_w_init
+    )
+    ctrl = PersistentController(model, foregroundasync_backend)
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.submit_nodes(ctrl.submittable_nodes())
+    ctrl.apply_rules(ctrl.applicable_rules())
+
+    ctrl = PersistentController(model, foregroundasync_backend)
+    init, hello = [
+        n
+        for n in ctrl.adageobj.dag.nodes()
+        if ctrl.adageobj.dag.nodeStatus(n).submit_time is None
+    ] + [
+        n
+        for n in ctrl.adageobj.dag.nodes()
+        if ctrl.adageobj.dag.nodeStatus(n).submit_time is not None
+    ]
+    ctrl.submit_nodes([init])
+    assert not ctrl.adageobj.dag.materialized(hello)
+    assert ctrl.adageobj.dag.nodeStatus(init).state == nodestate.SUCCESS
+    assert model.load().dag.nodeStatus(init).state == nodestate.SUCCESS
+
+
+def test_sqlite_node_order(
+    tmpdir, local_helloworld_wflow_w_init, foregroundasync_backend
+):
+    thefile = tmpdir.join("state.sqlite")
+    model = SQLiteBackedModel(
+        filename=str(thefile), initmodel=local_helloworld_wflow_w_init
+    )
+    ctrl = PersistentController(model, foregroundasync_backend)
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.submit_nodes(ctrl.submittable_nodes())
+    ctrl.apply_rules(ctrl.applicable_rules())
+    wflow = model.load()
+    order = list(wflow.dag.nodes())
+    assert len(order) == 2
+
+    # updating the first node keeps its position
+    wflow.dag.getNode(order[0]).task.metadata["note"] = "updated"
+    model.commit(wflow)
+    assert list(model.load().dag.nodes()) == order
+
+
+def test_mongo_partial_updates(
+    monkeypatch, local_helloworld_wflow_w_init, foregroundasync_backend
+):
+    mongomock = pytest.importorskip("mongomock")
+    import pymongo
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda connect_string: client)
+    model = MongoBackedModel(initmodel=local_helloworld_wflow_w_init)
+    wflowid = str(model.wflowid)
+    ctrl = PersistentController(model, foregroundasync_backend)
+    ctrl.apply_rules(ctrl.applicable_rules())
+    ctrl.submit_nodes(ctrl.submittable_nodes())
+    ctrl.apply_rules(ctrl.applicable_rules())
+
+    doc = model.collection.find_one({"_id": model.wflowid})
+    assert "dag" not in doc
+    assert len(doc["edges"]) == 1
+    assert model.nodes.count_documents({"wflowid": model.wflowid}) == 2
+
+    wflow = MongoBackedModel(wflowid=wflowid).load()
+    nodeids = list(wflow.dag.nodes())
+    assert not any(wflow.dag.materialized(n) for n in nodeids)
+    assert wflow.json() == YadageWorkflow.fromJSON(ctrl.adageobj.json()).json()
+
+    updates = []
+    update_one = model.collection.update_one
+    find_one_and_update = model.collection.find_one_and_update
+    monkeypatch.setattr(
+        model.collection,
+        "update_one",
+        lambda selector, update: updates.append(update) or update_one(selector, update),
+    )
+    monkeypatch.setattr(
+        model.collection,
+        "find_one_and_update",
+        lambda selector, update, **kwargs: updates.append(update)
+        or find_one_and_update(selector, update, **kwargs),
+    )
+    ctrl = PersistentController(model, foregroundasync_backend)
+    init = [
+        n
+        for n in ctrl.adageobj.dag.nodes()
+        if ctrl.adageobj.dag.nodeStatus(n).submit_time is None
+    ]
+    ctrl.submit_nodes(init)
+    assert all("$set" not in u or "rule_order" not in u["$set"] for u in updates)
+    assert model.load().dag.nodeStatus(init[0]).state == nodestate.SUCCESS
+
+
+def test_mongo_version_missing(monkeypatch, local_helloworld_wflow):
+    mongomock = pytest.importorskip("mongomock")
+    import pymongo
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda connect_string: client)
+    model = MongoBackedModel(initmodel=local_helloworld_wflow)
+    assert model.version() is not None
+    model.collection.delete_one({"_id": model.wflowid})
+    assert model.version() is None
+
+
+def test_mongo_legacy_document(monkeypatch, local_helloworld_wflow):
+    mongomock = pytest.importorskip("mongomock")
+    import pymongo
+
+    monkeypatch.setattr(pymongo, "MongoClient", mongomock.MongoClient)
+    model = MongoBackedModel()
+    model.wflowid = model.collection.insert_one(
+        local_helloworld_wflow.json()
+    ).inserted_id
+    wflow = model.load()
+    assert wflow.json() == local_helloworld_wflow.json()
+    model.commit(wflow)
+    doc = model.collection.find_one({"_id": model.wflowid})
+    assert "dag" not in doc
+    assert model.load().json() == local_helloworld_wflow.json()
+
+
+@pytest.mark.parametrize("modeltype", ["filebacked", "journaled", "sqlite"])
+def test_model_version(
+    tmpdir, modeltype, local_helloworld_wflow_w_init, foregroundasync_backend
+):
+    thefile = str(tmpdir.join("state"))
+    model = load_model_fromstring(
+        "{}:{}".format(modeltype, thefile), initmodel=local_helloworld_wflow_w_init
+    )
+    version = model.version()
+    assert version is not None
+    assert model.version() == version
+
+    ctrl = PersistentController(model, foregroundasync_backend)
+    ctrl.apply_rules(ctrl.applicable_rules())
+    assert model.version() != version
+    assert ctrl.loaded_version == model.version()
+
+    # the controller holds the version of its own commit, not that of a
+    # later commit by another writer
+    other = PersistentController(
+        load_model_fromstring("{}:{}".format(modeltype, thefile)),
+        foregroundasync_backend,
+    )
+    other.submit_nodes(other.submittable_nodes())
+    assert model.version() != ctrl.loaded_version
+    ctrl.load()
+    assert ctrl.adageobj.json() == other.adageobj.json()
@@ -1,9 +1,12 @@
+import asyncio
 import pytest
 import os
 import jsonschema.exceptions
 import yadage.workflow_loader
 from yadage.steering_object import YadageSteering
 from yadage.steering_api import steering_ctx
+from yadage.steering_async import async_steering_ctx
+from yadage.steering_loop import Waker, run_event_workflow
 from yadage.reset import reset_steps, collective_downstream
 from yadage.strategies import get_strategy
 from adage import nodestate
@@ -144,3 +147,84 @@ def test_reset(tmpdir, multiproc_backend):
     assert tmpdir.join("workdir/reduce/output").check() == False
     ys.run_adage(multiproc_backend)
     assert tmpdir.join("workdir/reduce/output").check() == True
+
+
+def test_event_driven(tmpdir, multiproc_backend):
+    workdir = os.path.join(str(tmpdir), "workdir")
+    with steering_ctx(
+        "local:" + workdir,
+        "workflow.yml",
+        {"input": [1, 2, 3]},
+        "tests/testspecs/nestedmapreduce",
+        multiproc_backend,
+        eventdriven=True,
+        maxupdateinterval=0.5,
+        visualize=False,
+    ) as ys:
+        ys.adage_argument(default_trackers=False)
+    assert ys.controller.successful()
+    assert ys.controller.changes
+
+
+def test_waker_backoff():
+    waker = Waker(min_interval=0.001, max_interval=0.004)
+    waker.wait(progressed=False)
+    waker.wait(progressed=False)
+    waker.wait(progressed=False)
+    assert waker.interval == 0.004
+    waker.wait(progressed=True)
+    assert waker.interval == 0.001
+
+    waker.interval = 60
+    waker.wake()
+    waker.wait(progressed=False)
+    assert not waker.event.is_set()
+
+
+def test_event_loop_polling_backoff():
+    class PollingController(object):
+        backend = object()
+        changes = 0
+
+        def validate(self):
+            return True
+
+    def ticks():
+        yield
+        for _ in range(6):
+            yield
+
+    coroutine = ticks()
+    next(coroutine)
+    # backends without notifications back off up to the maximum interval too
+    waker = Waker(min_interval=0.001, max_interval=0.016)
+    run_event_workflow(PollingController(), coroutine, waker)
+    assert waker.max_interval == 0.016
+    assert waker.interval == 0.016
+
+
+def test_async_steering(tmpdir, multiproc_backend):
+    async def run(name):
+        workdir = os.path.join(str(tmpdir), name)
+        async with async_steering_ctx(
+            "local:" + workdir,
+            "workflow.yml",
+            {"input": [1, 2, 3]},
+            "tests/testspecs/nestedmapreduce",
+            multiproc_backend,
+            maxupdateinterval=0.5,
+        ) as ys:
+            pass
+        return ys
+
+    async def run_both():
+        return await asyncio.gather(run("workdir_one"), run("workdir_two"))
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(run_both())
+    finally:
+        loop.close()
+    for ys in results:
+        assert ys.controller.successful()
+        assert os.path.exists(os.path.join(ys.metadir, "yadage_snapshot_workflow.json"))
@@ -1,4 +1,8 @@
+from adage import nodestate
 from yadage.wflow import YadageWorkflow
+from yadage.controllers import YadageController
+from yadage.spectable import is_specref
+import copy
 import json
 
 
@@ -25,6 +29,7 @@ def test_deserialize():
         "stepsbystage": {},
         "bookkeeping": {},
         "values": {},
+        "specs": {},
     }
     wflow = YadageWorkflow.fromJSON(data)
     assert data == wflow.json()
@@ -37,3 +42,59 @@ def test_create_from_data(local_helloworld_wflow):
 def test_serialize_deserialize(local_helloworld_wflow):
     wflow = local_helloworld_wflow
     assert YadageWorkflow.fromJSON(wflow.json()).json() == wflow.json()
+
+
+def test_lazy_deserialize(local_helloworld_wflow_w_init, foregroundasync_backend):
+    ctrl = YadageController(local_helloworld_wflow_w_init, foregroundasync_backend)
+    ctrl.apply_rules(ctrl.applicable_rules())
+    data = ctrl.adageobj.json()
+    assert len(data["dag"]["nodes"]) == 1
+
+    wflow = YadageWorkflow.fromJSON(data)
+    nodeid = data["dag"]["nodes"][0]["id"]
+    assert not wflow.dag.materialized(nodeid)
+    assert wflow.dag.nodeStatus(nodeid).state == nodestate.DEFINED
+    assert wflow.json() == data
+    # snapshots do not alias the serialized node
+    snapshot = wflow.json()
+    assert snapshot["dag"]["nodes"][0] == data["dag"]["nodes"][0]
+    snapshot["dag"]["nodes"][0]["name"] = "changed"
+    assert wflow.json() == data
+
+    assert wflow.dag.getNode(nodeid).name == data["dag"]["nodes"][0]["name"]
+    assert wflow.dag.materialized(nodeid)
+    assert wflow.json() == data
+
+
+def test_shared_specs(simple_mapreduce):
+    wflow = simple_mapreduce
+    wflow.view().init({"input": [1, 2, 3]})
+    wflow.view().rules[-1].apply(wflow)
+    YadageController(wflow).sync_backend()
+    wflow.rules[0].apply(wflow)
+
+    stepids = [x["_nodeid"] for x in wflow.stepsbystage["map"]]
+    assert len(stepids) == 3
+    specs = set(id(wflow.dag.getNode(n).task.spec) for n in stepids)
+    assert len(specs) == 1
+
+    data = wflow.json()
+    assert all(is_specref(n["task"]["spec"]) for n in data["dag"]["nodes"])
+    assert len(data["specs"]) == 2
+
+    loaded = YadageWorkflow.fromJSON(data)
+    assert loaded.json() == data
+    specs = set(id(loaded.dag.getNode(n).task.spec) for n in stepids)
+    assert len(specs) == 1
+
+    # serializations holding the specs inline still load
+    legacy = copy.deepcopy(data)
+    for node in legacy["dag"]["nodes"]:
+        node["task"]["spec"] = data["specs"][node["task"]["spec"]["$specref"]]
+    legacy.pop("specs")
+    loaded = YadageWorkflow.fromJSON(legacy)
+    assert loaded.json() == data
+    assert (
+        loaded.dag.getNode(stepids[0]).task.spec
+        == data["specs"][data["dag"]["nodes"][-1]["task"]["spec"]["$specref"]]
+    )
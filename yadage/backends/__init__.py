@@ -2,6 +2,25 @@ from packtivity.backendutils import proxyloader, load_proxy
 from yadage.backends.trivialbackend import TrivialProxy
 
 
+def packtivity_batch_submit(backend, tasks):
+    """
+    submit tasks to a packtivity backend, which (unlike the task-based yadage
+    backends) takes unrolled spec, parameters, state and metadata. Uses a
+    single batch submission if the backend supports it.
+
+    :param backend: the packtivity backend
+    :param tasks: list of tasks
+    :return: list of proxies, one for each task
+    """
+    if not tasks:
+        return []
+    unrolled = [(t.spec, t.parameters, t.state, dict(t.metadata)) for t in tasks]
+    batch_submit = getattr(backend, "batch_submit", None)
+    if batch_submit:
+        return list(batch_submit(*zip(*unrolled)))
+    return [backend.submit(*x) for x in unrolled]
+
+
 class CachedProxy(object):
     def __init__(self, proxy, cacheid):
         self.proxy = proxy
@@ -1,15 +1,18 @@
 import json
 import logging
 import os
+import tempfile
 import time
+from collections.abc import MutableMapping
 
 import yadage.backends.federatedbackend as federatedbackend
 from packtivity import datamodel as _datamodel
 
 from packtivity.statecontexts import load_state
+from yadage.statehash import StateHasher
 from yadage.utils import json_hash
 
-from ..backends import CachedProxy
+from ..backends import CachedProxy, packtivity_batch_submit
 from .trivialbackend import TrivialBackend, TrivialProxy
 
 log = logging.getLogger(__name__)
@@ -25,12 +28,19 @@ def checksum_cache(config):
     return ChecksumCache(configfile)
 
 
+@cachestrategy("store")
+def store_cache(config):
+    directory = config
+    return StoreCache(directory)
+
+
 def setupcache_fromstring(configstring):
     """
     generate cache from a string configuration (such as those passed from CLIs).
     valid strings are:
 
     - checksums:<path to cache file (JSON)>
+    - store:<path to cache directory>
 
     :param configstring: the configuration string
     :return: a cache object
@@ -57,44 +67,75 @@ class CachedBackend(federatedbackend.FederatedBackend):
         self.cache = cache
         self.primary_enabled = True
 
+    def cache_ready(self, proxy):
+        # if this a genuinely new result, cache it under the task cache id
+        if type(proxy) is TrivialProxy or self.cache.cacheexists(proxy.cacheid):
+            return
+        result = super(CachedBackend, self).result(proxy)
+        status = super(CachedBackend, self).successful(proxy)
+        self.cache.cacheresult(proxy.cacheid, status, result)
+
     def ready(self, proxy):
         isready = super(CachedBackend, self).ready(proxy)
-        # if this a genuinely new result, cache it under the task cache id
-        if isready and type(proxy) is not TrivialProxy:
-            result = super(CachedBackend, self).result(proxy)
-            status = super(CachedBackend, self).successful(proxy)
-            if not self.cache.cacheexists(proxy.cacheid):
-                self.cache.cacheresult(proxy.cacheid, status, result)
+        if isready:
+            self.cache_ready(proxy)
         return isready
 
+    def batch_ready(self, proxies):
+        ready = super(CachedBackend, self).batch_ready(proxies)
+        for proxy, isready in zip(proxies, ready):
+            if isready:
+                self.cache_ready(proxy)
+        return ready
+
     def expected_result(self, task):
         return self.backends["packtivity"].prepublish(task)
 
     def routedsubmit(self, task):
-        cached = self.cache.cacheddata(task)
-        if cached:
-            log.info("use cached result for task: %s", task.metadata["name"])
-            return TrivialProxy(
-                cached["status"], cached["result"].json(), task.state.datamodel
-            )
-        else:
-            if not self.primary_enabled:
-                raise RuntimeError(
-                    "cache failed but refusing to submit to primary since it was explicitly disabled"
+        return self.routedbatchsubmit([task])[0]
+
+    def routedbatchsubmit(self, tasks):
+        """
+        resolve the tasks with a valid cache entry and submit all others to
+        the primary backend in a single batch
+
+        :param tasks: list of tasks
+        :return: list of proxies, one for each task
+        """
+        proxies = [None] * len(tasks)
+        missing = []
+        for i, task in enumerate(tasks):
+            cached = self.cache.cacheddata(task)
+            if cached:
+                log.info("use cached result for task: %s", task.metadata["name"])
+                proxies[i] = TrivialProxy(
+                    cached["status"], cached["result"].json(), task.state.datamodel
                 )
+            else:
+                missing.append(i)
+        if not missing:
+            return proxies
+
+        if not self.primary_enabled:
+            raise RuntimeError(
+                "cache failed but refusing to submit to primary since it was explicitly disabled"
+            )
+        cacheids = []
+        for i in missing:
+            task = tasks[i]
             log.info("do proper submit for task: %s", task.metadata["name"])
             # create id for this task using the cache builder, with which
             # we will store the result with once it's ready
-            cacheid = self.cache.cacheid(task)
-
+            cacheids.append(self.cache.cacheid(task))
             task.state.reset()
-            # maybe we erroneously are re-submitting this see
-            # https://github.com/diana-hep/yadage/issues/45 TODO!
-            primaryproxy = self.backends["primary"].submit(
-                task.spec, task.parameters, task.state, task.metadata
-            )
-            cachedproxy = CachedProxy(primaryproxy, cacheid)
-            return cachedproxy
+        # maybe we erroneously are re-submitting this see
+        # https://github.com/diana-hep/yadage/issues/45 TODO!
+        primaryproxies = packtivity_batch_submit(
+            self.backends["primary"], [tasks[i] for i in missing]
+        )
+        for i, primaryproxy, cacheid in zip(missing, primaryproxies, cacheids):
+            proxies[i] = CachedProxy(primaryproxy, cacheid)
+        return proxies
 
     def routeproxy(self, proxy):
         if type(proxy) == TrivialProxy:
@@ -138,12 +179,15 @@ class CacheBuilder(object):
             self.cache[cacheid]["task"]["spec"]["process"],
         )
         log.debug("caching with validation data %s", validation_data)
-        self.cache[cacheid]["result"] = {
-            "status": "SUCCESS" if status else "FAILED",
-            "result": result.json(),
-            "cachingtime": time.time(),
-            "validation_data": validation_data,
-        }
+        self.cache[cacheid] = dict(
+            self.cache[cacheid],
+            result={
+                "status": "SUCCESS" if status else "FAILED",
+                "result": result.json(),
+                "cachingtime": time.time(),
+                "validation_data": validation_data,
+            },
+        )
         self.todisk()
 
     def cachedresult(self, cacheid, state, silent=True):
@@ -209,6 +253,11 @@ class ChecksumCache(CacheBuilder):
 
     def __init__(self, cachefile):
         super(ChecksumCache, self).__init__(cachefile)
+        self.hasher = StateHasher(os.path.splitext(cachefile)[0] + "_manifests")
+
+    def todisk(self):
+        super(ChecksumCache, self).todisk()
+        self.hasher.todisk()
 
     def remove(self, cacheid):
         """
@@ -227,9 +276,8 @@ class ChecksumCache(CacheBuilder):
 
         :param cachid: the cache entry identifier
         """
-        validation_data = {
-            "state_hash": load_state(self.cache[cacheid]["task"]["state"]).state_hash()
-        }
+        state = load_state(self.cache[cacheid]["task"]["state"])
+        validation_data = {"state_hash": self.hasher.state_hash(state)}
 
         log.debug("validation data is %s", validation_data)
         return validation_data
@@ -253,3 +301,114 @@ class ChecksumCache(CacheBuilder):
             )
             return False
         return True
+
+
+class ShardedCacheStore(MutableMapping):
+    """
+    dict-like cache storage keeping one JSON file per cache entry, in
+    subdirectories named by the first characters of the cache id. Entries
+    are read when first accessed and are written by ``flush`` using atomic
+    renames, so that several workflows can share one directory. Entries only
+    registering a task are kept in memory, and are read again from the
+    directory in case another workflow cached a result for them.
+    """
+
+    def __init__(self, directory, shardlength=2):
+        """
+        :param directory: the cache directory
+        :param shardlength: the number of cache id characters naming the subdirectory
+        """
+        self.directory = directory
+        self.shardlength = shardlength
+        self.entries = {}
+        # ids of the entries holding a result that are not yet written
+        self.dirty = set()
+
+    def path(self, cacheid):
+        return os.path.join(
+            self.directory, cacheid[: self.shardlength], cacheid + ".json"
+        )
+
+    def __getitem__(self, cacheid):
+        entry = self.entries.get(cacheid)
+        if entry is None or "result" not in entry:
+            try:
+                with open(self.path(cacheid)) as entryfile:
+                    entry = self.entries[cacheid] = json.load(entryfile)
+            except (IOError, OSError):
+                if entry is None:
+                    raise KeyError(cacheid)
+        return entry
+
+    def __setitem__(self, cacheid, entry):
+        self.entries[cacheid] = entry
+        if "result" in entry:
+            self.dirty.add(cacheid)
+        else:
+            self.dirty.discard(cacheid)
+
+    def __delitem__(self, cacheid):
+        if cacheid not in self:
+            raise KeyError(cacheid)
+        self.entries.pop(cacheid, None)
+        self.dirty.discard(cacheid)
+        try:
+            os.remove(self.path(cacheid))
+        except (IOError, OSError):
+            # not yet written, or removed by another workflow
+            pass
+
+    def __contains__(self, cacheid):
+        return cacheid in self.entries or os.path.exists(self.path(cacheid))
+
+    def __iter__(self):
+        stored = set()
+        if os.path.isdir(self.directory):
+            for shard in os.listdir(self.directory):
+                sharddir = os.path.join(self.directory, shard)
+                if not os.path.isdir(sharddir):
+                    continue
+                stored.update(
+                    x[: -len(".json")]
+                    for x in os.listdir(sharddir)
+                    if x.endswith(".json")
+                )
+        return iter(stored.union(self.entries))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def flush(self):
+        """
+        write the changed entries that hold a result
+        """
+        for cacheid in self.dirty:
+            entry = self.entries[cacheid]
+            path = self.path(cacheid)
+            sharddir = os.path.dirname(path)
+            if not os.path.exists(sharddir):
+                os.makedirs(sharddir, exist_ok=True)
+            log.debug("writing cache entry %s", path)
+            fd, tmppath = tempfile.mkstemp(dir=sharddir, suffix=".tmp")
+            with os.fdopen(fd, "w") as entryfile:
+                json.dump(entry, entryfile)
+            os.replace(tmppath, path)
+        self.dirty = set()
+
+
+class StoreCache(ChecksumCache):
+    """
+    checksum cache storing its entries in a ShardedCacheStore instead of a
+    single JSON file. Caching a result writes only that entry.
+    """
+
+    def __init__(self, directory):
+        self.datamodel = _datamodel
+        self.cachefile = None
+        log.info("using cache store at %s", directory)
+        self.cache = ShardedCacheStore(directory)
+        self.hasher = StateHasher(os.path.join(directory, "_manifests"))
+
+    def todisk(self):
+        self.cache.flush()
+        self.hasher.todisk()
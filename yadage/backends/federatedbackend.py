@@ -1,3 +1,9 @@
+import collections
+import weakref
+
+from adage import nodestate
+
+
 class FederatedBackend(object):
     """
     A meta backend that routes tasks to several internal backends
@@ -6,6 +12,10 @@ class FederatedBackend(object):
     def __init__(self, backends):
         """takes a dictionary of backendname->backendobject and a router"""
         self.backends = backends
+        # proxy -> backendname, as decided by routeproxy for proxies that are
+        # passed on to the backend as they are. The values must not reference
+        # the proxies, which would keep the entries alive.
+        self.routes = weakref.WeakKeyDictionary()
 
     def routedsubmit(self, task):
         raise NotImplementedError("needs implementation")
@@ -16,28 +26,115 @@ class FederatedBackend(object):
     def routeproxy(self, proxy):
         raise NotImplementedError("needs implementation")
 
+    def route(self, proxy):
+        """
+        :return: the backend name and proxy for that backend, as decided by
+                 routeproxy. The decision is cached for proxies that are
+                 passed on as they are.
+        """
+        try:
+            return self.routes[proxy], proxy
+        except KeyError:
+            pass
+        except TypeError:
+            # proxy is not weak-referenceable
+            return self.routeproxy(proxy)
+        name, subproxy = self.routeproxy(proxy)
+        if subproxy is proxy:
+            self.routes[proxy] = name
+        return name, subproxy
+
+    def batch_call(self, method, proxies):
+        """
+        call a method for several proxies, with one call to each backend
+        involved if it implements a ``batch_<method>`` bulk method, and with
+        calls for each proxy otherwise
+
+        :param method: the method name (e.g. 'ready')
+        :param proxies: the list of proxies
+        :return: list of return values, one for each proxy
+        """
+        values = [None] * len(proxies)
+        groups = collections.OrderedDict()
+        for i, proxy in enumerate(proxies):
+            b, p = self.route(proxy)
+            groups.setdefault(b, []).append((i, p))
+        for b, items in groups.items():
+            backend = self.backends[b]
+            subproxies = [p for _, p in items]
+            batch = getattr(backend, "batch_" + method, None)
+            if batch:
+                subvalues = batch(subproxies)
+            else:
+                subvalues = [getattr(backend, method)(p) for p in subproxies]
+            for (i, _), v in zip(items, subvalues):
+                values[i] = v
+        return values
+
     def batch_submit(self, tasks):
         return self.routedbatchsubmit(tasks)
 
+    def batch_ready(self, proxies):
+        return self.batch_call("ready", proxies)
+
+    def batch_successful(self, proxies):
+        return self.batch_call("successful", proxies)
+
+    def batch_result(self, proxies):
+        return self.batch_call("result", proxies)
+
+    def batch_status(self, proxies):
+        """
+        :param proxies: list of proxies
+        :return: list of node states (RUNNING, SUCCESS or FAILED), one for each proxy
+        """
+        ready = self.batch_ready(proxies)
+        finished = [p for p, r in zip(proxies, ready) if r]
+        successful = iter(self.batch_successful(finished))
+        states = []
+        for r in ready:
+            if not r:
+                states.append(nodestate.RUNNING)
+            elif next(successful):
+                states.append(nodestate.SUCCESS)
+            else:
+                states.append(nodestate.FAILED)
+        return states
+
+    def subscribe(self, callback):
+        """
+        register a callback to be called when a job of any of the backends
+        that support notifications finishes
+
+        :param callback: the callback
+        :return: whether any backend will call it
+        """
+        subscribed = False
+        for backend in self.backends.values():
+            subscribe = getattr(backend, "subscribe", None)
+            if subscribe and subscribe(callback):
+                subscribed = True
+        return subscribed
+
     def submit(self, task):
         return self.routedsubmit(task)
 
     def result(self, proxy):
-        b, p = self.routeproxy(proxy)
+        b, p = self.route(proxy)
         return self.backends[b].result(p)
 
     def expected_result(self, proxy):
-        b, p = self.routeproxy(proxy)
+        b, p = self.route(proxy)
         return self.backends[b].expected_result(p)
 
     def ready(self, proxy):
-        b, p = self.routeproxy(proxy)
+        b, p = self.route(proxy)
         return self.backends[b].ready(p)
 
     def successful(self, proxy):
-        b, p = self.routeproxy(proxy)
+        b, p = self.route(proxy)
         return self.backends[b].successful(p)
 
     def fail_info(self, proxy):
-        b, p = self.routeproxy(proxy)
+        b, p = self.route(proxy)
         return self.backends[b].fail_info(p)
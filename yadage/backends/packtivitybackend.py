@@ -2,12 +2,45 @@ import logging
 
 import yadage.backends.caching as caching
 import yadage.backends.federatedbackend as federatedbackend
-from packtivity.asyncbackends import ForegroundBackend
+from packtivity.asyncbackends import (
+    ForegroundBackend,
+    MultiProcBackend,
+    PacktivityProxyBase,
+)
 from packtivity.backendutils import backend_from_string
 
+from ..backends import packtivity_batch_submit
+
 log = logging.getLogger(__name__)
 
 
+def notify_on_completion(backend, callback):
+    """
+    make a packtivity multiprocessing backend call a callback whenever one of
+    its jobs finishes (successfully or not). The callback is called from the
+    pool's result handler thread.
+
+    :param backend: the MultiProcBackend
+    :param callback: the callback, called with the job result or exception
+    """
+    callbacks = backend.__dict__.setdefault("completion_callbacks", [])
+    if not callbacks:
+
+        def notify(*args):
+            for cb in callbacks:
+                cb(*args)
+
+        def submit_callable(callable):
+            return PacktivityProxyBase(
+                backend.pool.apply_async(
+                    callable, callback=notify, error_callback=notify
+                )
+            )
+
+        backend.submit_callable = submit_callable
+    callbacks.append(callback)
+
+
 class PacktivityBackend(federatedbackend.FederatedBackend):
     """
     a backend that mainly submits step tasks to a packtivity backend
@@ -45,44 +78,66 @@ class PacktivityBackend(federatedbackend.FederatedBackend):
         )
 
     def routedbatchsubmit(self, tasks):
-        actual_submits = [
-            not t.metadata["wflow_hints"].get("is_purepub", False) for t in tasks
-        ]
-        if all(actual_submits) and not self.cached:
-            try:
-                submit_data = [
-                    (task.spec, task.parameters, task.state, task.metadata)
-                    for task in tasks
-                ]
-                return self.backends["packtivity"].batch_submit(*zip(*submit_data))
-                log.warning(actual_submits, self.backends["packtivity"].batched_submit)
-            except AttributeError:
-                pass
-        raise NotImplementedError
+        """
+        submit pure-publishing tasks to the foreground backend and all other
+        tasks in a single batch to the (possibly cached) packtivity backend
 
-    def routedsubmit(self, task):
-        is_pure_publishing = task.metadata["wflow_hints"].get("is_purepub", False)
-        if is_pure_publishing:
-            foreground_proxy = self.backends["purepub"].submit(
-                task.spec, task.parameters, task.state, task.metadata
-            )
-            foreground_proxy.set_details({"labels": {"backend_hints": "is_purepub"}})
-            return foreground_proxy
+        :param tasks: list of tasks
+        :return: list of proxies, one for each task
+        """
+        proxies = [None] * len(tasks)
+        submits = []
+        for i, task in enumerate(tasks):
+            if task.is_purepub:
+                proxies[i] = self.backends["purepub"].submit(
+                    task.spec, task.parameters, task.state, dict(task.metadata)
+                )
+                proxies[i].set_details({"labels": {"backend_hints": "is_purepub"}})
+            else:
+                submits.append(i)
+        if not submits:
+            return proxies
 
+        # this is a little hacky, because the packtivity backends
+        # take unrolled spec/parameters/context while the adage API
+        # takes generalized task objects
+        # possibly could use Munch on the packtivity side to
+        # dynammicaly create .task/.parameters/.state-able objects
+        submit_tasks = [tasks[i] for i in submits]
+        if self.cached:
+            # Cached backends adhere to the task-based API
+            submitted = self.backends["packtivity"].batch_submit(submit_tasks)
         else:
-            # this is a little hacky, because the packtivity backends
-            # take unrolled spec/parameters/context while the adage API
-            # takes generalized task objects
-            # possibly could use Munch on the packtivity side to
-            # dynammicaly create .task/.parameters/.state-able objects
-            if self.cached:
-                # Cached backends adhere to the task-based API
-                return self.backends["packtivity"].submit(task)
-            else:
-                # primary packtivity backends adhere to the unrolled API
-                return self.backends["packtivity"].submit(
-                    task.spec, task.parameters, task.state, task.metadata
-                )
+            # primary packtivity backends adhere to the unrolled API
+            submitted = packtivity_batch_submit(
+                self.backends["packtivity"], submit_tasks
+            )
+        for i, proxy in zip(submits, submitted):
+            proxies[i] = proxy
+        return proxies
+
+    def routedsubmit(self, task):
+        return self.routedbatchsubmit([task])[0]
+
+    def subscribe(self, callback):
+        """
+        register a callback to be called when a job finishes. Supported for
+        multiprocessing and foreground packtivity backends. Foreground (and
+        pure-publishing and cached) jobs finish during submission, which
+        already counts as progress, so only multiprocessing jobs call it.
+
+        :param callback: the callback
+        :return: whether finished jobs are notified
+        """
+        backend = self.backends["packtivity"]
+        if self.cached:
+            backend = backend.backends["primary"]
+        if isinstance(backend, MultiProcBackend):
+            notify_on_completion(backend, callback)
+            return True
+        if isinstance(backend, ForegroundBackend):
+            return True
+        return super(PacktivityBackend, self).subscribe(callback)
 
     def expected_result(self, task):
         if self.cached:
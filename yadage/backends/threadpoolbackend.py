@@ -0,0 +1,115 @@
+import asyncio
+import functools
+import logging
+import threading
+import weakref
+
+from adage import nodestate
+
+log = logging.getLogger(__name__)
+
+_locks = weakref.WeakKeyDictionary()
+_locks_lock = threading.Lock()
+
+
+def backend_lock(backend):
+    """
+    :param backend: a synchronous backend
+    :return: the lock serializing calls to the backend from executor threads,
+             shared by all adapters of the same backend
+    """
+    with _locks_lock:
+        lock = _locks.get(backend)
+        if lock is None:
+            lock = _locks[backend] = threading.Lock()
+        return lock
+
+
+class ThreadPoolBackend(object):
+    """
+    awaitable adapter for (synchronous) yadage backends. All backend calls run
+    in a thread pool, so that they do not block the event loop. Bulk methods
+    of the backend (``batch_submit``, ``batch_status``, ``batch_result``) are
+    used where available.
+
+    Awaitable backends provide the coroutines ``submit``, ``status`` and
+    ``results``, each taking a list of tasks or proxies.
+
+    Synchronous backends are not thread-safe (e.g. the cache writes of
+    cached backends and the proxy routing of federated backends), so calls
+    to the same backend are serialized, also across adapters, e.g. of
+    several workflows sharing one backend.
+    """
+
+    def __init__(self, backend, executor=None):
+        """
+        :param backend: the synchronous backend
+        :param executor: the executor to run backend calls in. If None, the
+                         event loop's default executor is used.
+        """
+        self.backend = backend
+        self.executor = executor
+        self.lock = backend_lock(backend)
+
+    def locked(self, func, *args):
+        with self.lock:
+            return func(*args)
+
+    def run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(
+            self.executor, functools.partial(self.locked, func, *args)
+        )
+
+    def submit_tasks(self, tasks):
+        if len(tasks) > 1 and hasattr(self.backend, "batch_submit"):
+            try:
+                return list(self.backend.batch_submit(tasks))
+            except NotImplementedError:
+                log.debug("backend does not support batch submission")
+        return [self.backend.submit(task) for task in tasks]
+
+    def proxy_states(self, proxies):
+        if hasattr(self.backend, "batch_status"):
+            return self.backend.batch_status(proxies)
+        states = []
+        for proxy in proxies:
+            if not self.backend.ready(proxy):
+                states.append(nodestate.RUNNING)
+            elif self.backend.successful(proxy):
+                states.append(nodestate.SUCCESS)
+            else:
+                states.append(nodestate.FAILED)
+        return states
+
+    def proxy_results(self, proxies):
+        if hasattr(self.backend, "batch_result"):
+            return self.backend.batch_result(proxies)
+        return [self.backend.result(proxy) for proxy in proxies]
+
+    async def submit(self, tasks):
+        """
+        :param tasks: list of tasks
+        :return: list of proxies, one for each task
+        """
+        if not tasks:
+            return []
+        return await self.run(self.submit_tasks, tasks)
+
+    async def status(self, proxies):
+        """
+        :param proxies: list of proxies
+        :return: list of node states (RUNNING, SUCCESS or FAILED), one for each proxy
+        """
+        if not proxies:
+            return []
+        return await self.run(self.proxy_states, proxies)
+
+    async def results(self, proxies):
+        """
+        :param proxies: list of proxies of successful jobs
+        :return: list of results, one for each proxy
+        """
+        if not proxies:
+            return []
+        return await self.run(self.proxy_results, proxies)
@@ -2,12 +2,19 @@ import contextlib
 import importlib
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import networkx as nx
+from adage import nodestate
 from adage.wflowcontroller import BaseController
 from packtivity.syncbackends import defaultsyncbackend
 
 from .reset import collective_downstream, remove_rules, reset_steps, undo_rules
+from .runtimestats import executed_step, runtime_stats
 from .wflow import YadageWorkflow
 from .handlers.utils import handler_decorator
+from .utils import json_hash
 
 log = logging.getLogger(__name__)
 
@@ -19,24 +26,305 @@ class YadageController(BaseController):
         self.prepublishing_backend = defaultsyncbackend()
         self.disable_backend = False
         self.disable_prepublishing = kwargs.pop("disable_prepub", False)
+        # number of threads to prepublish many nodes at once (e.g. on first sync)
+        self.prepublish_workers = kwargs.pop("prepublish_workers", None)
+        # node id -> (hash of prepublishing inputs, prepublished result)
+        self.prepublished = {}
+        # number of changes (rules applied, nodes submitted, node state
+        # changes) made through this controller, to detect idle ticks
+        self.changes = 0
         super(YadageController, self).__init__(*args, **kwargs)
 
+    @property
+    def adageobj(self):
+        return self._adageobj
+
+    @adageobj.setter
+    def adageobj(self, adageobj):
+        self._adageobj = adageobj
+        self.connect_backend()
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend):
+        self._backend = backend
+        self.connect_backend()
+
+    @contextlib.contextmanager
+    def batch(self, sync=True):
+        """
+        group several operations into a single transaction. The in-memory
+        workflow state has no transactions, so this is a no-op.
+        """
+        yield
+
+    def connect_backend(self):
+        """
+        connect the backend to all deserialized nodes and set up nodes that
+        are only deserialized on first access the same way
+        """
+        if not self.adageobj:
+            return
+        dag = self.adageobj.dag
+        dag.materialize_hook = self.setup_node
+        if not self.backend:
+            return
+        for n in dag.nodes():
+            if dag.materialized(n):
+                dag.getNode(n).backend = self.backend
+
+    def setup_node(self, node):
+        if self.backend:
+            node.backend = self.backend
+        self.prepublish(node)
+
+    def prepublish(self, node):
+        self.prepublish_nodes([node])
+
+    def prepublish_key(self, node):
+        """
+        :return: hash of the inputs that determine the prepublished result
+        """
+        task = node.task
+        return json_hash(
+            [
+                task.spec,
+                task.parameters.json(),
+                task.state.json() if task.state else None,
+            ]
+        )
+
+    def prepublish_nodes(self, nodes):
+        """
+        set the expected (prepublished) results of nodes. Results are cached by
+        node and only recomputed for new nodes or if the node's spec, parameters
+        or state changed. Finished nodes and nodes that already hold an
+        expected result (i.e. that were not reset since) are skipped without
+        computing their cache key.
+
+        :param nodes: list of nodes to prepublish
+        """
+        if "YADAGE_IGNORE_PREPUBLISHING" in os.environ or self.disable_prepublishing:
+            return
+        missing = []
+        for node in nodes:
+            if node.expected_result is not None or node.state in [
+                nodestate.SUCCESS,
+                nodestate.FAILED,
+            ]:
+                continue
+            key = self.prepublish_key(node)
+            cached = self.prepublished.get(node.identifier)
+            if cached is not None and cached[0] == key:
+                node.expected_result = cached[1]
+            else:
+                missing.append((node, key))
+        if not missing:
+            return
+
+        def prepublish_task(task):
+            return self.prepublishing_backend.prepublish(
+                task.spec, task.parameters.json(), task.state
+            )
+
+        tasks = [node.task for node, _ in missing]
+        log.debug("prepublishing %s nodes", len(tasks))
+        if self.prepublish_workers and len(tasks) > 1:
+            with ThreadPoolExecutor(int(self.prepublish_workers)) as pool:
+                results = list(pool.map(prepublish_task, tasks))
+        else:
+            results = [prepublish_task(task) for task in tasks]
+
+        for (node, key), result in zip(missing, results):
+            self.prepublished[node.identifier] = (key, result)
+            node.expected_result = result
+
     def sync_expected(self):
-        for n in self.adageobj.dag.nodes():
-            if (
-                "YADAGE_IGNORE_PREPUBLISHING" in os.environ
-                or self.disable_prepublishing
-            ):
+        dag = self.adageobj.dag
+        # nodes not yet deserialized are prepublished on first access
+        self.prepublish_nodes(
+            [dag.getNode(n) for n in dag.nodes() if dag.materialized(n)]
+        )
+
+    def syncable_nodes(self):
+        """
+        :return: list of nodes whose state is to be updated against the backend.
+                 Nodes not yet deserialized are only included if they have been
+                 submitted but are not yet finished.
+        """
+        dag = self.adageobj.dag
+        nodes = []
+        for n in dag.nodes():
+            if not dag.materialized(n):
+                status = dag.nodeStatus(n)
+                if not status.has_proxy or status.state in [
+                    nodestate.SUCCESS,
+                    nodestate.FAILED,
+                ]:
+                    continue
+            nodes.append(dag.getNode(n))
+        return nodes
+
+    def sync_state(self):
+        """
+        update the node states against the backend. Backends with a bulk
+        status API are queried once for all nodes.
+        """
+        nodes = self.syncable_nodes()
+        states = [node.state for node in nodes]
+        self.update_states(nodes)
+        self.changes += sum(1 for n, s in zip(nodes, states) if n.state != s)
+        self.record_runtimes(nodes, states)
+
+    def record_runtimes(self, nodes, states):
+        """
+        record the runtimes of nodes that just succeeded, which are used to
+        size batches of stages with ``autobatch``. The runtime is the time from
+        the submission of a node until it was found to be finished, so it also
+        includes the time the job was queued in the backend. Nodes that did not
+        execute their step (cached results and pure publishers) are skipped.
+
+        :param nodes: list of nodes
+        :param states: the previous states of the nodes
+        """
+        stats = runtime_stats()
+        recorded = False
+        for node, state in zip(nodes, states):
+            if state == nodestate.SUCCESS or node.state != nodestate.SUCCESS:
                 continue
-            node = self.adageobj.dag.getNode(n)
-            node.expected_result = self.prepublishing_backend.prepublish(
-                node.task.spec, node.task.parameters.json(), node.task.state
+            if not (node.submit_time and node.ready_by_time):
+                continue
+            if not executed_step(node):
+                continue
+            stats.record(
+                node.task.spec,
+                node.ready_by_time - node.submit_time,
+                node.task.metadata.get("wflow_elements", 1),
             )
+            recorded = True
+        if recorded:
+            stats.todisk()
+
+    def update_states(self, nodes):
+        if not hasattr(self.backend, "batch_status"):
+            for node in nodes:
+                node.update_state(backend=self.backend)
+            return
+
+        submitted = []
+        for node in nodes:
+            if node.resultproxy and node.backend in [None, self.backend]:
+                submitted.append(node)
+            else:
+                node.update_state(backend=self.backend)
+        proxies = [node.resultproxy for node in submitted]
+        states = self.backend.batch_status(proxies)
+        successful = [p for p, s in zip(proxies, states) if s == nodestate.SUCCESS]
+        results = iter(self.backend.batch_result(successful))
+        for node, state in zip(submitted, states):
+            result = next(results) if state == nodestate.SUCCESS else None
+            node.set_status(state, result)
 
     def sync_backend(self):
         self.sync_expected()
         if not self.disable_backend:
-            super(YadageController, self).sync_backend()
+            self.sync_state()
+
+    def applicable_rules(self):
+        """
+        :return: a list of rules whose predicate is fulfilled. Rules are only
+                 re-evaluated if the parts of the workflow they depend on changed.
+        """
+        return self.adageobj.rule_index.applicable_rules()
+
+    def submit_nodes(self, nodes):
+        """
+        :param nodes: a list of nodes to submit to the backend. Several nodes
+                      are submitted in a single batch if the backend supports it.
+        """
+        proxies = None
+        if len(nodes) > 1 and hasattr(self.backend, "batch_submit"):
+            try:
+                proxies = self.backend.batch_submit([n.task for n in nodes])
+            except NotImplementedError:
+                log.debug("backend does not support batch submission")
+        if proxies is None:
+            super(YadageController, self).submit_nodes(nodes)
+        else:
+            submit_time = time.time()
+            for node, proxy in zip(nodes, proxies):
+                node.resultproxy = proxy
+                node.submit_time = submit_time
+        self.adageobj.ready_queue.submitted([n.identifier for n in nodes])
+        self.changes += len(nodes)
+
+    def apply_rules(self, rules):
+        """
+        :param rules: a list of rules to to apply to the workflow graph
+        """
+        super(YadageController, self).apply_rules(rules)
+        self.changes += len(rules)
+
+    def submittable_nodes(self):
+        """
+        :return: generator of nodes with successful and completed upstream.
+                 These are tracked as the workflow progresses rather than
+                 found by scanning the DAG.
+        """
+        dag = self.adageobj.dag
+        for n in self.adageobj.ready_queue.ready():
+            yield dag.getNode(n)
+
+    def finished(self):
+        """
+        :return: boolean indicating if nodes or rules are still left to be submitted/applied
+        """
+        dag = self.adageobj.dag
+        upstream_failure = {}
+        for n in nx.topological_sort(dag):
+            upstream_failure[n] = any(
+                upstream_failure[x] or dag.nodeStatus(x).state == nodestate.FAILED
+                for x in dag.predecessors(n)
+            )
+            if upstream_failure[n]:
+                continue
+            if dag.nodeStatus(n).state in [nodestate.DEFINED, nodestate.RUNNING]:
+                log.debug("nodes that could be run or are running are left.")
+                return False
+        if self.applicable_rules():
+            return False
+        log.info("no nodes can be run anymore and no rules are applicable")
+        return True
+
+    def successful(self):
+        """
+        :return: boolean indicating workflow execution was successful
+        """
+        if not self.finished():
+            return False
+        dag = self.adageobj.dag
+        return not any(dag.nodeStatus(n).state == nodestate.FAILED for n in dag.nodes())
+
+    def validate(self):
+        """
+        :return: validates internal execution order of workflow
+        """
+        dag = self.adageobj.dag
+        for n in dag.nodes():
+            submit_time = dag.nodeStatus(n).submit_time
+            if not submit_time:
+                continue
+            for x in dag.predecessors(n):
+                ready_by_time = dag.nodeStatus(x).ready_by_time
+                if ready_by_time is None or not submit_time > ready_by_time:
+                    log.error(
+                        "node %s was submitted before predecessor %s was ready", n, x
+                    )
+                    return False
+        return True
 
 
 @controller("frommodel")
@@ -86,20 +374,53 @@ class PersistentController(YadageController):
     workflow controller, that explicltly calls transaction methods on non read-only operations on the workflow state
     """
 
-    def __init__(self, model, backend=None):
+    def __init__(self, model, backend=None, **kwargs):
         """
         :param model: the model on whih the controller will operate
         :param backend: the backend to against which to check workflow state.
+        :param kwargs: further options of YadageController
 
         :return: the controller instance
         """
         self.model = model
-        super(PersistentController, self).__init__(self.model.load(), backend)
+        self.batch_depth = 0
+        version = self.model_version()
+        super(PersistentController, self).__init__(self.model.load(), backend, **kwargs)
+        # version of the persisted state that self.adageobj reflects
+        self.loaded_version = version
+
+    def model_version(self):
+        """
+        :return: the model's version token, or None if the model has none
+        """
+        version = getattr(self.model, "version", None)
+        return version() if version else None
+
+    def load(self):
+        """
+        load the workflow state from the model, unless the state held in
+        memory is known to be the latest one (i.e. the model's version token
+        is unchanged since the last load or commit by this controller)
+        """
+        version = self.model_version()
+        if version is not None and version == self.loaded_version:
+            log.debug("reusing workflow state at version %s", version)
+            return
+        self.adageobj = self.model.load()
+        self.loaded_version = version
 
     @contextlib.contextmanager
     def transaction(self, sync=True):
         """the transaction context. will commit model to persistent store on exit."""
-        self.adageobj = self.model.load()
+        if self.batch_depth:
+            # part of an enclosing batch, which loads and commits the state
+            yield
+            return
+
+        self.load()
+        # the in-memory state is modified from here on and is only in sync
+        # with the model again once committed
+        loaded_version, self.loaded_version = self.loaded_version, None
         if sync:
             log.debug("syncing to setup tx %s", self)
             super(PersistentController, self).sync_backend()
@@ -112,7 +433,26 @@ class PersistentController(YadageController):
         if sync:
             log.debug("syncing to teardown tx %s", self)
             super(PersistentController, self).sync_backend()
-        self.model.commit(self.adageobj)
+        # take the version token from the commit itself, as the model may
+        # have been committed to by another writer since
+        committed_version = self.model.commit(self.adageobj)
+        if committed_version is None:
+            # nothing was written, the state is still the one loaded
+            committed_version = loaded_version
+        self.loaded_version = committed_version
+
+    @contextlib.contextmanager
+    def batch(self, sync=True):
+        """
+        group several operations into a single transaction, i.e. into one
+        load, backend sync, validation and commit of the workflow state.
+        """
+        with self.transaction(sync=sync):
+            self.batch_depth += 1
+            try:
+                yield
+            finally:
+                self.batch_depth -= 1
 
     def submit_nodes(self, nodeids):
         """
@@ -176,6 +516,7 @@ class PersistentController(YadageController):
         with self.transaction():
             rule = [x for x in self.adageobj.rules if x.identifier == ruleid][0]
             rule.rule.stagespec = patchspec
+            self.adageobj.rule_index.forget(ruleid)
 
     def undo_rules(self, ruleids):
         """
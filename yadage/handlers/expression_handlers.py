@@ -1,8 +1,7 @@
 import logging
-import jsonpath_rw
 
 from .utils import handler_decorator
-from ..utils import pointerize
+from ..utils import jsonpath_parse, pointerize
 
 log = logging.getLogger(__name__)
 
@@ -43,7 +42,7 @@ def select_reference(step, selection, is_scopes):
     except:
         pass
 
-    matches = jsonpath_rw.parse(selection).find(pointerized)
+    matches = jsonpath_parse(selection).find(pointerized)
     log.info("matches")
     if not matches:
         log.error(
@@ -163,6 +162,81 @@ def stage_output_selector(stageview, selection):
         raise RuntimeError("not sure how to deal with this.")
 
 
+class PendingOutput(object):
+    """
+    placeholder for the output of an upstream step that does not have a result yet
+    """
+
+    def __init__(self, stepid=None):
+        self.stepid = stepid
+
+    def __repr__(self):
+        return "<PendingOutput {}>".format(self.stepid)
+
+
+def step_outputs(stageview, items, output):
+    """
+    selects the outputs of steps, with PendingOutput placeholders for steps
+    that do not have a result yet
+
+    :param stageview: the workflow view objct
+    :param items: the step entries of the view (possibly reserved ones)
+    :param output: the output selection
+    :return: list of outputs, one for each step
+    """
+    outputs = []
+    for item in items:
+        node = stageview.dag.getNode(item["_nodeid"]) if "_nodeid" in item else None
+        if not (node and node.has_result()):
+            outputs.append(PendingOutput(node.identifier if node else None))
+            continue
+        step = {"id": node.identifier, "result": node.result}
+        outputs.append(select_reference(step, output, False))
+    return outputs
+
+
+def available_stage_outputs(stageview, selection):
+    """
+    like the stage-output-selector expression, but usable before all selected
+    steps have a result. Outputs of steps without a result, or of step positions
+    that are only reserved, are returned as PendingOutput placeholders.
+
+    :param stageview: the workflow view objct
+    :param selection: the JSON-like selection dictionary
+    :return: the outputs, or None if they cannot be determined yet
+    """
+    if "stages" in selection or "steps" in selection:
+        query = selection.get("stages") or selection.get("steps")
+    elif "step" in selection:
+        query = selection["step"]
+    else:
+        return stage_output_selector(stageview, selection)
+
+    items = []
+    for match in stageview.query(query, stageview.steps):
+        value = match.value
+        items.extend(value if isinstance(value, list) else [value])
+    if not items or any("_openended" in item for item in items):
+        return None
+    if any("_offset" in item for item in items):
+        scopes_done = all(
+            stageview.wflow.scope_index.done(stageview.offset + item["_offset"])
+            for item in items
+            if "_offset" in item
+        )
+        return stage_output_selector(stageview, selection) if scopes_done else None
+
+    outputs = step_outputs(stageview, items, selection.get("output"))
+    if "step" in selection:
+        assert len(outputs) == 1
+        return outputs[0]
+    flatten = selection.get("flatten", False)
+    if flatten and any(isinstance(x, PendingOutput) for x in outputs):
+        # the lengths of pending outputs are unknown
+        return None
+    return combine_outputs(outputs, flatten, selection.get("unwrap", False))
+
+
 @expression("fromvalue")
 def value_resolver(view, expression):
     if "scope" in expression:
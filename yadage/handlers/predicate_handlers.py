@@ -1,7 +1,5 @@
 import logging
 
-import jsonpointer
-
 import yadage.handlers.utils as utils
 from yadage.handlers.expression_handlers import handlers as exprhandlers
 
@@ -10,34 +8,17 @@ log = logging.getLogger(__name__)
 handlers, predicate = utils.handler_decorator()
 
 
-def checkmeta(flowview, metainfo):
-    log.debug("checking meta %s on view with offset %s", metainfo, flowview.offset)
-    applied_ids = [rl.identifier for rl in flowview.applied_rules]
-    rulesok = all([x in applied_ids for x in metainfo["stages"]])
-
-    stepsok = all([flowview.dag.getNode(x).has_result() for x in metainfo["steps"]])
-    log.debug("all rules applied: %s, all steps have results: %s", rulesok, stepsok)
-    return rulesok and stepsok
-
-
 def scope_done(scope, flowview):
     """
-    walks recursively all scopes starting at some initial scope to determine if
-    all steps and stages under this scope have been executed / applied. Will indicate
-    that it's safe to reference any result of the workflow within that scope.
+    determine if all steps and stages under a scope (including its sub-scopes)
+    have been executed / applied. Will indicate that it's safe to reference any
+    result of the workflow within that scope.
+
+    :param scope: the scope offset, relative to the view
+    :param flowview: the workflow view
     """
     log.debug("checking scope %s on view with offset %s", scope, flowview.offset)
-    result = True
-
-    bookkeeper = jsonpointer.JsonPointer(scope).resolve(flowview.bookkeeper)
-    for k, v in bookkeeper.items():
-        for k, v in bookkeeper.items():
-            if k == "_meta":
-                result = result and checkmeta(flowview, v)
-            else:
-                childscope = scope + "/{}".format(k)
-                result = result and scope_done(childscope, flowview)
-    return result
+    return flowview.wflow.scope_index.done(flowview.offset + scope)
 
 
 @predicate("jsonpath_ready")
@@ -53,6 +34,15 @@ def jsonpath_ready(stage, depspec, stagespec):
         if not depmatches:
             log.debug("no query matches, not ready")
             return False
+        if any(
+            "_reserved" in item
+            for match in depmatches
+            for item in (
+                match.value if isinstance(match.value, list) else [match.value]
+            )
+        ):
+            log.debug("steps are yet to be scheduled, not ready")
+            return False
         issubwork = "_nodeid" not in depmatches[0].value[0]
         if issubwork:
             log.debug("dependency is a subworkflow. determine if scope is done")
@@ -1,22 +1,31 @@
-import copy
 import itertools
 import logging
 
-import jq
 import jsonpointer
+from adage import nodestate
+from packtivity.typedleafs import TypedLeafs
 
 import yadage.handlers.utils as utils
 
+from ..runtimestats import runtime_stats
 from ..stages import JsonStage
 from ..tasks import packtivity_task
 from ..utils import (
+    get_id_fromjson,
     init_stage_spec,
+    jq_compile,
     leaf_iterator_jsonlike,
     outputReference,
     process_jsonlike,
     pointerize,
 )
+from .expression_handlers import (
+    PendingOutput,
+    available_stage_outputs,
+    step_outputs,
+)
 from .expression_handlers import handlers as exprhandlers
+from .predicate_handlers import handlers as predhandlers
 
 log = logging.getLogger(__name__)
 
@@ -79,16 +88,41 @@ def finalize_input(jsondata, wflowview):
     :param step: the step that for which to track usage of upstream references
     :param jsondata: the prospective step parameters
 
-    :return: finalized step parameters
+    :return: finalized step parameters. Only the containers on the path to
+             upstream references are copied, the rest is shared with jsondata.
     """
-    result = copy.deepcopy(jsondata)
     inputs = []
-    for leaf_pointer, leaf_value in leaf_iterator_jsonlike(jsondata):
-        v = finalize_value(wflowview, leaf_value, inputs)
-        if leaf_pointer.path == "":
-            return v, inputs  # only one leaf
-        leaf_pointer.set(result, v)
-    return result, inputs
+    return resolve_references(wflowview, jsondata, inputs), inputs
+
+
+def resolve_references(wflowview, value, inputs):
+    """
+    recursively finalize the leaf values of a JSON-like value
+
+    :param wflowview: the workflow view against which to resolve upstream references
+    :param value: the JSON-like value
+    :param inputs: list to track the usage of upstream references in
+    :return: the finalized value. Unchanged values are returned as is.
+    """
+    if type(value) == list:
+        resolved = None
+        for i, x in enumerate(value):
+            v = resolve_references(wflowview, x, inputs)
+            if v is not x:
+                if resolved is None:
+                    resolved = list(value)
+                resolved[i] = v
+        return value if resolved is None else resolved
+    elif type(value) == dict:
+        resolved = None
+        for k, x in value.items():
+            v = resolve_references(wflowview, x, inputs)
+            if v is not x:
+                if resolved is None:
+                    resolved = dict(value)
+                resolved[k] = v
+        return value if resolved is None else resolved
+    return finalize_value(wflowview, value, inputs)
 
 
 def step_or_stages(name, spec, inputs, parameters, state_provider, stageview):
@@ -131,7 +165,8 @@ def step_or_stages(name, spec, inputs, parameters, state_provider, stageview):
         return None, stageobjects
     elif "cases" in spec:
         for x in spec["cases"]:
-            if parameters.jq(x["if"]).json():
+            selected = jq_compile(x["if"]).transform(parameters.typed(idleafs=True))
+            if TypedLeafs(selected, parameters.leafmodel, idleafs=True).json():
                 log.info("selected case %s", x["if"])
                 return step_or_stages(
                     name, x, inputs, parameters, state_provider, stageview
@@ -150,7 +185,7 @@ def registerExpressions(stage, expressions):
         stage.view.addValue(key, expression)
 
 
-def addStepOrWorkflow(name, stage, parameters, inputs, spec):
+def addStepOrWorkflow(name, stage, parameters, inputs, spec, index=None):
     """
     adds a step or a sub-workflow based on a init step
 
@@ -158,19 +193,22 @@ def addStepOrWorkflow(name, stage, parameters, inputs, spec):
     :param stage: the stage from which to use state context and workflow view
     :param step: either a packtivity_task (for normal workflow steps) initstep object (for sub-workflows)
     :param spec: the stage spec
+    :param index: reserved position of the stage to add the step at
 
-    :return: None
+    :return: the added node, if any
     """
     step, stages = step_or_stages(
         name, spec, inputs, parameters, stage.state_provider, stage.view
     )
+    node = None
     if step:
-        stage.addStep(step)
+        node = stage.addStep(step, index=index)
         log.debug("scheduled a step")
 
     if stages:  # subworkflow case
         stage.addWorkflow(stages, isolate=True)
         log.debug("scheduled a subworkflow")
+    return node
 
 
 def get_parameters(parameters):
@@ -235,15 +273,67 @@ def groupmany(iterable, batchsize=None, partitionsize=None):
     return iterable
 
 
-def scatter(parameters, scatter, batchsize=None, partitionsize=None):
+def scatter_factors(parameters, scatter, batchsize=None, partitionsize=None):
     """
-    convert a parameter set and scatter definition into a list
-    of single parameter sets.
+    :param parameters: the parameter definition
+    :param scatter: the scatter definition
+    :return: the parameters common to all parameter sets and a dict of the
+             scattered parameters to the list of their (batched) values
+    """
+    commonpars = parameters.copy()
+    to_scatter = {}
+    for scatpar in scatter["parameters"]:
+        to_scatter[scatpar] = groupmany(
+            commonpars.pop(scatpar), batchsize, partitionsize
+        )
+    return commonpars, to_scatter
+
+
+def scatter_length(factors, scatter):
+    """
+    :param factors: the scattered parameter values, as from scatter_factors
+    :param scatter: the scatter definition
+    :return: the number of parameter sets of the scatter
+    """
+    sizes = [len(factors[k]) for k in scatter["parameters"]]
+    if scatter["method"] == "zip":
+        return min(sizes)
+    nsets = 1
+    for size in sizes:
+        nsets *= size
+    return nsets
+
+
+def scatter_element(commonpars, factors, scatter, index):
+    """
+    :param commonpars: the common parameters, as from scatter_factors
+    :param factors: the scattered parameter values, as from scatter_factors
+    :param scatter: the scatter definition
+    :param index: the position of the parameter set in the scatter
+    :return: the parameter set at that position, without iterating over the
+             preceding ones
+    """
+    pars = commonpars.copy()
+    if scatter["method"] == "zip":
+        for k in scatter["parameters"]:
+            pars[k] = factors[k][index]
+        return pars
+    # the last parameter varies fastest, as in itertools.product
+    for k in reversed(scatter["parameters"]):
+        index, position = divmod(index, len(factors[k]))
+        pars[k] = factors[k][position]
+    return pars
+
+
+def iter_scatter(parameters, scatter, batchsize=None, partitionsize=None):
+    """
+    convert a parameter set and scatter definition into single parameter sets,
+    one at a time.
 
     :param parameters: the parameter definition
     :param scatter: scattering method. One of 'zip' or 'cartesian'
 
-    :return: list of parameter sets
+    :return: generator of parameter sets
     """
 
     log.debug(
@@ -253,29 +343,210 @@ def scatter(parameters, scatter, batchsize=None, partitionsize=None):
         batchsize,
         partitionsize,
     )
-    commonpars = parameters.copy()
-    to_scatter = {}
-    for scatpar in scatter["parameters"]:
-        to_scatter[scatpar] = groupmany(
-            commonpars.pop(scatpar), batchsize, partitionsize
-        )
+    commonpars, to_scatter = scatter_factors(
+        parameters, scatter, batchsize, partitionsize
+    )
 
-    singlesteppars = []
     if scatter["method"] == "zip":
         keys, zippable = zip(*[(k, v) for k, v in to_scatter.items()])
         for zipped in zip(*zippable):
             individualpars = dict(zip(keys, zipped))
             pars = commonpars.copy()
             pars.update(**individualpars)
-            singlesteppars += [pars]
+            yield pars
 
     if scatter["method"] == "cartesian":
         for what in itertools.product(*[to_scatter[k] for k in scatter["parameters"]]):
             individualpars = dict(zip(scatter["parameters"], what))
             pars = commonpars.copy()
             pars.update(**individualpars)
-            singlesteppars += [pars]
-    return singlesteppars
+            yield pars
+
+
+def scatter(parameters, scatter, batchsize=None, partitionsize=None):
+    """
+    convert a parameter set and scatter definition into a list
+    of single parameter sets.
+
+    :param parameters: the parameter definition
+    :param scatter: scattering method. One of 'zip' or 'cartesian'
+
+    :return: list of parameter sets
+    """
+    return list(iter_scatter(parameters, scatter, batchsize, partitionsize))
+
+
+def scatter_batching(spec):
+    """
+    determine how to batch the scattered parameters of a multistep stage. With
+    ``autobatch`` (a target runtime per step in seconds), the batchsize is set
+    from the recorded runtimes of earlier executions of the stage's step.
+
+    :param spec: stage JSON-like spec
+    :return: batchsize and partitionsize
+    """
+    if spec.get("batchsize") or spec.get("partitionsize") or not spec.get("autobatch"):
+        return spec.get("batchsize"), spec.get("partitionsize")
+    if "step" not in spec:
+        raise RuntimeError("autobatch is only supported for steps")
+    batchsize = runtime_stats().batchsize(spec["step"], spec["autobatch"])
+    log.info("batching %s elements per step", batchsize)
+    return batchsize, None
+
+
+def batch_elements(parameters, scatter):
+    """
+    :param parameters: the parameters of a batched step
+    :param scatter: the scatter definition
+    :return: the number of elements in the batch
+    """
+    return scatter_length(parameters, scatter)
+
+
+def select_available_parameter(wflowview, parameter):
+    """
+    like select_parameter, but stage outputs that are not available yet are
+    selected as PendingOutput placeholders
+
+    :return: the parameter value, or None if it cannot be determined yet
+    """
+    if isExpression(parameter):
+        if parameter["expression_type"] == "stage-output-selector":
+            return available_stage_outputs(wflowview, parameter)
+    return select_parameter(wflowview, parameter)
+
+
+def is_pending(value):
+    return any(isinstance(v, PendingOutput) for p, v in leaf_iterator_jsonlike(value))
+
+
+def pipeline_elements(stage, spec):
+    """
+    determines the elements of a pipelined multistep stage that can be scheduled
+
+    :param stage: common stage parent object
+    :param spec: stage JSON-like spec
+    :return: number of elements of the stage (None if not known yet) and the list
+             of (index, parameters) of the elements that are not yet scheduled
+             but whose referenced upstream outputs are available
+    """
+    if (
+        "step" not in spec
+        or spec["scatter"]["method"] != "zip"
+        or spec.get("batchsize")
+        or spec.get("partitionsize")
+        or spec.get("autobatch")
+    ):
+        raise RuntimeError(
+            "pipelining is only supported for zip-scattered steps without batching"
+        )
+    parameters = {}
+    for k, v in get_parameters(spec["parameters"]).items():
+        value = select_available_parameter(stage.view, v)
+        if value is None and isExpression(v):
+            return None, []
+        parameters[k] = value
+
+    singlesteppars = scatter(parameters, spec["scatter"])
+    scheduled = stage.view.steps.get(stage.name)
+    elements = [
+        (i, pars)
+        for i, pars in enumerate(singlesteppars)
+        if (scheduled is None or "_reserved" in scheduled[i]) and not is_pending(pars)
+    ]
+    return len(singlesteppars), elements
+
+
+def upstream_scheduled(stage, depspec, spec):
+    """
+    relaxed dependency check for streaming stages: upstream stages referenced
+    by jsonpath_ready dependencies need to be scheduled, but not finished
+
+    :param stage: common stage parent object
+    :param depspec: the dependency spec
+    :param spec: stage JSON-like spec
+    """
+    if not depspec:
+        return True
+    if depspec["dependency_type"] == "jsonpath_ready":
+        return all(
+            stage.view.query(x, stage.view.steps) for x in depspec["expressions"]
+        )
+    return predhandlers[depspec["dependency_type"]](stage, depspec, spec)
+
+
+def add_continuation(stage, spec, progress):
+    """
+    adds a copy of a streaming stage's rule to schedule its remaining steps
+
+    :param stage: common stage parent object
+    :param spec: stage JSON-like spec
+    :param progress: JSON-like description of the scheduled steps, which makes
+                     the identifier of the new rule unique
+    :return: the new rule
+    """
+    rule = JsonStage(
+        {"name": stage.name, "scheduler": spec, "dependencies": stage.depspec},
+        stage.state_provider,
+    )
+    identifier = get_id_fromjson(
+        {"rule": rule.json(), "offset": stage.view.offset, "progress": progress}
+    )
+    stage.view.addRule(rule, identifier=identifier)
+    return rule
+
+
+def pipeline_ready(stage, depspec, spec):
+    """
+    predicate of pipelined multistep stages. Instead of waiting for the upstream
+    stages to finish, the stage is ready as soon as any of its elements can be
+    scheduled. Before its first application the stage is ready once the number
+    of its elements is known.
+
+    :param stage: common stage parent object
+    :param depspec: the dependency spec
+    :param spec: stage JSON-like spec
+    """
+    if not upstream_scheduled(stage, depspec, spec):
+        return False
+    nelements, elements = pipeline_elements(stage, spec)
+    if nelements is None:
+        return False
+    return stage.name not in stage.view.steps or bool(elements)
+
+
+def pipelined_multistep_stage(stage, spec):
+    """
+    schedules the elements of a pipelined multistep stage that are ready and
+    adds a rule to schedule the remaining ones later on. Positions of the
+    stage's steps are reserved upfront, so that downstream stages keep the
+    element order.
+
+    :param stage: common stage parent object
+    :param spec: stage JSON-like spec
+
+    :return: None
+    """
+    nelements, elements = pipeline_elements(stage, spec)
+    if stage.name not in stage.view.steps:
+        stage.view.reserveSteps(stage.name, nelements)
+
+    log.info("scheduling %s of %s elements", len(elements), nelements)
+    for i, pars in elements:
+        singlename = "{}_{}".format(stage.name, i)
+        finalized, inputs = finalize_input(pars, stage.view)
+        finalized = stage.datamodel.create(
+            finalized, getattr(stage.state_provider, "datamodel", None)
+        )
+        addStepOrWorkflow(singlename, stage, finalized, inputs, spec, index=i)
+
+    steps = stage.view.steps[stage.name]
+    if any("_reserved" in x for x in steps):
+        add_continuation(
+            stage, spec, [i for i, x in enumerate(steps) if "_nodeid" in x]
+        )
+    else:
+        registerExpressions(stage, spec.get("register_values"))
 
 
 @scheduler("multistep-stage")
@@ -292,11 +563,22 @@ def multistep_stage(stage, spec):
 
     Nodes are attached to the DAG based on used upstream inputs
 
+    With ``pipeline`` set in the spec, elements of ``zip`` scatters are scheduled
+    one by one as soon as the upstream outputs they reference are available.
+    With ``window`` set, at most that many nodes of the stage are unfinished at
+    any time, and further nodes are scheduled as the earlier ones finish.
+    With ``autobatch`` set, the scattered parameters are batched such that the
+    steps run for about that many seconds (see ``scatter_batching``).
+
     :param stage: common stage parent object
     :param spec: stage JSON-like spec
 
     :return: None
     """
+    if spec.get("pipeline"):
+        return pipelined_multistep_stage(stage, spec)
+    if spec.get("window"):
+        return windowed_multistep_stage(stage, spec)
     log.info("scheduling multistep stage with spec:\n%s", spec)
     log.debug("selecting parameters")
     parameters = {
@@ -304,9 +586,8 @@ def multistep_stage(stage, spec):
         for k, v in get_parameters(spec["parameters"]).items()
     }
     log.info("scattering")
-    singlesteppars = scatter(
-        parameters, spec["scatter"], spec.get("batchsize"), spec.get("partitionsize")
-    )
+    batchsize, partitionsize = scatter_batching(spec)
+    singlesteppars = scatter(parameters, spec["scatter"], batchsize, partitionsize)
 
     log.info("scattering")
 
@@ -316,20 +597,298 @@ def multistep_stage(stage, spec):
         finalized = stage.datamodel.create(
             finalized, getattr(stage.state_provider, "datamodel", None)
         )
-        addStepOrWorkflow(singlename, stage, finalized, inputs, spec)
+        node = addStepOrWorkflow(singlename, stage, finalized, inputs, spec)
+        if node and (batchsize or partitionsize):
+            node.task.metadata["wflow_elements"] = batch_elements(pars, spec["scatter"])
     registerExpressions(stage, spec.get("register_values"))
 
 
+def treereduce_levels(nitems, fanin):
+    """
+    :param nitems: number of items to reduce
+    :param fanin: maximum number of items merged by a single step
+    :return: list of the number of steps on each level of the reduction tree.
+             The last level is a single step.
+    """
+    levels = []
+    while True:
+        nitems = max(1, -(-nitems // fanin))
+        levels.append(nitems)
+        if nitems == 1:
+            return levels
+
+
+def treereduce_steps(stage, spec):
+    """
+    determines the steps of a tree reduction that can be scheduled
+
+    :param stage: common stage parent object
+    :param spec: stage JSON-like spec
+    :return: the number of steps on each level (None if not known yet) and a list
+             of (stagename, index, name, parameters) of the steps that are not yet
+             scheduled but whose inputs are available
+    """
+    reducespec = spec["reduce"]
+    parameters = {}
+    for k, v in get_parameters(spec["parameters"]).items():
+        value = select_available_parameter(stage.view, v)
+        if value is None and isExpression(v):
+            return None, []
+        parameters[k] = value
+    items = parameters.pop(reducespec["parameter"])
+    items = items if isinstance(items, list) else [items]
+
+    fanin = reducespec["fanin"]
+    levels = treereduce_levels(len(items), fanin)
+    partials = stage.view.steps.get(treereduce_partials(stage.name))
+    final = stage.view.steps.get(stage.name)
+
+    steps = []
+    offset = 0
+    for level, nsteps in enumerate(levels):
+        if level == len(levels) - 1:
+            stagename, start, positions = stage.name, 0, final
+        else:
+            stagename, start = treereduce_partials(stage.name), offset
+            positions = partials[start : start + nsteps] if partials else None
+            offset += nsteps
+        for i in range(nsteps):
+            group = items[i * fanin : (i + 1) * fanin]
+            if positions is not None and "_reserved" not in positions[i]:
+                continue
+            if is_pending(group):
+                continue
+            pars = dict(parameters, **{reducespec["parameter"]: group})
+            if stagename == stage.name:
+                name = stage.name
+            else:
+                name = "{}_{}_{}".format(stagename, level, i)
+            steps.append((stagename, start + i, name, pars))
+        if positions is None:
+            # the next levels depend on steps that are not scheduled yet
+            break
+        items = step_outputs(stage.view, positions, reducespec.get("output"))
+    return levels, steps
+
+
+def treereduce_partials(stagename):
+    """
+    :return: name under which the intermediate steps of a tree reduction are tracked
+    """
+    return "{}_partials".format(stagename)
+
+
+def treereduce_ready(stage, depspec, spec):
+    """
+    predicate of tree reduction stages, ready as soon as a group of inputs can
+    be merged. Before its first application the stage is ready once the number
+    of its inputs is known.
+
+    :param stage: common stage parent object
+    :param depspec: the dependency spec
+    :param spec: stage JSON-like spec
+    """
+    if not upstream_scheduled(stage, depspec, spec):
+        return False
+    levels, steps = treereduce_steps(stage, spec)
+    if levels is None:
+        return False
+    return stage.name not in stage.view.steps or bool(steps)
+
+
+def window_running(stage, spec):
+    """
+    :return: ids of the unfinished nodes of a windowed multistep stage
+    """
+    progress = spec.get("_window", {"running": []})
+    return [
+        nodeid
+        for nodeid in progress["running"]
+        if stage.view.dag.getNode(nodeid).state
+        not in [nodestate.SUCCESS, nodestate.FAILED]
+    ]
+
+
+def window_ready(stage, depspec, spec):
+    """
+    predicate of windowed multistep stages. On top of the stage's dependencies,
+    further steps are only scheduled once there is room in the window.
+
+    :param stage: common stage parent object
+    :param depspec: the dependency spec
+    :param spec: stage JSON-like spec
+    """
+    if depspec and not predhandlers[depspec["dependency_type"]](stage, depspec, spec):
+        return False
+    return len(window_running(stage, spec)) < spec["window"]
+
+
+def window_scatter(stage, spec, progress):
+    """
+    the scatter of a windowed multistep stage. It is selected on the first
+    application and kept on the continuation rules, so that the stage is only
+    selected again after the workflow is reloaded.
+
+    :param stage: common stage parent object
+    :param spec: stage JSON-like spec
+    :param progress: the progress of the stage
+    :return: batchsize, partitionsize and the common and scattered parameters
+    """
+    cached = getattr(stage, "window_scatter", None)
+    if cached is not None:
+        return cached
+    parameters = {
+        k: select_parameter(stage.view, v)
+        for k, v in get_parameters(spec["parameters"]).items()
+    }
+    # keep the batches of the first application (autobatch sizes may change)
+    batchsize, partitionsize = progress.get("batching") or scatter_batching(spec)
+    commonpars, factors = scatter_factors(
+        parameters, spec["scatter"], batchsize, partitionsize
+    )
+    return batchsize, partitionsize, commonpars, factors
+
+
+def windowed_multistep_stage(stage, spec):
+    """
+    schedules the next elements of a windowed multistep stage, such that at most
+    ``window`` of its nodes are unfinished at any time. The elements are looked
+    up by their position in the scatter, and a rule to schedule further elements
+    is added as long as there are elements left. The rule tracks the number of
+    scheduled elements and the unfinished nodes.
+
+    :param stage: common stage parent object
+    :param spec: stage JSON-like spec
+
+    :return: None
+    """
+    if "step" not in spec:
+        raise RuntimeError("windowed scheduling is only supported for steps")
+    progress = spec.get("_window", {"scheduled": 0})
+    batchsize, partitionsize, commonpars, factors = window_scatter(
+        stage, spec, progress
+    )
+    nelements = scatter_length(factors, spec["scatter"])
+    running = window_running(stage, spec)
+    start = progress["scheduled"]
+    end = min(start + spec["window"] - len(running), nelements)
+
+    stage.view.releaseSteps(stage.name)
+    log.info("scheduling elements %s to %s", start, end)
+    for i in range(start, end):
+        pars = scatter_element(commonpars, factors, spec["scatter"], i)
+        singlename = "{}_{}".format(stage.name, i)
+        finalized, inputs = finalize_input(pars, stage.view)
+        finalized = stage.datamodel.create(
+            finalized, getattr(stage.state_provider, "datamodel", None)
+        )
+        node = addStepOrWorkflow(singlename, stage, finalized, inputs, spec)
+        if batchsize or partitionsize:
+            node.task.metadata["wflow_elements"] = batch_elements(pars, spec["scatter"])
+        running.append(node.identifier)
+
+    if end < nelements:
+        # keep downstream stages from considering the stage done
+        stage.view.reserveSteps(stage.name, 1, openended=True)
+        progress = {
+            "scheduled": end,
+            "running": running,
+            "batching": [batchsize, partitionsize],
+        }
+        rule = add_continuation(stage, dict(spec, _window=progress), end)
+        rule.window_scatter = (batchsize, partitionsize, commonpars, factors)
+    else:
+        registerExpressions(stage, spec.get("register_values"))
+
+
+def streaming_predicate(spec):
+    """
+    :param spec: stage JSON-like spec
+    :return: the predicate of a stage that schedules its steps incrementally,
+             None for stages that schedule all steps at once
+    """
+    if spec.get("scheduler_type") == "treereduce-stage":
+        return treereduce_ready
+    if spec.get("pipeline"):
+        return pipeline_ready
+    if spec.get("window"):
+        return window_ready
+    return None
+
+
+def streaming_dependencies_ready(stage, depspec, spec):
+    """
+    the dependency check of a stage that schedules its steps incrementally,
+    regardless of whether it has steps left to schedule
+
+    :param stage: common stage parent object
+    :param depspec: the dependency spec
+    :param spec: stage JSON-like spec
+    """
+    if streaming_predicate(spec) is window_ready:
+        return not depspec or predhandlers[depspec["dependency_type"]](
+            stage, depspec, spec
+        )
+    return upstream_scheduled(stage, depspec, spec)
+
+
+@scheduler("treereduce-stage")
+def treereduce_stage(stage, spec):
+    """
+    a stage that merges a list of upstream outputs with a tree of steps, each
+    merging at most ``fanin`` items. Groups of items are merged as soon as the
+    upstream outputs in the group are available, and the outputs of the merges
+    are merged in turn until a single step is left. That final step is tracked
+    as the stage's step, the intermediate ones under ``<stage>_partials``.
+
+    The ``reduce`` section of the spec sets the ``parameter`` holding the list of
+    items, the ``fanin`` and the ``output`` of the step that is to be merged on
+    the next level. The merge step needs to be associative.
+
+    :param stage: common stage parent object
+    :param spec: stage JSON-like spec
+
+    :return: None
+    """
+    if "step" not in spec:
+        raise RuntimeError("tree reduction is only supported for steps")
+    levels, steps = treereduce_steps(stage, spec)
+    partials = treereduce_partials(stage.name)
+    if stage.name not in stage.view.steps:
+        stage.view.reserveSteps(partials, sum(levels[:-1]))
+        stage.view.reserveSteps(stage.name, 1)
+
+    log.info("scheduling %s merges of a %s-level reduction", len(steps), len(levels))
+    for stagename, index, name, pars in steps:
+        finalized, inputs = finalize_input(pars, stage.view)
+        finalized = stage.datamodel.create(
+            finalized, getattr(stage.state_provider, "datamodel", None)
+        )
+        step, _ = step_or_stages(
+            name, spec, inputs, finalized, stage.state_provider, stage.view
+        )
+        dependencies = [stage.view.dag.getNode(k.stepid) for k in step.inputs]
+        stage.view.addStep(step, stagename, depends_on=dependencies, index=index)
+
+    if "_reserved" in stage.view.steps[stage.name][0]:
+        scheduled = [
+            i for i, x in enumerate(stage.view.steps[partials]) if "_nodeid" in x
+        ]
+        add_continuation(stage, spec, scheduled)
+    else:
+        registerExpressions(stage, spec.get("register_values"))
+
+
 def process_noderef(leafobj, resultscript, view):
     n = view.dag.getNode(leafobj["_nodeid"])
-    return jq.jq(resultscript).transform(
+    return jq_compile(resultscript).transform(
         pointerize(n.result, False, n.identifier), multiple_output=True
     )
 
 
 def process_wflowref(leafobj, view):
     nodeselector, resultscript = leafobj["$wflowref"]
-    nodestruct = jq.jq(nodeselector).transform(view.steps, multiple_output=True)
+    nodestruct = jq_compile(nodeselector).transform(view.steps, multiple_output=True)
     return process_jsonlike(
         nodestruct, 'has("_nodeid")', lambda x: process_noderef(x, resultscript, view)
     )
@@ -354,7 +913,7 @@ def jq_stage(stage, spec):
     )
     log.info("transforming binds: %s", binds)
     stagescript = spec["stepscript"]
-    singlesteps = jq.jq(stagescript).transform(binds, multiple_output=False)
+    singlesteps = jq_compile(stagescript).transform(binds, multiple_output=False)
 
     singlesteppars = map(
         lambda x: process_jsonlike(x, 'has("$wflowpointer")', process_wflowpointer),
@@ -367,7 +926,7 @@ def jq_stage(stage, spec):
 
         finalized, inputs = finalize_input(pars, stage.view)
         log.info("postscripting: %s", finalized)
-        after_post = jq.jq(postscript).transform(finalized, multiple_output=False)
+        after_post = jq_compile(postscript).transform(finalized, multiple_output=False)
         after_post = stage.datamodel.create(after_post)
         log.info("finalized to: %s", after_post)
         addStepOrWorkflow(singlename, stage, after_post, inputs, spec)
@@ -112,15 +112,17 @@ def click_print_applicable_stages(controller):
 def click_print_submittable_nodes(controller):
     click.secho("Submittable Nodes: ", fg="blue")
     _, s2r, _ = utils.rule_steps_indices(controller.adageobj)
+    submittable = set(controller.submittable_nodes())
     for x in controller.adageobj.dag.nodes():
+        if x not in submittable:
+            continue
         node = controller.adageobj.dag.getNode(x)
         rule = controller.adageobj.view().getRule(identifier=s2r[node.identifier])
-        if node.identifier in controller.submittable_nodes():
-            click.secho(
-                "node: {} ({}) part of stage {}".format(
-                    node.name, node.identifier, "/".join([rule.offset, rule.rule.name])
-                )
+        click.secho(
+            "node: {} ({}) part of stage {}".format(
+                node.name, node.identifier, "/".join([rule.offset, rule.rule.name])
             )
+        )
 
 
 def click_print_rule(rule, step_index, subrule_index, step_status):
@@ -143,12 +145,17 @@ def click_print_rule(rule, step_index, subrule_index, step_status):
 def click_print_applied_stages(controller):
     click.secho("Applied Stages: ", fg="blue")
     r2s, s2r, r2sub = utils.rule_steps_indices(controller.adageobj)
-    step_status = {s: str(controller.adageobj.dag.getNode(s).state) for s in s2r.keys()}
+    step_status = {
+        s: str(controller.adageobj.dag.nodeStatus(s).state) for s in s2r.keys()
+    }
     # print(step_status)
-    for x in sorted(
-        controller.adageobj.applied_rules,
-        key=lambda r: "{}/{}".format(r.offset, r.rule.name),
-    ):
+    # continuation rules are listed with their stage
+    applied = [
+        group[0]
+        for group in utils.rule_groups(controller.adageobj)
+        if group[0] in controller.adageobj.applied_rules
+    ]
+    for x in sorted(applied, key=lambda r: "{}/{}".format(r.offset, r.rule.name)):
         click_print_rule(x, r2s, r2sub, step_status)
 
 
@@ -188,35 +195,40 @@ def apply_stage(
         click_print_applicable_stages(controller)
         return
 
-    for n in name:
-        offset, scopedname = n.rsplit("/", 1)
-        rule = controller.adageobj.view(offset).getRule(scopedname)
-        if not rule:
-            click.secho(
-                "No such stage {}, pick one of the applicable below:".format(n),
-                fg="red",
-            )
-            click_print_applicable_stages(controller)
-            return
+    with manualutils.batch(controller):
+        for n in name:
+            offset, scopedname = n.rsplit("/", 1)
+            rule = controller.adageobj.view(offset).getRule(scopedname)
+            if not rule:
+                click.secho(
+                    "No such stage {}, pick one of the applicable below:".format(n),
+                    fg="red",
+                )
+                click_print_applicable_stages(controller)
+                return
 
-        if rule.identifier in [r.identifier for r in controller.adageobj.applied_rules]:
-            click.secho("Stage {} was already applied.".format(n), fg="yellow")
-            continue
+            if rule.identifier in [
+                r.identifier for r in controller.adageobj.applied_rules
+            ]:
+                click.secho("Stage {} was already applied.".format(n), fg="yellow")
+                continue
 
-        if rule.identifier not in controller.applicable_rules():
-            click.secho("Rule {} not yet applicable".format(n), fg="red")
-            continue
+            if rule.identifier not in controller.applicable_rules():
+                click.secho("Rule {} not yet applicable".format(n), fg="red")
+                continue
 
-        controller.apply_rules([rule.identifier])
+            controller.apply_rules([rule.identifier])
 
-        if submit:
-            _, s2r, _ = utils.rule_steps_indices(controller.adageobj)
-            nodes_to_submit = [
-                x for x in controller.submittable_nodes() if s2r[x] == rule.identifier
-            ]
-            controller.submit_nodes(nodes_to_submit)
+            if submit:
+                r2s, _, _ = utils.rule_steps_indices(controller.adageobj)
+                nodes_to_submit = [
+                    x
+                    for x in controller.submittable_nodes()
+                    if x in r2s[rule.identifier]
+                ]
+                controller.submit_nodes(nodes_to_submit)
 
-        click.secho("Stage {} applied".format(n), fg="green")
+            click.secho("Stage {} applied".format(n), fg="green")
 
 
 @mancli.command()
@@ -266,8 +278,8 @@ def submit(
             return
 
         all_submittable = controller.submittable_nodes()
-        _, s2r, _ = utils.rule_steps_indices(controller.adageobj)
-        nodes_to_submit = [x for x in all_submittable if s2r[x] == rule.identifier]
+        r2s, _, _ = utils.rule_steps_indices(controller.adageobj)
+        nodes_to_submit = [x for x in all_submittable if x in r2s[rule.identifier]]
 
     if not nodes_to_submit:
         click.secho("No nodes to submit (perhaps already submitted?)", fg="yellow")
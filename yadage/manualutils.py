@@ -1,3 +1,4 @@
+import contextlib
 import logging
 
 from .steering_object import YadageSteering
@@ -24,6 +25,19 @@ def connect(
     return ys
 
 
+@contextlib.contextmanager
+def batch(controller):
+    """
+    run the enclosed controller operations in a single transaction, if the
+    controller supports batching them.
+    """
+    if hasattr(controller, "batch"):
+        with controller.batch():
+            yield
+    else:
+        yield
+
+
 def preview_rule(wflow, name=None, identifier=None):
     stateopts = {}
     newflow = YadageWorkflow.fromJSON(wflow.json(), stateopts)
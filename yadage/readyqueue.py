@@ -0,0 +1,100 @@
+import collections
+import logging
+
+from adage import nodestate
+
+log = logging.getLogger(__name__)
+
+
+class ReadyQueue(object):
+    """
+    Frontier of the nodes of a workflow DAG that are ready to be submitted,
+    i.e. that were not yet submitted and whose predecessors all succeeded.
+
+    Unsubmitted nodes carry a count of their predecessors that have not yet
+    succeeded. Only submitted nodes that are not finished are polled for
+    state changes. Once such a node succeeds, the counts of its successors
+    are decremented and those with no pending predecessors left are queued.
+    """
+
+    def __init__(self, wflow):
+        self.wflow = wflow
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        drop the frontier. It is rebuilt from the DAG on the next access.
+        """
+        self.pending = None  # unsubmitted node id -> number of pending predecessors
+        self.queue = collections.OrderedDict()  # ids of ready nodes
+        self.running = set()  # ids of submitted nodes that are not finished
+        self.succeeded = set()
+
+    def build(self):
+        dag = self.wflow.dag
+        self.pending = {}
+        unsubmitted = []
+        for n in dag.nodes():
+            status = dag.nodeStatus(n)
+            if not status.submit_time:
+                unsubmitted.append(n)
+            elif status.state == nodestate.SUCCESS:
+                self.succeeded.add(n)
+            elif status.state != nodestate.FAILED:
+                self.running.add(n)
+        for n in unsubmitted:
+            self.node_added(n)
+
+    def node_added(self, nodeid):
+        """
+        track a new, unsubmitted node. Its edges must already be in the DAG.
+        """
+        if self.pending is None:
+            return
+        predecessors = self.wflow.dag.predecessors(nodeid)
+        self.pending[nodeid] = sum(1 for x in predecessors if x not in self.succeeded)
+        if not self.pending[nodeid]:
+            self.queue[nodeid] = None
+
+    def submitted(self, nodeids):
+        """
+        track that nodes have been submitted
+        """
+        if self.pending is None:
+            return
+        for n in nodeids:
+            self.pending.pop(n, None)
+            self.queue.pop(n, None)
+            self.running.add(n)
+
+    def update(self):
+        """
+        process the state changes of submitted nodes
+        """
+        dag = self.wflow.dag
+        # nodes may have been submitted without passing through the controller
+        self.submitted([n for n in self.queue if dag.nodeStatus(n).submit_time])
+
+        for n in list(self.running):
+            state = dag.nodeStatus(n).state
+            if state == nodestate.FAILED:
+                self.running.discard(n)
+            elif state == nodestate.SUCCESS:
+                self.running.discard(n)
+                self.succeeded.add(n)
+                for x in dag.successors(n):
+                    if x not in self.pending:
+                        continue
+                    self.pending[x] -= 1
+                    if not self.pending[x]:
+                        self.queue[x] = None
+
+    def ready(self):
+        """
+        :return: list of ids of the nodes that are ready to be submitted
+        """
+        if self.pending is None:
+            self.build()
+        self.update()
+        log.debug("%s nodes ready, %s running", len(self.queue), len(self.running))
+        return list(self.queue)
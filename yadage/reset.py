@@ -46,23 +46,26 @@ def remove_rule(workflow, ruleid):
 def remove_rules(workflow, ruleids):
     for r in ruleids:
         remove_rule(workflow, r)
+    workflow.rule_index.invalidate()
+    workflow.scope_index.invalidate()
+    workflow.ready_queue.invalidate()
 
 
 def undo_rule(workflow, ruleid):
-    r2s, s2r, r2subscopes = utils.rule_steps_indices(workflow)
+    r2s, _, r2subscopes = utils.rule_steps_indices(workflow)
 
-    if not ruleid in [r.identifier for r in workflow.applied_rules]:
-        ruleobj = workflow.view().getRule(identifier=ruleid)
+    # the continuation rules of a streaming stage are undone along with
+    # the rule originally added for the stage
+    group = utils.rule_group(workflow, ruleid)
+    if not any(r in workflow.applied_rules for r in group):
         log.debug(
-            "rule %s/%s not in list of applied rules. possibly already undone during recursion.",
-            ruleobj.offset,
-            ruleobj.rule.name,
+            "rule %s not in list of applied rules. possibly already undone during recursion.",
+            ruleid,
         )
         return
+    ruleid = group[0].identifier
 
-    downstream_nodes_rules = list(
-        set([s2r[s] for s in collective_downstream(workflow, r2s[ruleid])])
-    )
+    downstream_nodes_rules = downstream_rules(workflow, ruleid)
 
     r = workflow.view().getRule(identifier=ruleid)
     log.debug(
@@ -73,11 +76,8 @@ def undo_rule(workflow, ruleid):
     )
 
     assert ruleid not in downstream_nodes_rules
-    # TODO: not an issue now, but if stages schedule linked nodes we might
-    # we might see downstream steps that are part of the same rule
 
     if not downstream_nodes_rules:
-        idx = workflow.applied_rules.index(r)
         stepids = r2s[ruleid]
         steps = [workflow.dag.getNode(nid) for nid in stepids]
 
@@ -104,6 +104,8 @@ def undo_rule(workflow, ruleid):
                 )
                 undo_rule(workflow, subrule)
 
+            # undoing streaming stages removes their continuation rules
+            subrules = utils.stages_in_scope(workflow, subscope)
             log.debug("removing %s subrules", len(subrules))
             for subruleidx, subrule in enumerate(subrules):
                 subruleobj = workflow.view().getRule(identifier=subrule)
@@ -111,18 +113,24 @@ def undo_rule(workflow, ruleid):
                     "remove sub DAG rule %s/%s", subruleobj.offset, subruleobj.rule.name
                 )
                 remove_rule(workflow, subrule)
-        # remove rule from applied list
-        r = workflow.applied_rules.pop(idx)
+        # remove the rules of the stage from the applied and pending lists
+        for rule in group:
+            if rule in workflow.applied_rules:
+                workflow.applied_rules.remove(rule)
+            else:
+                workflow.rules.remove(rule)
+            workflow.view(r.offset).bookkeeper["_meta"]["stages"].remove(
+                rule.identifier
+            )
 
         # reset all index data for stage
-        workflow.view(r.offset).steps.pop(r.rule.name)
+        for name in utils.stage_step_names(r):
+            workflow.view(r.offset).steps.pop(name, None)
 
-        # remove steps and stage from bookkeeping
+        # remove steps from bookkeeping
         for s in stepids:
             workflow.view(r.offset).bookkeeper["_meta"]["steps"].remove(s)
 
-        workflow.view(r.offset).bookkeeper["_meta"]["stages"].remove(ruleid)
-
         # re-append the rule
         log.debug("re-appened {}/{}".format(r.offset, r.rule.name))
 
@@ -131,8 +139,8 @@ def undo_rule(workflow, ruleid):
         assert newid == r.identifier
 
         log.debug("undo any rules that would not be applicable now")
-        for rule in workflow.applied_rules:
-            if not rule.applicable(workflow):
+        for rule in list(workflow.applied_rules):
+            if not rule.dependencies_ready(workflow):
                 ruleobj = workflow.view().getRule(identifier=rule.identifier)
                 log.debug(
                     "rule would not be appilcable in current state so undo >> %s/%s",
@@ -153,10 +161,7 @@ def undo_rule(workflow, ruleid):
             log.debug("undoing a downstream rule")
             undo_rule(workflow, r)
             log.debug("undone a downstream rule")
-        r2s, s2r, _ = utils.rule_steps_indices(workflow)
-        downstream_nodes_rules = list(
-            set([s2r[s] for s in collective_downstream(workflow, r2s[ruleid])])
-        )
+        downstream_nodes_rules = downstream_rules(workflow, ruleid)
         log.debug(
             "re-asses if there are still any downstream rules: {}".format(
                 len(downstream_nodes_rules)
@@ -169,11 +174,27 @@ def undo_rule(workflow, ruleid):
 def undo_rules(workflow, ruleids):
     for r in ruleids:
         undo_rule(workflow, r)
+    workflow.rule_index.invalidate()
+    workflow.scope_index.invalidate()
+    workflow.ready_queue.invalidate()
 
 
 def reset_steps(workflow, steps):
     for s in steps:
         reset_step(workflow, s)
+    workflow.rule_index.invalidate()
+    workflow.scope_index.invalidate()
+    workflow.ready_queue.invalidate()
+
+
+def downstream_rules(workflow, ruleid):
+    """
+    :return: the rules of the steps downstream of the steps of the rule's
+             stage, other than the stage itself (e.g. a tree reduction)
+    """
+    r2s, s2r, _ = utils.rule_steps_indices(workflow)
+    downstream = set(collective_downstream(workflow, r2s[ruleid]))
+    return list(set(s2r[s] for s in downstream.difference(r2s[ruleid])))
 
 
 def collective_downstream(workflow, steps):
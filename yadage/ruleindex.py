@@ -0,0 +1,129 @@
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def _scope_and_parents(offset):
+    """
+    :param offset: a scope offset (JSON pointer path)
+    :return: the offset and the offsets of all enclosing scopes
+    """
+    parts = offset.split("/")
+    return ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+class RuleIndex(object):
+    """
+    Index of pending rules that were found not to be applicable, together
+    with what their predicates depended on, i.e. the nodes they accessed and
+    the scope they were evaluated in. A rule is only re-evaluated once one of
+    these changed.
+
+    Predicates only see the part of the workflow below their scope offset,
+    so structural changes (new steps, rules or values) in a scope may only
+    affect rules at that scope or at enclosing scopes.
+    """
+
+    def __init__(self, wflow):
+        self.wflow = wflow
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        forget all cached predicate results
+        """
+        self.not_applicable = {}  # rule id -> (offset, ids of accessed nodes)
+        self.by_offset = {}  # offset -> ids of not applicable rules at that offset
+        self.watchers = {}  # node id -> ids of rules whose predicate accessed it
+        self.fingerprints = {}  # node id -> fingerprint at the time it was accessed
+        self.changed_offsets = set()
+
+    def changed(self, offset):
+        """
+        record a structural change within a scope
+
+        :param offset: the offset of the scope
+        """
+        self.changed_offsets.add(offset)
+
+    def fingerprint(self, nodeid):
+        """
+        :return: the parts of the node state that predicates depend on
+        """
+        node = self.wflow.dag.getNode(nodeid)
+        return (node.state, node.has_result())
+
+    def forget(self, ruleid):
+        """
+        drop the cached predicate result of a rule
+        """
+        if ruleid not in self.not_applicable:
+            return
+        offset, accessed = self.not_applicable.pop(ruleid)
+        self.by_offset[offset].discard(ruleid)
+        for nodeid in accessed:
+            self.watchers.get(nodeid, set()).discard(ruleid)
+
+    def node_changed(self, nodeid):
+        for ruleid in list(self.watchers.pop(nodeid, [])):
+            self.forget(ruleid)
+        self.fingerprints.pop(nodeid, None)
+
+    def process_changes(self):
+        """
+        drop cached predicate results that may have changed
+        """
+        for offset in self.changed_offsets:
+            for scope in _scope_and_parents(offset):
+                for ruleid in list(self.by_offset.get(scope, [])):
+                    self.forget(ruleid)
+        self.changed_offsets = set()
+
+        dag = self.wflow.dag
+        for nodeid, fingerprint in list(self.fingerprints.items()):
+            if nodeid not in dag or self.fingerprint(nodeid) != fingerprint:
+                self.node_changed(nodeid)
+
+    def record(self, rule, accessed):
+        """
+        cache that a rule is not applicable
+
+        :param rule: the rule
+        :param accessed: the ids of the nodes accessed by the rule's predicate
+        """
+        self.not_applicable[rule.identifier] = (rule.offset, accessed)
+        self.by_offset.setdefault(rule.offset, set()).add(rule.identifier)
+        for nodeid in accessed:
+            fingerprint = self.fingerprint(nodeid)
+            if self.fingerprints.setdefault(nodeid, fingerprint) != fingerprint:
+                # changed while evaluating this round, recheck other watchers
+                self.node_changed(nodeid)
+                self.fingerprints[nodeid] = fingerprint
+            self.watchers.setdefault(nodeid, set()).add(rule.identifier)
+
+    def applicable_rules(self):
+        """
+        :return: the list of pending rules whose predicate is fulfilled
+        """
+        self.process_changes()
+        dag = self.wflow.dag
+        applicable = []
+        nskipped = 0
+        for rule in self.wflow.rules:
+            if rule.identifier in self.not_applicable:
+                nskipped += 1
+                continue
+            accessed = set()
+            dag.access_log = accessed
+            try:
+                isapplicable = rule.applicable(self.wflow)
+            finally:
+                dag.access_log = None
+            if isapplicable:
+                applicable.append(rule)
+            else:
+                self.record(rule, accessed)
+        log.debug(
+            "%s rules applicable, skipped %s unchanged rules", len(applicable), nskipped
+        )
+        return applicable
@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import tempfile
+
+from .backends.trivialbackend import TrivialProxy
+from .utils import json_hash
+
+log = logging.getLogger(__name__)
+
+
+class RuntimeStats(object):
+    """
+    Records the runtimes of executed steps by the hash of their packtivity spec.
+    Runtimes are normalized to the number of elements a step processed (e.g.
+    the size of its batch), so that they can be used to size batches.
+    """
+
+    def __init__(self, statsfile=None):
+        """
+        :param statsfile: path of a JSON file to keep the statistics in across
+                          workflow runs. If None, they are only kept in memory.
+        """
+        self.statsfile = statsfile
+        self.stats = {}
+        if statsfile and os.path.exists(statsfile):
+            log.info("reading runtime statistics from %s", statsfile)
+            try:
+                with open(statsfile) as fp:
+                    self.stats = json.load(fp)
+            except (IOError, OSError, ValueError):
+                log.warning("could not read runtime statistics from %s", statsfile)
+
+    def todisk(self):
+        if not self.statsfile:
+            return
+        log.debug("writing runtime statistics to %s", self.statsfile)
+        # replace the file atomically, so that a concurrent reader or an
+        # interrupted write does not leave a truncated file behind
+        fd, tmppath = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.statsfile)), suffix=".tmp"
+        )
+        with os.fdopen(fd, "w") as fp:
+            json.dump(self.stats, fp, indent=4, sort_keys=True)
+        os.replace(tmppath, self.statsfile)
+
+    def record(self, spec, runtime, nelements=1):
+        """
+        :param spec: the packtivity spec of the step
+        :param runtime: the runtime of the step in seconds
+        :param nelements: the number of elements the step processed
+        """
+        entry = self.stats.setdefault(json_hash(spec), {"elements": 0, "runtime": 0})
+        entry["elements"] += nelements
+        entry["runtime"] += runtime
+
+    def estimate(self, spec):
+        """
+        :param spec: the packtivity spec of the step
+        :return: mean runtime per element in seconds, None if not known
+        """
+        entry = self.stats.get(json_hash(spec))
+        if not entry or not entry["elements"]:
+            return None
+        return entry["runtime"] / float(entry["elements"])
+
+    def batchsize(self, spec, target):
+        """
+        :param spec: the packtivity spec of the step
+        :param target: the desired runtime of a step in seconds
+        :return: the number of elements to batch into a step to get close to the
+                 target runtime. 1 if the runtime per element is not known.
+        """
+        estimate = self.estimate(spec)
+        if not estimate:
+            return 1
+        return max(1, int(target / estimate))
+
+
+def executed_step(node):
+    """
+    :param node: a finished node
+    :return: whether the node ran its step, rather than taking its result from
+             the cache or only publishing
+    """
+    if node.task.pubOnlyTask() or node.task.is_purepub:
+        return False
+    return type(node.resultproxy) is not TrivialProxy
+
+
+_stats = None
+
+
+def runtime_stats():
+    """
+    :return: the runtime statistics of this process. They are kept in the file
+             set by the YADAGE_RUNTIME_STATS environment variable, if any.
+    """
+    global _stats
+    statsfile = os.environ.get("YADAGE_RUNTIME_STATS")
+    if _stats is None or _stats.statsfile != statsfile:
+        _stats = RuntimeStats(statsfile)
+    return _stats
@@ -0,0 +1,128 @@
+import collections
+
+
+def _parent(offset):
+    return offset.rsplit("/", 1)[0]
+
+
+class Scope(object):
+    """
+    the not yet completed contents of a scope: rules that are not applied,
+    steps without a result and child scopes that are not done
+    """
+
+    def __init__(self):
+        self.rules = collections.deque()
+        self.steps = collections.deque()
+        self.children = collections.deque()
+
+
+class ScopeIndex(object):
+    """
+    Index of the scopes of a workflow (as tracked in its bookkeeping) that
+    answers whether all rules in a scope and its sub-scopes are applied and
+    all of their steps have results.
+
+    Completed rules, steps and scopes are pruned lazily from the front of
+    each scope's queues, so a check stops at the first incomplete item and
+    each item is only found to be complete once. Completion is monotonic,
+    except for resets, which invalidate the index.
+    """
+
+    def __init__(self, wflow):
+        self.wflow = wflow
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        drop the index. It is rebuilt from the bookkeeping on the next check.
+        """
+        self.scopes = None
+        self.done_scopes = set()
+        self.applied = set()
+
+    def build(self):
+        self.scopes = {}
+        self.applied.update(r.identifier for r in self.wflow.applied_rules)
+
+        def walk(offset, bookkeeping):
+            scope = self.scope(offset)
+            for k, v in bookkeeping.items():
+                if k == "_meta":
+                    scope.rules.extend(v["stages"])
+                    scope.steps.extend(v["steps"])
+                else:
+                    walk(offset + "/{}".format(k), v)
+
+        walk("", self.wflow.bookkeeping)
+
+    def scope(self, offset):
+        """
+        :return: the scope at the offset, registered with its parents
+        """
+        if offset not in self.scopes:
+            self.scopes[offset] = Scope()
+            if offset:
+                self.scope(_parent(offset)).children.append(offset)
+        return self.scopes[offset]
+
+    def reopen(self, offset):
+        """
+        mark a scope and its parents as not done
+        """
+        wasdone = offset in self.done_scopes
+        self.done_scopes.discard(offset)
+        while offset:
+            parent = _parent(offset)
+            if wasdone:
+                # done scopes were pruned from their parent, so re-register
+                self.scope(parent).children.append(offset)
+            wasdone = parent in self.done_scopes
+            self.done_scopes.discard(parent)
+            offset = parent
+
+    def rule_added(self, offset, ruleid):
+        if self.scopes is None:
+            return
+        self.scope(offset).rules.append(ruleid)
+        self.reopen(offset)
+
+    def rule_applied(self, ruleid):
+        self.applied.add(ruleid)
+
+    def step_added(self, offset, nodeid):
+        if self.scopes is None:
+            return
+        self.scope(offset).steps.append(nodeid)
+        self.reopen(offset)
+
+    def done(self, offset):
+        """
+        :param offset: the scope offset
+        :return: whether all rules and steps in the scope and its sub-scopes
+                 are applied and have results, respectively
+        """
+        if self.scopes is None:
+            self.build()
+        if offset in self.done_scopes:
+            return True
+
+        scope = self.scope(offset)
+        while scope.rules and scope.rules[0] in self.applied:
+            scope.rules.popleft()
+        if scope.rules:
+            return False
+
+        dag = self.wflow.dag
+        while scope.steps and dag.getNode(scope.steps[0]).has_result():
+            scope.steps.popleft()
+        if scope.steps:
+            return False
+
+        while scope.children and self.done(scope.children[0]):
+            scope.children.popleft()
+        if scope.children:
+            return False
+
+        self.done_scopes.add(offset)
+        return True
@@ -0,0 +1,73 @@
+import logging
+
+from .utils import json_hash
+
+log = logging.getLogger(__name__)
+
+
+def is_specref(spec):
+    return isinstance(spec, dict) and "$specref" in spec
+
+
+class SpecTable(object):
+    """
+    Content-addressed table of the packtivity specs of a workflow's steps.
+    Steps with the same spec share a single spec object, and serialized
+    nodes reference the spec by its hash, so that each distinct spec is
+    kept and written only once.
+    """
+
+    def __init__(self, specs=None):
+        """
+        :param specs: dict of spec hashes to specs
+        """
+        self.specs = specs or {}
+        self.hashes = {id(spec): h for h, spec in self.specs.items()}
+
+    def intern(self, spec):
+        """
+        :param spec: a packtivity spec
+        :return: the hash of the spec and the spec object shared by the workflow
+        """
+        h = self.hashes.get(id(spec))
+        if h is not None:
+            return h, spec
+        h = json_hash(spec)
+        interned = self.specs.setdefault(h, spec)
+        self.hashes[id(interned)] = h
+        return h, interned
+
+    def node_json(self, nodedata):
+        """
+        :param nodedata: the node JSON
+        :return: the node JSON with its spec replaced by a reference into the table
+        """
+        spec = nodedata["task"]["spec"]
+        if is_specref(spec):
+            return nodedata
+        h, _ = self.intern(spec)
+        task = dict(nodedata["task"], spec={"$specref": h})
+        return dict(nodedata, task=task)
+
+    def resolve_node_json(self, nodedata):
+        """
+        :param nodedata: the node JSON, with a spec reference or (for workflows
+                         serialized before specs were interned) an inline spec
+        :return: the node JSON with the shared spec object
+        """
+        spec = nodedata["task"]["spec"]
+        if is_specref(spec):
+            spec = self.specs[spec["$specref"]]
+        else:
+            _, spec = self.intern(spec)
+        task = dict(nodedata["task"], spec=spec)
+        return dict(nodedata, task=task)
+
+    def json(self, used=None):
+        """
+        :param used: hashes of the specs to include. If None, all are included
+        :return: dict of spec hashes to specs
+        """
+        if used is None:
+            return self.specs
+        return {h: self.specs[h] for h in used}
@@ -1,7 +1,7 @@
 import logging
 
 from .handlers.predicate_handlers import handlers as pred_handlers
-from .utils import get_id_fromjson
+from .utils import get_id_fromjson, jsonpath_parse, jsonpath_queries
 from .state_providers import load_provider
 
 from packtivity import datamodel as _datamodel
@@ -41,6 +41,16 @@ class OffsetStage(object):
         x = self.rule.applicable(WorkflowView(adageobj, self.offset))
         return x
 
+    def dependencies_ready(self, adageobj):
+        """
+        determine whether the dependencies of the (applied) rule are still met.
+        Evaluated within the offset.
+        :param adageobj: the workflow object
+        """
+        from .wflowview import WorkflowView  # importing here to avoid circdep
+
+        return self.rule.dependencies_ready(WorkflowView(adageobj, self.offset))
+
     def apply(self, adageobj):
         """
         applies a rule within the scope set by offset
@@ -50,6 +60,9 @@ class OffsetStage(object):
         from .wflowview import WorkflowView  # importing here to avoid circdep
 
         self.rule.apply(WorkflowView(adageobj, self.offset))
+        # the rule is now applied, which may make its scope done
+        adageobj.rule_index.changed(self.offset)
+        adageobj.scope_index.rule_applied(self.identifier)
 
     # (de-)serialization
     @classmethod
@@ -96,13 +109,18 @@ class ViewStageBase(object):
         self.view = flowview
         return self.ready()
 
+    def dependencies_ready(self, flowview):
+        return self.applicable(flowview)
+
     def apply(self, flowview):
         self.view = flowview
         self.schedule()
 
-    def addStep(self, step):
+    def addStep(self, step, index=None):
         dependencies = [self.view.dag.getNode(k.stepid) for k in step.inputs]
-        return self.view.addStep(step, stage=self.name, depends_on=dependencies)
+        return self.view.addStep(
+            step, stage=self.name, depends_on=dependencies, index=index
+        )
 
     def addWorkflow(self, rules, isolate=True):
         self.view.addWorkflow(rules, stage=self.name if isolate else None)
@@ -110,9 +128,9 @@ class ViewStageBase(object):
     def json(self):
         return {
             "name": self.name,
-            "state_provider": self.state_provider.json()
-            if self.state_provider
-            else None,
+            "state_provider": (
+                self.state_provider.json() if self.state_provider else None
+            ),
         }
 
 
@@ -125,16 +143,50 @@ class JsonStage(ViewStageBase):
         self.stagespec = json["scheduler"]
         self.depspec = json["dependencies"]
         super(JsonStage, self).__init__(json["name"], state_provider)
+        self.compile_queries()
 
     def __repr__(self):
         return "<JsonStage: {}>".format(self.name)
 
+    def compile_queries(self):
+        """
+        compile the JSONPath queries of the stage ahead of time, so that
+        predicate checks and scheduling find them in the cache
+        """
+        queries = list(jsonpath_queries([self.depspec, self.stagespec]))
+        if self.depspec and self.depspec["dependency_type"] == "jsonpath_ready":
+            queries += self.depspec["expressions"]
+        for query in queries:
+            try:
+                jsonpath_parse(query)
+            except Exception:
+                log.debug("could not compile query %s", query)
+
     def ready(self):
+        # imported here to avoid circular dependency
+        from .handlers.scheduler_handlers import streaming_predicate
+
+        streaming = streaming_predicate(self.stagespec)
+        if streaming:
+            return streaming(self, self.depspec, self.stagespec)
         if not self.depspec:
             return True
         predicate = pred_handlers[self.depspec["dependency_type"]]
         return predicate(self, self.depspec, self.stagespec)
 
+    def dependencies_ready(self, flowview):
+        # imported here to avoid circular dependency
+        from .handlers.scheduler_handlers import (
+            streaming_dependencies_ready,
+            streaming_predicate,
+        )
+
+        # streaming stages are not ready anymore once all steps are scheduled
+        if not streaming_predicate(self.stagespec):
+            return self.applicable(flowview)
+        self.view = flowview
+        return streaming_dependencies_ready(self, self.depspec, self.stagespec)
+
     def schedule(self):
         # imported here to avoid circular dependency
         log.debug("scheduling")
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+def file_hash(path, blocksize=64 * 1024):
+    """
+    :param path: the file path
+    :return: the SHA1 hex digest of the file contents (of no content, if the
+             file does not exist, e.g. for broken links)
+    """
+    hasher = hashlib.sha1()
+    if not os.path.exists(path):
+        return hasher.hexdigest()
+    with open(path, "rb") as fp:
+        while True:
+            data = fp.read(blocksize)
+            if not data:
+                break
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def packtivity_dirhash():
+    """
+    :return: the name of the module whose ``dirhash`` the posix filesystem
+             states of packtivity hash their directories with
+    """
+    from packtivity.statecontexts import posixfs_context
+
+    return getattr(getattr(posixfs_context, "dirhash", None), "__module__", None)
+
+
+class StateHasher(object):
+    """
+    Incremental hashing of filesystem states. Keeps a manifest of the size,
+    modification time, inode and content hash of every hashed file of a
+    directory, so that only files whose stat data changed are re-hashed. The
+    digests are the same as those of a full hash with the ``dirhash`` of the
+    ``dirhash`` or ``checksumdir`` package (the one packtivity uses), such that
+    the hash of a posix filesystem state equals its ``state_hash``.
+    """
+
+    methods = ["dirhash", "checksumdir"]
+
+    def __init__(self, manifestdir=None, max_workers=4, granularity=2.0, method=None):
+        """
+        :param manifestdir: directory to keep the manifests in across workflow
+                            runs, one file per hashed directory. If None, they
+                            are only kept in memory.
+        :param max_workers: number of threads hashing changed files
+        :param granularity: files modified less than this many seconds before
+                            they were hashed are hashed again, as a change
+                            within the same timestamp would go unnoticed
+        :param method: the package whose directory hash to reproduce. Defaults
+                       to the one of packtivity. States are hashed by their own
+                       ``state_hash`` if it is not one of ``methods``.
+        """
+        self.method = method or packtivity_dirhash()
+        self.manifestdir = manifestdir
+        self.max_workers = max_workers
+        self.granularity = granularity
+        self.manifests = {}
+        self.dirty = set()
+
+    def manifestpath(self, directory):
+        h = hashlib.sha1(directory.encode("utf-8")).hexdigest()
+        return os.path.join(self.manifestdir, h[:2], h + ".json")
+
+    def manifest(self, directory):
+        """
+        :param directory: the hashed directory
+        :return: dict of file paths relative to the directory to their stat
+                 data and hash
+        """
+        if directory not in self.manifests:
+            manifest = {}
+            if self.manifestdir:
+                try:
+                    with open(self.manifestpath(directory)) as manifestfile:
+                        manifest = json.load(manifestfile)
+                except (IOError, OSError, ValueError):
+                    pass
+            self.manifests[directory] = manifest
+        return self.manifests[directory]
+
+    def todisk(self):
+        """
+        write the manifests of the directories hashed since the last write
+        """
+        if self.manifestdir:
+            for directory in self.dirty:
+                path = self.manifestpath(directory)
+                manifestdir = os.path.dirname(path)
+                if not os.path.exists(manifestdir):
+                    os.makedirs(manifestdir, exist_ok=True)
+                log.debug("writing state hash manifest %s", path)
+                # manifests may be shared by several workflows, so replace
+                # them atomically
+                fd, tmppath = tempfile.mkstemp(dir=manifestdir, suffix=".tmp")
+                with os.fdopen(fd, "w") as manifestfile:
+                    json.dump(self.manifests[directory], manifestfile)
+                os.replace(tmppath, path)
+        self.dirty = set()
+
+    def file_hashes(self, directory, relpaths):
+        """
+        :param directory: the hashed directory
+        :param relpaths: list of file paths relative to the directory
+        :return: list of the content hashes of the files
+        """
+        manifest = self.manifest(directory)
+        stats = []
+        changed = []
+        for relpath in relpaths:
+            try:
+                st = os.stat(os.path.join(directory, relpath))
+                stat = [st.st_size, st.st_mtime_ns, st.st_ino]
+            except OSError:
+                stat = None
+            stats.append(stat)
+            entry = manifest.get(relpath)
+            if stat is None or entry is None or entry[:3] != stat:
+                changed.append(relpath)
+
+        hashes = {}
+        if changed:
+            log.debug("hashing %s of %s files", len(changed), len(relpaths))
+            hashed_at = time.time()
+            paths = [os.path.join(directory, x) for x in changed]
+            with ThreadPoolExecutor(self.max_workers) as executor:
+                hashes = dict(zip(changed, executor.map(file_hash, paths)))
+            self.dirty.add(directory)
+
+        result = []
+        for relpath, stat in zip(relpaths, stats):
+            if relpath in hashes:
+                h = hashes[relpath]
+                if stat is None or stat[1] / 1e9 > hashed_at - self.granularity:
+                    manifest.pop(relpath, None)
+                else:
+                    manifest[relpath] = stat + [h]
+            else:
+                h = manifest[relpath][3]
+            result.append(h)
+
+        removed = set(manifest).difference(relpaths)
+        if removed:
+            for relpath in removed:
+                manifest.pop(relpath)
+            self.dirty.add(directory)
+        return result
+
+    def dirhash(self, directory):
+        """
+        :param directory: the directory
+        :return: the SHA1 hash of the directory contents
+        """
+        if self.method == "checksumdir":
+            return self.checksumdir_hash(directory)
+        return self.tree_hash(directory)
+
+    def checksumdir_hash(self, directory):
+        """
+        :return: the SHA1 hash of the sorted hashes of all files, as
+                 ``checksumdir.dirhash(directory, 'sha1')``
+        """
+        relpaths = []
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            files.sort()
+            relroot = os.path.relpath(root, directory)
+            relpaths.extend(os.path.normpath(os.path.join(relroot, f)) for f in files)
+        hasher = hashlib.sha1()
+        for h in sorted(self.file_hashes(directory, relpaths)):
+            hasher.update(h.encode("utf-8"))
+        return hasher.hexdigest()
+
+    def tree_hash(self, directory):
+        """
+        :return: the SHA1 hash of the directory tree, hashing each directory by
+                 the names and hashes of its files and non-empty subdirectories,
+                 as ``dirhash.dirhash(directory, 'sha1')``. Broken links are
+                 skipped.
+        :raises ValueError: for directories without files, or with cyclic links
+        """
+        subdirs, files = {}, {}
+        ancestors = {directory: {os.path.realpath(directory)}}
+        for root, dirs, filenames in os.walk(directory, followlinks=True):
+            seen = ancestors.pop(root)
+            for d in dirs:
+                path = os.path.join(root, d)
+                realpath = os.path.realpath(path)
+                if realpath in seen:
+                    raise ValueError("{}: cyclic symbolic link".format(path))
+                ancestors[path] = seen | {realpath}
+            relroot = os.path.relpath(root, directory)
+            subdirs[relroot] = dirs
+            # broken links are no entries of the tree
+            files[relroot] = [
+                os.path.normpath(os.path.join(relroot, f))
+                for f in filenames
+                if os.path.exists(os.path.join(root, f))
+            ]
+
+        relpaths = [f for x in files.values() for f in x]
+        filehashes = dict(zip(relpaths, self.file_hashes(directory, relpaths)))
+
+        def entry(kind, h, name):
+            return "{}:{}\000name:{}".format(kind, h, name)
+
+        def subtree_hash(relroot):
+            entries = [
+                entry("data", filehashes[f], os.path.basename(f))
+                for f in files[relroot]
+            ]
+            for d in subdirs[relroot]:
+                h = subtree_hash(os.path.normpath(os.path.join(relroot, d)))
+                if h is not None:
+                    entries.append(entry("dirhash", h, d))
+            if not entries:
+                return None
+            descriptor = "\000\000".join(sorted(entries))
+            return hashlib.sha1(descriptor.encode("utf-8")).hexdigest()
+
+        h = subtree_hash(".")
+        if h is None:
+            raise ValueError("{}: Nothing to hash".format(directory))
+        return h
+
+    def state_hash(self, state):
+        """
+        :param state: the packtivity state
+        :return: the SHA1 hash of the state. States other than posix filesystem
+                 states are hashed by their own ``state_hash``.
+        """
+        if not (hasattr(state, "readwrite") and hasattr(state, "readonly")):
+            return state.state_hash()
+        if self.method not in self.methods:
+            return state.state_hash()
+        dep_checksums = [self.dirhash(d) for d in state.readonly if os.path.isdir(d)]
+        state_checksums = [self.dirhash(d) for d in state.readwrite if os.path.isdir(d)]
+        return hashlib.sha1(
+            json.dumps([dep_checksums, state_checksums]).encode("utf-8")
+        ).hexdigest()
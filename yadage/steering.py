@@ -127,6 +127,14 @@ def from_file(ctx, param, value):
     default=0.02,
     help="adage graph inspection interval in seconds",
 )
+@click.option(
+    "-U",
+    "--maxupdateinterval",
+    default=5.0,
+    help="longest adage graph inspection interval in seconds (event-driven mode). "
+    "For backends that do not notify about finished jobs, this is also how late "
+    "a finished job may be noticed while the workflow is idle",
+)
 @click.option("-v", "--verbosity", default="INFO", help="logging verbosity")
 @click.option(
     "-w",
@@ -139,6 +147,11 @@ def from_file(ctx, param, value):
     "-y", "--strategyopt", help="strategy option", multiple=True, default=None
 )
 @click.option("--accept-metadir/--no-accept-metadir", default=False)
+@click.option(
+    "--event-driven/--no-event-driven",
+    default=False,
+    help="back off graph inspection while idle instead of a fixed interval",
+)
 @click.option("--plugins", default=None)
 @click.option(
     "--validate/--no-validate",
@@ -158,6 +171,8 @@ def main(
     verbosity,
     loginterval,
     updateinterval,
+    maxupdateinterval,
+    event_driven,
     schemadir,
     backend,
     dataopt,
@@ -214,6 +229,8 @@ def main(
             modelsetup=modelsetup,
             modelopts=modelopts,
             updateinterval=updateinterval,
+            maxupdateinterval=maxupdateinterval,
+            eventdriven=event_driven,
             loginterval=loginterval,
             visualize=visualize,
             strategy=strategy,
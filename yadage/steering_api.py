@@ -20,6 +20,23 @@ def run_workflow(*args, **kwargs):
         pass
 
 
+def enable_cache(backend, cache, metadir):
+    """
+    enable result caching on a backend
+
+    :param backend: the backend
+    :param cache: the cache config string. For 'checksums' and 'store', the
+                  cache is stored in the metadata directory
+    :param metadir: the workflow metadata directory
+    """
+    if cache == "checksums":
+        backend.enable_cache(":".join([cache, os.path.join(metadir, "cache.json")]))
+    elif cache == "store":
+        backend.enable_cache(":".join([cache, os.path.join(metadir, "cache")]))
+    else:
+        backend.enable_cache(cache)
+
+
 def execute_steering(
     steering_object,
     updateinterval=0.02,
@@ -29,6 +46,8 @@ def execute_steering(
     strategyopts=None,
     backend=None,
     cache=None,
+    eventdriven=False,
+    maxupdateinterval=5.0,
 ):
 
     ys = steering_object
@@ -38,14 +57,13 @@ def execute_steering(
         update_interval=updateinterval,
         recursive_updates=True,
     )
+    if eventdriven:
+        # wait between updateinterval and maxupdateinterval, backing off
+        # while the workflow is idle
+        ys.adage_argument(event_driven=True, max_update_interval=maxupdateinterval)
 
     if cache:
-        if cache == "checksums":
-            backend.enable_cache(
-                ":".join([cache, os.path.join(ys.metadir, "cache.json")])
-            )
-        else:
-            backend.enable_cache(cache)
+        enable_cache(backend, cache, ys.metadir)
 
     custom_tracker = os.environ.get("YADAGE_CUSTOM_TRACKER", None)
     if custom_tracker:
@@ -84,6 +102,8 @@ def steering_ctx(
     accept_metadir=False,
     modelsetup="inmem",
     modelopts=None,
+    eventdriven=False,
+    maxupdateinterval=5.0,
 ):
 
     ys = YadageSteering.create(
@@ -116,6 +136,8 @@ def steering_ctx(
             strategyopts=strategyopts,
             backend=backend,
             cache=cache,
+            eventdriven=eventdriven,
+            maxupdateinterval=maxupdateinterval,
         )
     finally:
         log.info("done. dumping workflow to disk.")
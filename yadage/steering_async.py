@@ -0,0 +1,257 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+
+import yadageschemas
+from adage import nodestate
+
+from .backends.threadpoolbackend import ThreadPoolBackend
+from .steering_api import enable_cache
+from .steering_loop import Waker
+from .steering_object import YadageSteering
+from .utils import setupbackend_fromstring
+
+log = logging.getLogger(__name__)
+
+
+class AsyncController(object):
+    """
+    drives a workflow through a (synchronous) YadageController on an asyncio
+    event loop. Submission and state syncing await an awaitable backend, so
+    that many workflows can progress concurrently on one event loop.
+
+    The workflow state is only modified in short controller batches between
+    awaits, and nodes are looked up by identifier in each batch, so that a
+    persistent controller may reload its state in between.
+    """
+
+    def __init__(self, controller, backend=None, executor=None):
+        """
+        :param controller: the YadageController (or PersistentController)
+        :param backend: an awaitable backend. If None, the controller's backend
+                        is wrapped in a ThreadPoolBackend
+        :param executor: the executor for the ThreadPoolBackend
+        """
+        self.controller = controller
+        self.backend = backend or ThreadPoolBackend(controller.backend, executor)
+
+    @property
+    def adageobj(self):
+        return self.controller.adageobj
+
+    async def sync_backend(self):
+        """
+        update the expected results and the node states against the backend
+        """
+        ctrl = self.controller
+        with ctrl.batch(sync=False):
+            ctrl.sync_expected()
+            if ctrl.disable_backend:
+                return
+            submitted = []
+            for node in ctrl.syncable_nodes():
+                if node.resultproxy:
+                    submitted.append((node.identifier, node.resultproxy))
+                else:
+                    node.update_state()
+        if not submitted:
+            return
+
+        proxies = [proxy for _, proxy in submitted]
+        states = await self.backend.status(proxies)
+        successful = [p for p, s in zip(proxies, states) if s == nodestate.SUCCESS]
+        results = iter(await self.backend.results(successful))
+
+        with ctrl.batch(sync=False):
+            dag = self.adageobj.dag
+            nodes, before = [], []
+            for (nodeid, _), state in zip(submitted, states):
+                result = next(results) if state == nodestate.SUCCESS else None
+                node = dag.getNode(nodeid)
+                nodes.append(node)
+                before.append(node.state)
+                node.set_status(state, result)
+            ctrl.changes += sum(1 for n, s in zip(nodes, before) if n.state != s)
+            ctrl.record_runtimes(nodes, before)
+
+    async def submit_nodes(self, nodeids):
+        """
+        :param nodeids: a list of ids of nodes to submit to the backend
+        """
+        ctrl = self.controller
+        with ctrl.batch(sync=False):
+            dag = self.adageobj.dag
+            tasks = [dag.getNode(nodeid).task for nodeid in nodeids]
+        proxies = await self.backend.submit(tasks)
+        submit_time = time.time()
+        with ctrl.batch(sync=False):
+            dag = self.adageobj.dag
+            for nodeid, proxy in zip(nodeids, proxies):
+                node = dag.getNode(nodeid)
+                node.resultproxy = proxy
+                node.submit_time = submit_time
+            self.adageobj.ready_queue.submitted(nodeids)
+            ctrl.changes += len(nodeids)
+
+    async def apply_rules(self):
+        """
+        apply applicable rules until no more rules are applicable
+        """
+        ctrl = self.controller
+        while True:
+            with ctrl.batch(sync=False):
+                rules = ctrl.applicable_rules()
+                if not rules:
+                    return
+                ctrl.apply_rules(rules)
+            await self.sync_backend()
+
+    async def step(self):
+        """
+        run one tick: sync, extend the workflow and submit ready nodes
+
+        :return: whether the workflow is finished
+        """
+        ctrl = self.controller
+        with ctrl.batch(sync=False):
+            if ctrl.finished():
+                return True
+        await self.sync_backend()
+        await self.apply_rules()
+        with ctrl.batch(sync=False):
+            nodeids = [
+                n.identifier if hasattr(n, "identifier") else n
+                for n in ctrl.submittable_nodes()
+            ]
+        if nodeids:
+            await self.submit_nodes(nodeids)
+        return False
+
+    async def run(self, update_interval=0.02, max_update_interval=5.0):
+        """
+        run the workflow to completion
+
+        :param update_interval: shortest wait between ticks in seconds
+        :param max_update_interval: longest wait between idle ticks in seconds
+        :raises RuntimeError: if the workflow failed or does not validate
+        """
+        waker = Waker(update_interval, max_update_interval)
+        while True:
+            changes = self.controller.changes
+            if await self.step():
+                break
+            await asyncio.sleep(waker.backoff(changes != self.controller.changes))
+        if not self.controller.successful():
+            raise RuntimeError("workflow finished but failed")
+        if not self.controller.validate():
+            raise RuntimeError("DAG execution not validating")
+        log.info("workflow completed successfully.")
+
+
+class AsyncSteeringContext(object):
+    """
+    async counterpart of ``steering_ctx``, see ``async_steering_ctx``
+    """
+
+    def __init__(
+        self,
+        dataarg,
+        workflow=None,
+        initdata=None,
+        toplevel=os.getcwd(),
+        backend=None,
+        controller="frommodel",
+        ctrlopts=None,
+        workflow_json=None,
+        cache=None,
+        dataopts=None,
+        updateinterval=0.02,
+        maxupdateinterval=5.0,
+        schemadir=yadageschemas.schemadir,
+        metadir=None,
+        validate=True,
+        wflowopts=None,
+        accept_metadir=False,
+        modelsetup="inmem",
+        modelopts=None,
+        executor=None,
+    ):
+        self.create_kwargs = dict(
+            metadir=metadir,
+            accept_metadir=True if (accept_metadir or cache) else False,
+            dataarg=dataarg,
+            dataopts=dataopts,
+            wflowopts=wflowopts,
+            workflow_json=workflow_json,
+            workflow=workflow,
+            toplevel=toplevel,
+            schemadir=schemadir,
+            validate=validate,
+            initdata=initdata,
+            modelsetup=modelsetup,
+            modelopts=modelopts,
+            controller=controller,
+            ctrlopts=ctrlopts,
+        )
+        self.backend = backend
+        self.cache = cache
+        self.updateinterval = updateinterval
+        self.maxupdateinterval = maxupdateinterval
+        self.executor = executor
+        self.ys = None
+
+    def run(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def __aenter__(self):
+        # loading and validating the workflow spec blocks, so run it aside
+        self.ys = await self.run(YadageSteering.create, **self.create_kwargs)
+        return self.ys
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            return False
+        ys = self.ys
+        backend = self.backend or ys.controller.backend
+        if backend is None:
+            backend = setupbackend_fromstring("multiproc:auto")
+        if self.cache:
+            enable_cache(backend, self.cache, ys.metadir)
+        ys.controller.backend = backend
+        try:
+            await AsyncController(ys.controller, executor=self.executor).run(
+                self.updateinterval, self.maxupdateinterval
+            )
+        finally:
+            log.info("done. dumping workflow to disk.")
+            await self.run(ys.serialize)
+        return False
+
+
+def async_steering_ctx(*args, **kwargs):
+    """
+    async context manager to set up and run a workflow on the running event
+    loop. Takes the arguments of ``steering_ctx`` (except for the adage
+    strategy and visualization options) as well as ``maxupdateinterval`` and
+    an ``executor`` for blocking operations. Use as
+
+        async with async_steering_ctx(...) as ys:
+            ...
+
+    The workflow runs when the block exits.
+    """
+    return AsyncSteeringContext(*args, **kwargs)
+
+
+async def run_workflow_async(*args, **kwargs):
+    """
+    convenience coroutine around the async steering context, when no
+    additional settings are desired.
+    """
+    async with async_steering_ctx(*args, **kwargs):
+        pass
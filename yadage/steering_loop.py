@@ -0,0 +1,157 @@
+import contextlib
+import logging
+import threading
+
+import adage
+from adage.pollingexec import setup_polling_execution
+
+log = logging.getLogger(__name__)
+
+
+class Waker(object):
+    """
+    Waits between ticks of the steering loop. Waits are cut short when the
+    loop is woken up (e.g. by a backend reporting that a job finished) and
+    otherwise back off exponentially while ticks make no progress.
+    """
+
+    def __init__(self, min_interval=0.02, max_interval=5.0, factor=2.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.interval = min_interval
+        self.event = threading.Event()
+
+    def wake(self, *args, **kwargs):
+        """
+        wake up the steering loop. Accepts and ignores any arguments so that
+        it can be used as a callback directly.
+        """
+        self.event.set()
+
+    def backoff(self, progressed):
+        """
+        :param progressed: whether the last tick changed the workflow
+        :return: the time to wait for the next tick
+        """
+        if progressed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.factor, self.max_interval)
+        return self.interval
+
+    def wait(self, progressed):
+        """
+        wait for the next tick
+
+        :param progressed: whether the last tick changed the workflow
+        """
+        interval = self.backoff(progressed)
+        log.debug("waiting for up to %s seconds", interval)
+        self.event.wait(interval)
+        self.event.clear()
+
+
+@contextlib.contextmanager
+def tick_batch(controller):
+    # controllers without batching (e.g. remote ones) run the tick as is
+    if hasattr(controller, "batch"):
+        with controller.batch():
+            yield
+    else:
+        yield
+
+
+def run_event_workflow(controller, coroutine, waker, trackerlist=None, maxsteps=None):
+    """
+    run the workflow like adage's polling loop, but wait for the next tick
+    with the waker instead of a fixed interval. Backends that can notify
+    about finished jobs (i.e. whose ``subscribe`` method returns True) wake
+    up the loop directly. Finished jobs of all other backends are picked up
+    by polling, so they may be noticed up to the waker's maximum interval
+    late. In both cases, the waits back off up to that interval while idle.
+    Each tick runs as a single controller batch.
+
+    :param controller: the workflow controller
+    :param coroutine: the adage coroutine to step through the workflow
+    :param waker: the Waker
+    :param trackerlist: list of trackers
+    :param maxsteps: maximum number of ticks
+    """
+    trackerlist = trackerlist or []
+    subscribe = getattr(controller.backend, "subscribe", None)
+    if subscribe and subscribe(waker.wake):
+        log.info("backend notifies about finished jobs")
+    else:
+        log.info(
+            "backend does not notify about finished jobs, "
+            "polling at least every %s seconds",
+            waker.max_interval,
+        )
+
+    coroutine.send(controller)
+    log.info("starting event-driven state loop.")
+    try:
+        adage.trackprogress(trackerlist, controller, method="initialize")
+        stepnum = 0
+        while True:
+            changes = getattr(controller, "changes", None)
+            with tick_batch(controller):
+                try:
+                    next(coroutine)
+                except StopIteration:
+                    break
+            adage.trackprogress(trackerlist, controller)
+            stepnum += 1
+            if maxsteps and stepnum == maxsteps:
+                log.info("reached number of maximum iterations (%s)", maxsteps)
+                return
+            progressed = changes is None or changes != controller.changes
+            waker.wait(progressed)
+    except:
+        log.exception("some weird exception caught in adage process loop")
+        raise
+    finally:
+        adage.trackprogress(trackerlist, controller, method="finalize")
+
+    log.info("adage state loop done.")
+
+    if not controller.validate():
+        raise RuntimeError("DAG execution not validating")
+    log.info("execution valid. (in terms of execution order)")
+    log.info("workflow completed successfully.")
+
+
+def rundag(
+    controller,
+    extend_decider=None,
+    submit_decider=None,
+    finish_decider=None,
+    recursive_updates=True,
+    update_interval=0.02,
+    max_update_interval=5.0,
+    loggername=None,
+    trackevery=1,
+    workdir=None,
+    default_trackers=True,
+    additional_trackers=None,
+    maxsteps=None,
+):
+    """
+    event-driven counterpart of ``adage.rundag``. Takes the same arguments,
+    with ``update_interval`` as the shortest and ``max_update_interval`` as
+    the longest wait between ticks.
+    """
+    coroutine = setup_polling_execution(
+        extend_decider, submit_decider, finish_decider, recursive_updates
+    )
+    loggername = loggername or adage.__name__
+    trackerlist = (
+        adage.default_trackerlist(workdir, loggername, trackevery)
+        if default_trackers
+        else []
+    )
+    if additional_trackers:
+        trackerlist += additional_trackers
+    waker = Waker(update_interval, max_update_interval)
+    run_event_workflow(controller, coroutine, waker, trackerlist, maxsteps)
@@ -5,6 +5,7 @@ import copy
 import adage
 import shutil
 from .serialize import snapshot
+from . import steering_loop
 from .wflowstate import load_model_fromstring
 from .controllers import setup_controller
 from .utils import setupbackend_fromstring, prepare_meta
@@ -96,7 +97,12 @@ class YadageSteering(object):
 
         assert self.controller.backend
         self.adage_argument(**adage_kwargs)
-        adage.rundag(controller=self.controller, **self.adage_kwargs)
+        kwargs = dict(self.adage_kwargs)
+        if kwargs.pop("event_driven", False):
+            steering_loop.rundag(controller=self.controller, **kwargs)
+        else:
+            kwargs.pop("max_update_interval", None)
+            adage.rundag(controller=self.controller, **kwargs)
 
     def serialize(self):
         """
@@ -1,4 +1,6 @@
 import logging
+import sys
+from collections.abc import MutableMapping
 
 from packtivity import datamodel
 from packtivity.statecontexts import load_state
@@ -8,13 +10,103 @@ from .utils import outputReference
 log = logging.getLogger(__name__)
 
 
+class TaskMetadata(MutableMapping):
+    """
+    dict-like view of the metadata of a packtivity task. The well-known
+    workflow keys are stored in typed fields of the task, all other keys in
+    a plain dict. Setting a well-known key to None removes it.
+    """
+
+    __slots__ = ("task",)
+
+    fields = {
+        "name": "name",
+        "wflow_node_id": "node_id",
+        "wflow_offset": "offset",
+        "wflow_stage": "stage",
+        "wflow_stage_node_idx": "stage_node_idx",
+    }
+
+    def __init__(self, task):
+        self.task = task
+
+    def __getitem__(self, key):
+        if key in self.fields:
+            value = getattr(self.task, self.fields[key])
+        elif key == "wflow_hints":
+            value = self.task.hints()
+        else:
+            return (self.task._extra or {})[key]
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        task = self.task
+        if key in self.fields:
+            setattr(task, self.fields[key], value)
+        elif key == "wflow_hints":
+            task.set_hints(value)
+        else:
+            if task._extra is None:
+                task._extra = {}
+            task._extra[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key in self.fields or key == "wflow_hints":
+            self[key] = None
+        else:
+            del self.task._extra[key]
+
+    def __iter__(self):
+        for key, field in self.fields.items():
+            if getattr(self.task, field) is not None:
+                yield key
+        if self.task.hints() is not None:
+            yield "wflow_hints"
+        for key in self.task._extra or {}:
+            yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 class packtivity_task(object):
     """
     packtivity task
+
+    Tasks are kept for every node of the workflow, so they are slotted and
+    hold the well-known workflow metadata (offset, stage, ...) in typed
+    fields. The ``metadata`` property provides the dict-like view of it.
     """
 
+    __slots__ = (
+        "name",
+        "node_id",
+        "_offset",
+        "_stage",
+        "stage_node_idx",
+        "_hints",
+        "_extra",
+        "inputs",
+        "parameters",
+        "spec",
+        "state",
+    )
+
     def __init__(self, name, spec, state, parameters=None, inputs=None):
-        self.metadata = {"name": name}
+        self.name = name
+        self.node_id = None
+        self._offset = None
+        self._stage = None
+        self.stage_node_idx = None
+        self._hints = None
+        self._extra = None
         self.inputs = inputs or []
         self.parameters = datamodel.create(
             parameters or {}, state.datamodel if state else None
@@ -22,6 +114,52 @@ class packtivity_task(object):
         self.spec = spec
         self.state = state
 
+    # offsets and stage names repeat across all steps of a stage
+    @property
+    def offset(self):
+        return self._offset
+
+    @offset.setter
+    def offset(self, value):
+        self._offset = sys.intern(value) if isinstance(value, str) else value
+
+    @property
+    def stage(self):
+        return self._stage
+
+    @stage.setter
+    def stage(self, value):
+        self._stage = sys.intern(value) if isinstance(value, str) else value
+
+    @property
+    def is_purepub(self):
+        return self._hints.get("is_purepub") if self._hints else None
+
+    @is_purepub.setter
+    def is_purepub(self, value):
+        if value is not None:
+            if self._hints is None:
+                self._hints = {}
+            self._hints["is_purepub"] = value
+        elif self._hints:
+            self._hints.pop("is_purepub", None)
+
+    def hints(self):
+        """
+        :return: the backend hints of the task, None if not set
+        """
+        return self._hints
+
+    def set_hints(self, hints):
+        """
+        :param hints: dict of backend hints, or None to remove them
+        """
+        self._hints = hints
+
+    @property
+    def metadata(self):
+        return TaskMetadata(self)
+
     def pubOnlyTask(self):
         return (self.spec["environment"] is None) and (self.spec["process"] is None)
 
@@ -40,7 +178,7 @@ class packtivity_task(object):
 
     def json(self):
         serialized = {
-            "metadata": self.metadata,
+            "metadata": dict(self.metadata),
             "parameters": self.parameters.json(),
             "inputs": [x.json() for x in self.inputs],
             "type": "packtivity_task",
@@ -1,4 +1,4 @@
-import copy
+import functools
 import hashlib
 import json
 import logging
@@ -6,6 +6,7 @@ import os
 import uuid
 
 import jq
+import jsonpath_rw
 import jsonpointer
 import yaml
 
@@ -84,15 +85,11 @@ def leaf_iterator_jsonlike(jsonlike, path=None):
     path = path or []
     if type(jsonlike) == list:
         for i, x in enumerate(jsonlike):
-            thispath = copy.deepcopy(path)
-            thispath.append(i)
-            for leaf in leaf_iterator_jsonlike(x, path=thispath):
+            for leaf in leaf_iterator_jsonlike(x, path=path + [i]):
                 yield leaf
     elif type(jsonlike) == dict:
         for k, v in jsonlike.items():
-            thispath = copy.deepcopy(path)
-            thispath.append(k)
-            for leaf in leaf_iterator_jsonlike(v, path=thispath):
+            for leaf in leaf_iterator_jsonlike(v, path=path + [k]):
                 yield leaf
     else:
         yield jsonpointer.JsonPointer.from_parts(path), jsonlike
@@ -101,7 +98,7 @@ def leaf_iterator_jsonlike(jsonlike, path=None):
 def process_jsonlike(jsonlike, jq_obj_selector, callback):
     wflowrefs = [
         jsonpointer.JsonPointer.from_parts(x[1:])
-        for x in jq.jq(
+        for x in jq_compile(
             "paths(if objects then {} else false end)".format(jq_obj_selector)
         ).transform({"value": jsonlike}, multiple_output=True)
     ]
@@ -114,6 +111,49 @@ def process_jsonlike(jsonlike, jq_obj_selector, callback):
     return jsonlike
 
 
+@functools.lru_cache(maxsize=1024)
+def jq_compile(script):
+    """
+    :param script: a jq program
+    :return: the compiled program. Compiled programs are cached, so each
+             distinct program is only compiled once. Cache statistics are
+             available via ``jq_compile.cache_info()``.
+    """
+    return jq.jq(script)
+
+
+@functools.lru_cache(maxsize=4096)
+def jsonpath_parse(expression):
+    """
+    :param expression: a JSONPath expression
+    :return: the compiled expression. Compiled expressions are cached, so
+             each distinct expression is only parsed once.
+    """
+    return jsonpath_rw.parse(expression)
+
+
+def jsonpath_queries(spec):
+    """
+    :param spec: a (part of a) stage spec
+    :return: iterator over the JSONPath step and scope selections in the spec
+    """
+    if isinstance(spec, dict):
+        expression_type = spec.get("expression_type")
+        if expression_type == "stage-output-selector":
+            for key in ["stages", "steps", "step"]:
+                if key in spec:
+                    yield spec[key]
+        elif expression_type == "fromvalue" and "scope" in spec:
+            yield spec["scope"]
+        for v in spec.values():
+            for query in jsonpath_queries(v):
+                yield query
+    elif isinstance(spec, list):
+        for x in spec:
+            for query in jsonpath_queries(x):
+                yield query
+
+
 def options_from_eqdelimstring(opts):
     options = {}
     for x in opts:
@@ -180,33 +220,73 @@ def stages_in_scope(workflow, scope):
     ]
 
 
+def rule_groups(workflow):
+    """
+    streaming stages add continuation rules for the same stage to schedule
+    their remaining steps. The rules of a stage are undone and reset as one.
+
+    :return: list of the rules of each stage, the originally added rule first
+    """
+    groups = {}
+    for rule in workflow.applied_rules + workflow.rules:
+        groups.setdefault((rule.offset, rule.rule.name), []).append(rule)
+    return list(groups.values())
+
+
+def rule_group(workflow, ruleid):
+    """
+    :return: the rules of the stage of the rule, the originally added rule first
+    """
+    for group in rule_groups(workflow):
+        if ruleid in [rule.identifier for rule in group]:
+            return group
+    return []
+
+
+def stage_step_names(rule):
+    """
+    :return: the names under which the steps of the stage of the rule are tracked
+    """
+    # imported here to avoid circular dependency
+    from .handlers.scheduler_handlers import treereduce_partials
+
+    names = [rule.rule.name]
+    stagespec = getattr(rule.rule, "stagespec", {})
+    if stagespec.get("scheduler_type") == "treereduce-stage":
+        names.append(treereduce_partials(rule.rule.name))
+    return names
+
+
 def rule_steps_indices(workflow):
+    """
+    :return: indices of the rules to the steps of their stage, of the steps to
+             the (originally added) rule of their stage and of the rules to the
+             subscopes of their stage
+    """
     rule_to_steps_index = {}
     steps_to_rule_index = {}
     rule_to_subscopes_index = {}
-    for rule in workflow.rules + workflow.applied_rules:
-        path = "/".join([rule.offset, rule.rule.name])
-        p = jsonpointer.JsonPointer(path)
-        try:
-            steps_of_rule = [
-                x["_nodeid"] for x in p.resolve(workflow.stepsbystage) if "_nodeid" in x
-            ]
-        except jsonpointer.JsonPointerException:
-            steps_of_rule = []
-
-        try:
-            a = p.resolve(workflow.stepsbystage)
-            subscopes_of_rule = [
+    for group in rule_groups(workflow):
+        rule = group[0]
+        steps_of_rule = []
+        subscopes_of_rule = []
+        for name in stage_step_names(rule):
+            p = jsonpointer.JsonPointer("/".join([rule.offset, name]))
+            try:
+                a = p.resolve(workflow.stepsbystage)
+            except jsonpointer.JsonPointerException:
+                continue
+            steps_of_rule += [x["_nodeid"] for x in a if "_nodeid" in x]
+            subscopes_of_rule += [
                 # ['{}/{}'.format(x['_offset'],substage) for substage in x.keys() if not substage== '_offset' ]
                 x["_offset"]
                 for x in a
                 if "_offset" in x
             ]
-        except jsonpointer.JsonPointerException:
-            subscopes_of_rule = []
 
-        rule_to_steps_index[rule.identifier] = steps_of_rule
-        rule_to_subscopes_index[rule.identifier] = subscopes_of_rule
+        for groupedrule in group:
+            rule_to_steps_index[groupedrule.identifier] = steps_of_rule
+            rule_to_subscopes_index[groupedrule.identifier] = subscopes_of_rule
         for step in steps_of_rule:
             steps_to_rule_index[step] = rule.identifier
     return rule_to_steps_index, steps_to_rule_index, rule_to_subscopes_index
@@ -241,9 +321,11 @@ def pointerize(data, asref=False, stepid=None):
         return (
             outputReference(stepid, p)
             if asref
-            else {"$wflowpointer": {"step": stepid, "result": p.path}}
-            if stepid
-            else p.path
+            else (
+                {"$wflowpointer": {"step": stepid, "result": p.path}}
+                if stepid
+                else p.path
+            )
         )
 
     return data.asrefs(callback=callback)
@@ -64,7 +64,7 @@ def fillscope(cluster, workflow, nodes_to_connect, scope="", subcluster=True):
                 result = nodeobj.result if nodeobj.has_result() else None
                 if result:
                     add_result(targetcl, element, result, ready=nodeobj.ready())
-            elif type(element) == dict:
+            elif type(element) == dict and "_reserved" not in element:
                 # recurse...
                 fillscope(
                     stagecluster,
@@ -1,7 +1,13 @@
+import copy
+
 import adage
-from adage.serialize import obj_to_json
 
 from .stages import JsonStage, OffsetStage
+from .ruleindex import RuleIndex
+from .scopeindex import ScopeIndex
+from .spectable import SpecTable
+from .readyqueue import ReadyQueue
+from .wflowdag import YadageDAG, dag_from_json
 from .wflowview import WorkflowView
 from .wflownode import YadageNode
 
@@ -20,29 +26,57 @@ class YadageWorkflow(adage.adageobject):
         bookkeeping=None,
         stepsbystage=None,
         values=None,
+        specs=None,
     ):
-        super(YadageWorkflow, self).__init__(
-            dag=dag, rules=rules, applied_rules=applied_rules
-        )
+        super(YadageWorkflow, self).__init__(rules=rules, applied_rules=applied_rules)
+        # (an empty DAG is falsy, so do not rely on the base class default)
+        self.dag = dag if dag is not None else YadageDAG()
         self.stepsbystage = stepsbystage or {}
         self.bookkeeping = bookkeeping or {}
         self.values = values or {}
+        self.specs = specs if specs is not None else SpecTable()
+        self.rule_index = RuleIndex(self)
+        self.scope_index = ScopeIndex(self)
+        self.ready_queue = ReadyQueue(self)
 
     def view(self, offset=""):
         return WorkflowView(self, offset)
 
+    def nodeJSON(self, ident):
+        """
+        :return: the node JSON, referencing its spec in the spec table
+        """
+        return self.specs.node_json(self.dag.nodeJSON(ident))
+
     def json(self):
         json_or_nil = lambda x: None if x is None else x.json()
-        data = obj_to_json(self, json_or_nil, json_or_nil)
+        nodes = [self.nodeJSON(n) for n in self.dag.nodes()]
+        data = {
+            "dag": {"nodes": nodes, "edges": list(self.dag.edges())},
+            "rules": [json_or_nil(x) for x in self.rules],
+            "applied": [json_or_nil(x) for x in self.applied_rules],
+        }
 
         data["bookkeeping"] = self.bookkeeping
         data["stepsbystage"] = self.stepsbystage
         data["values"] = self.values
+        data["specs"] = self.specs.json(
+            set(n["task"]["spec"]["$specref"] for n in nodes)
+        )
         return data
 
     @classmethod
     def fromJSON(cls, data, deserialization_opts=None, backend=None):
+        # older serializations hold the spec of each node inline
+        specs = SpecTable(data.get("specs"))
+        dagdata = dict(
+            data["dag"], nodes=[specs.node_json(x) for x in data["dag"]["nodes"]]
+        )
+
         def node_deserializer(data):
+            # the node JSON may still be referenced by serializations of
+            # this workflow made before the node was accessed
+            data = specs.resolve_node_json(copy.deepcopy(data))
             node = YadageNode.fromJSON(data, deserialization_opts)
             if backend:
                 # node.backend = backend
@@ -52,7 +86,10 @@ class YadageWorkflow(adage.adageobject):
         def rule_deserializer(data):
             return OffsetStage.fromJSON(data, deserialization_opts)
 
-        dag = adage.serialize.dag_from_json(data["dag"], node_deserializer)
+        dag = dag_from_json(dagdata, node_deserializer)
+        if backend:
+            for node in dag.nodes():
+                dag.getNode(node)
 
         instance = cls(
             dag=dag,
@@ -61,6 +98,7 @@ class YadageWorkflow(adage.adageobject):
             bookkeeping=data["bookkeeping"],
             stepsbystage=data["stepsbystage"],
             values=data["values"],
+            specs=specs,
         )
 
         return instance
@@ -0,0 +1,108 @@
+import collections
+import copy
+import json
+
+import adage.graph
+import adage.nodestate
+
+NodeStatus = collections.namedtuple(
+    "NodeStatus", ["state", "submit_time", "ready_by_time", "has_proxy"]
+)
+
+
+class YadageDAG(adage.graph.AdageDAG):
+    """
+    DAG that can also hold nodes in their serialized form. Such nodes are
+    only deserialized when they are first retrieved via ``getNode``, while
+    their status (state and timestamps) is available without deserialization.
+    """
+
+    # optional callable that is called with each node deserialized on access
+    materialize_hook = None
+    # optional set that records the ids of all nodes accessed
+    access_log = None
+
+    def addSerializedNode(self, identifier, data, deserializer, status):
+        """
+        add a node in serialized form
+
+        :param identifier: the node identifier
+        :param data: the node JSON, or its string encoding
+        :param deserializer: callable turning ``data`` into the node object
+        :param status: the NodeStatus of the serialized node
+        """
+        self.add_node(identifier, serialized=(data, deserializer, status))
+
+    def materialized(self, ident):
+        """
+        :return: whether the node is held as a node object
+        """
+        return "nodeobj" in self.nodes[ident]
+
+    def getNode(self, ident):
+        if self.access_log is not None:
+            self.access_log.add(ident)
+        attributes = self.nodes[ident]
+        if "nodeobj" not in attributes:
+            data, deserializer, _ = attributes.pop("serialized")
+            attributes["nodeobj"] = deserializer(data)
+            if self.materialize_hook:
+                self.materialize_hook(attributes["nodeobj"])
+        return attributes["nodeobj"]
+
+    def nodeJSON(self, ident):
+        """
+        :return: the node JSON. Nodes that were not deserialized are returned
+                 as (a copy of what) they were added, without a round-trip
+                 through the node object
+        """
+        attributes = self.nodes[ident]
+        if "nodeobj" in attributes:
+            return attributes["nodeobj"].json()
+        data = attributes["serialized"][0]
+        return json.loads(data) if isinstance(data, str) else copy.deepcopy(data)
+
+    def nodeStatus(self, ident):
+        """
+        :return: the NodeStatus of a node, without deserializing it
+        """
+        if self.access_log is not None:
+            self.access_log.add(ident)
+        attributes = self.nodes[ident]
+        if "nodeobj" not in attributes:
+            return attributes["serialized"][2]
+        node = attributes["nodeobj"]
+        return NodeStatus(
+            node.state,
+            node.submit_time,
+            node.ready_by_time,
+            node.resultproxy is not None,
+        )
+
+
+def status_from_json(nodedata):
+    """
+    :param nodedata: the JSON-serialized node
+    :return: the NodeStatus of the node
+    """
+    return NodeStatus(
+        getattr(adage.nodestate, nodedata["state"]),
+        nodedata["timestamps"]["submit"],
+        nodedata["timestamps"]["ready by"],
+        nodedata["proxy"] is not None,
+    )
+
+
+def dag_from_json(dagdata, nodedeserializer):
+    """
+    :param dagdata: the JSON-serialized DAG
+    :param nodedeserializer: callable to deserialize a single node. It is
+                             called when the node is first accessed.
+    :return: the DAG object
+    """
+    dag = YadageDAG()
+    for x in dagdata["nodes"]:
+        dag.addSerializedNode(x["id"], x, nodedeserializer, status_from_json(x))
+    for x in dagdata["edges"]:
+        dag.add_edge(x[0], x[1])
+    return dag
@@ -1,4 +1,6 @@
+import logging
 import os
+import time
 
 # import datetime
 # import time
@@ -13,6 +15,8 @@ from packtivity import datamodel
 from packtivity.backendutils import load_proxy
 from .tasks import outputReference, packtivity_task
 
+log = logging.getLogger(__name__)
+
 
 class YadageNode(adage.node.Node):
     """
@@ -39,6 +43,21 @@ class YadageNode(adage.node.Node):
             "known" if self.has_result() else "unknown",
         )
 
+    def set_status(self, state, result=None):
+        """
+        update the node from a state obtained from the backend, e.g. by a
+        bulk status query instead of ``update_state``
+
+        :param state: the node state (RUNNING, SUCCESS or FAILED)
+        :param result: the result, if the state is SUCCESS
+        """
+        self._state = state
+        if state == adage.nodestate.SUCCESS:
+            self._result = result
+        if self.ready() and not self.ready_by_time:
+            self.ready_by_time = time.time()
+            log.info("node ready %s", self)
+
     def has_result(self):
         return (self.expected_result is not None) or self.successful()
 
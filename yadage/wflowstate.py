@@ -1,7 +1,16 @@
+import copy
 import json
 import logging
+import os
+import sqlite3
 
+import adage.nodestate
+
+from .spectable import SpecTable
+from .stages import OffsetStage
 from .wflow import YadageWorkflow
+from .wflowdag import NodeStatus, YadageDAG, status_from_json
+from .wflownode import YadageNode
 from .handlers.utils import handler_decorator
 
 log = logging.getLogger(__name__)
@@ -23,6 +32,29 @@ def filebacked_model(modelsetup, modelopts, initmodel):
     return model
 
 
+@statemodel("journaled")
+def journaled_model(modelsetup, modelopts, initmodel):
+    filename = modelsetup.split(":")[-1]
+    modelopts = dict(modelopts)
+    compact_every = modelopts.pop("compact_every", 100)
+    model = JournaledModel(
+        filename=filename,
+        initmodel=initmodel,
+        deserialization_opts=modelopts,
+        compact_every=compact_every,
+    )
+    return model
+
+
+@statemodel("sqlite")
+def sqlite_model(modelsetup, modelopts, initmodel):
+    filename = modelsetup.split(":")[-1]
+    model = SQLiteBackedModel(
+        filename=filename, initmodel=initmodel, deserialization_opts=modelopts
+    )
+    return model
+
+
 @statemodel("mongo")
 def mongo_model(modelsetup, modelopts, initmodel):
     model = MongoBackedModel(initmodel=initmodel, deserialization_opts=modelopts)
@@ -37,11 +69,35 @@ def load_model_fromstring(modelsetup, modelopts=None, initmodel=None):
     raise RuntimeError("unknown state model %s" % modelsetup)
 
 
+def _file_version(filename):
+    """
+    :return: a token that changes whenever the file is rewritten or grows
+    """
+    try:
+        return _stat_version(os.stat(filename))
+    except FileNotFoundError:
+        return None
+
+
+def _stat_version(stat):
+    """
+    :param stat: the stat result of a file
+    :return: the version token of the file (see _file_version)
+    """
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
 class MongoBackedModel(object):
     """
-    model that holds the workflow state in a MongoDB database.
+    model that holds the workflow state in a MongoDB database. Rules, edges
+    and index structures live in the workflow document and are updated
+    field-by-field, while each node is a separate document in a side
+    collection. Commits only write what changed and loads only deserialize
+    nodes when they are accessed.
     """
 
+    index_fields = ["bookkeeping", "stepsbystage", "values", "specs"]
+
     def __init__(
         self,
         deserialization_opts=None,
@@ -56,27 +112,216 @@ class MongoBackedModel(object):
         self.client = MongoClient(connect_string)
         self.db = self.client.wflowdb
         self.collection = self.db.workflows
+        self.nodes = self.db.workflow_nodes
+        self.nodes.create_index([("wflowid", 1), ("nodeid", 1)], unique=True)
+        self.committed = None
         if initmodel:
-            insertion = self.collection.insert_one(initmodel.json())
+            insertion = self.collection.insert_one({})
             self.wflowid = insertion.inserted_id
+            self.committed = self.read_committed({})
+            self.commit(initmodel)
             log.info("created new workflow object with id %s", str(self.wflowid))
         if wflowid:
             self.wflowid = ObjectId(wflowid)
 
+    def read_committed(self, doc):
+        """
+        :param doc: the workflow document
+        :return: the serialized state as it is currently stored
+        """
+        committed = {
+            "legacy": "dag" in doc,
+            "nodes": {},
+            "positions": {},
+            "edges": set(),
+            "rules": {},
+            "order": {},
+            "index": {},
+        }
+        if committed["legacy"] or "_id" not in doc:
+            # nothing stored in the split layout yet, the next commit writes all
+            return committed
+
+        for nodedoc in self.nodes.find({"wflowid": self.wflowid}).sort("position"):
+            committed["nodes"][nodedoc["nodeid"]] = nodedoc["data"]
+            committed["positions"][nodedoc["nodeid"]] = nodedoc["position"]
+        committed["edges"] = set(tuple(e) for e in doc.get("edges", []))
+        committed["rules"] = doc.get("ruledata", {})
+        committed["order"] = {
+            "rules": doc.get("rule_order", []),
+            "applied": doc.get("applied_order", []),
+        }
+        committed["index"] = {k: doc[k] for k in self.index_fields if k in doc}
+        return committed
+
     def commit(self, data):
         """
-        :param data: data to commit to disk. needs to have '.json()' method
-        return: None
+        :param data: the workflow object to commit
+        :return: the revision written by this commit, None if nothing changed
         """
-        self.collection.replace_one({"_id": self.wflowid}, data.json())
+        from pymongo import DeleteOne, ReturnDocument, UpdateOne
+
+        log.debug("committing model")
+        if self.committed is None:
+            self.committed = self.read_committed(
+                self.collection.find_one({"_id": self.wflowid})
+            )
+        committed = self.committed
+        dag = data.dag
+
+        nodes, removed_nodes = _changed_nodes(data, committed["nodes"], copy.deepcopy)
+        next_position = max(committed["positions"].values(), default=-1) + 1
+        positions = {}
+        for n in nodes:
+            if n in committed["positions"]:
+                continue
+            positions[n] = next_position
+            next_position += 1
+        requests = [
+            DeleteOne({"wflowid": self.wflowid, "nodeid": n}) for n in removed_nodes
+        ]
+        requests += [
+            UpdateOne(
+                {"wflowid": self.wflowid, "nodeid": n},
+                {
+                    "$set": {
+                        "position": positions.get(n, committed["positions"].get(n)),
+                        "data": nodedata,
+                    }
+                },
+                upsert=True,
+            )
+            for n, nodedata in nodes.items()
+        ]
+
+        to_set, to_unset = {}, {}
+        rules = {}
+        for rule in data.rules + data.applied_rules:
+            ruledata = rule.json()
+            if committed["rules"].get(rule.identifier) != ruledata:
+                rules[rule.identifier] = ruledata
+                to_set["ruledata.{}".format(rule.identifier)] = ruledata
+        ruleids = set(r.identifier for r in data.rules + data.applied_rules)
+        removed_rules = [r for r in committed["rules"] if r not in ruleids]
+        for r in removed_rules:
+            to_unset["ruledata.{}".format(r)] = ""
+
+        order = {
+            "rules": [r.identifier for r in data.rules],
+            "applied": [r.identifier for r in data.applied_rules],
+        }
+        if committed["order"] != order:
+            to_set["rule_order"] = order["rules"]
+            to_set["applied_order"] = order["applied"]
+
+        index = {}
+        for name in self.index_fields:
+            value = data.specs.json() if name == "specs" else getattr(data, name)
+            if committed["index"].get(name) != value:
+                index[name] = copy.deepcopy(value)
+                to_set[name] = index[name]
+
+        if committed["legacy"]:
+            # migrate documents that hold the full workflow JSON
+            to_unset.update(dag="", rules="", applied="")
+
+        edges = set(dag.edges())
+        added_edges = [list(e) for e in edges - committed["edges"]]
+        removed_edges = [list(e) for e in committed["edges"] - edges]
+
+        if requests:
+            self.nodes.bulk_write(requests, ordered=False)
+        selector = {"_id": self.wflowid}
+        if removed_edges:
+            self.collection.update_one(
+                selector, {"$pull": {"edges": {"$in": removed_edges}}}
+            )
+        update = {}
+        if to_set:
+            update["$set"] = to_set
+        if to_unset:
+            update["$unset"] = to_unset
+        if added_edges:
+            update["$push"] = {"edges": {"$each": added_edges}}
+        revision = None
+        if update or requests or removed_edges:
+            # bump the revision last, once all of the commit is written, and
+            # read it back atomically with the update
+            update["$inc"] = {"revision": 1}
+            doc = self.collection.find_one_and_update(
+                selector,
+                update,
+                projection={"revision": True},
+                return_document=ReturnDocument.AFTER,
+            )
+            revision = doc["revision"]
+
+        for n in removed_nodes:
+            committed["nodes"].pop(n)
+            committed["positions"].pop(n)
+        committed["nodes"].update(nodes)
+        committed["positions"].update(positions)
+        committed["edges"] = edges
+        for r in removed_rules:
+            committed["rules"].pop(r)
+        committed["rules"].update(rules)
+        committed["order"] = order
+        committed["index"].update(index)
+        committed["legacy"] = False
+        return revision
+
+    def version(self):
+        """
+        :return: the revision number, incremented by each commit that changes
+                 state. None if the workflow is not stored.
+        """
+        doc = self.collection.find_one({"_id": self.wflowid}, {"revision": True})
+        if doc is None:
+            return None
+        return doc.get("revision", 0)
 
     def load(self):
         """
-        param load: load data from database
-        return: yadage workflow object
+        :return: the workflow object. Nodes are deserialized on first access.
         """
-        jsondata = self.collection.find_one({"_id": self.wflowid})
-        return YadageWorkflow.fromJSON(jsondata, self.deserialization_opts)
+        log.debug("loading model")
+        doc = self.collection.find_one({"_id": self.wflowid})
+        self.committed = self.read_committed(doc)
+        if self.committed["legacy"]:
+            return YadageWorkflow.fromJSON(doc, self.deserialization_opts)
+
+        index = copy.deepcopy(self.committed["index"])
+        specs = SpecTable(index.get("specs"))
+
+        def node_deserializer(data):
+            data = specs.resolve_node_json(copy.deepcopy(data))
+            return YadageNode.fromJSON(data, self.deserialization_opts)
+
+        def rule_deserializer(identifier):
+            return OffsetStage.fromJSON(
+                copy.deepcopy(self.committed["rules"][identifier]),
+                self.deserialization_opts,
+            )
+
+        dag = YadageDAG()
+        for ident, nodedata in self.committed["nodes"].items():
+            dag.addSerializedNode(
+                ident, nodedata, node_deserializer, status_from_json(nodedata)
+            )
+        for parent, child in doc.get("edges", []):
+            dag.add_edge(parent, child)
+
+        return YadageWorkflow(
+            dag=dag,
+            rules=[rule_deserializer(r) for r in self.committed["order"]["rules"]],
+            applied_rules=[
+                rule_deserializer(r) for r in self.committed["order"]["applied"]
+            ],
+            bookkeeping=index.get("bookkeeping"),
+            stepsbystage=index.get("stepsbystage"),
+            values=index.get("values"),
+            specs=specs,
+        )
 
 
 class FileBackedModel(object):
@@ -93,12 +338,21 @@ class FileBackedModel(object):
     def commit(self, data):
         """
         :param data: data to commit to disk. needs to have '.json()' method
+        :return: the version token of the written state
         """
         log.debug("committing model")
         jsondata = data.json()
 
-        with open(self.filename, "w") as statefile:
+        # replace rather than rewrite the file, so that readers never see a
+        # partially written state and each commit changes the version token
+        tmpfile = "{}.tmp".format(self.filename)
+        with open(tmpfile, "w") as statefile:
             json.dump(jsondata, statefile)
+        # the token is taken before the file becomes visible, so that it
+        # cannot be that of a concurrent commit (a rename keeps it)
+        version = _file_version(tmpfile)
+        os.replace(tmpfile, self.filename)
+        return version
 
     def load(self):
         """
@@ -108,3 +362,459 @@ class FileBackedModel(object):
         with open(self.filename) as statefile:
             jsondata = json.load(statefile)
             return YadageWorkflow.fromJSON(jsondata, self.deserialization_opts)
+
+    def version(self):
+        """
+        :return: a token that changes whenever the state is committed
+        """
+        return _file_version(self.filename)
+
+
+def _split_state(jsondata):
+    """
+    split a serialized workflow into individually addressable parts, i.e.
+    nodes and rules keyed by their identifiers, the DAG edges, the order of
+    the rule lists and the remaining index structures (bookkeeping etc)
+    """
+    rules = jsondata["rules"] + jsondata["applied"]
+    return {
+        "nodes": {n["id"]: n for n in jsondata["dag"]["nodes"]},
+        "edges": [list(e) for e in jsondata["dag"]["edges"]],
+        "rules": {r["id"]: r for r in rules},
+        "order": {
+            "rules": [r["id"] for r in jsondata["rules"]],
+            "applied": [r["id"] for r in jsondata["applied"]],
+        },
+        "index": {
+            k: v for k, v in jsondata.items() if k not in ["dag", "rules", "applied"]
+        },
+    }
+
+
+def _join_state(parts):
+    """
+    reassemble a serialized workflow from its parts (see _split_state)
+    """
+    jsondata = {
+        "dag": {"nodes": list(parts["nodes"].values()), "edges": parts["edges"]},
+        "rules": [parts["rules"][x] for x in parts["order"]["rules"]],
+        "applied": [parts["rules"][x] for x in parts["order"]["applied"]],
+    }
+    jsondata.update(**parts["index"])
+    return jsondata
+
+
+def _workflow_delta(old, wflow):
+    """
+    compute the changes of a workflow against its committed split state.
+    Only nodes that were deserialized since the last commit are serialized
+    (see _changed_nodes).
+
+    :param old: the previously committed parts
+    :param wflow: the workflow object to be committed
+    :return: a delta record (empty if nothing changed). Values in the record
+             are copies, so it can be applied to ``old`` without aliasing the
+             workflow
+    """
+    delta = {}
+    nodes, removed_nodes = _changed_nodes(wflow, old["nodes"], copy.deepcopy)
+
+    rulejson = {}
+    for rule in wflow.rules + wflow.applied_rules:
+        rulejson[rule.identifier] = rule.json()
+    rules = {k: v for k, v in rulejson.items() if old["rules"].get(k) != v}
+    removed_rules = [k for k in old["rules"] if k not in rulejson]
+    order = {
+        "rules": [r.identifier for r in wflow.rules],
+        "applied": [r.identifier for r in wflow.applied_rules],
+    }
+
+    new_edges = list(wflow.dag.edges())
+    old_edges = set(map(tuple, old["edges"]))
+    added_edges = [list(e) for e in new_edges if tuple(e) not in old_edges]
+    new_edges = set(map(tuple, new_edges))
+    removed_edges = [list(e) for e in old["edges"] if tuple(e) not in new_edges]
+
+    index = {}
+    for name in ["bookkeeping", "stepsbystage", "values", "specs"]:
+        value = wflow.specs.json() if name == "specs" else getattr(wflow, name)
+        if old["index"].get(name) != value:
+            index[name] = value
+
+    if nodes:
+        delta["nodes"] = nodes
+    if removed_nodes:
+        delta["removed_nodes"] = removed_nodes
+    if rules:
+        delta["rules"] = rules
+    if removed_rules:
+        delta["removed_rules"] = removed_rules
+    if added_edges:
+        delta["added_edges"] = added_edges
+    if removed_edges:
+        delta["removed_edges"] = removed_edges
+    if old["order"] != order:
+        delta["order"] = order
+    if index:
+        delta["index"] = index
+    return copy.deepcopy(delta)
+
+
+def _apply_delta(parts, delta):
+    """
+    apply a delta record (see _workflow_delta) in-place to split workflow state
+    """
+    for k in delta.get("removed_nodes", []):
+        parts["nodes"].pop(k, None)
+    parts["nodes"].update(delta.get("nodes", {}))
+    for k in delta.get("removed_rules", []):
+        parts["rules"].pop(k, None)
+    parts["rules"].update(delta.get("rules", {}))
+
+    removed_edges = set(map(tuple, delta.get("removed_edges", [])))
+    edges = [e for e in parts["edges"] if tuple(e) not in removed_edges]
+    existing_edges = set(map(tuple, edges))
+    edges += [e for e in delta.get("added_edges", []) if tuple(e) not in existing_edges]
+    parts["edges"] = edges
+
+    if "order" in delta:
+        parts["order"] = delta["order"]
+    parts["index"].update(delta.get("index", {}))
+    return parts
+
+
+def _changed_nodes(wflow, committed, serializer):
+    """
+    find the nodes of a workflow DAG that differ from their committed
+    serialization. Nodes that were committed and never deserialized are
+    unchanged by construction and are skipped.
+
+    :param wflow: the workflow object
+    :param committed: dict of node ids to their committed serialization
+    :param serializer: callable turning the node JSON into its serialization
+    :return: tuple of (dict of changed node ids to serialization, removed ids)
+    """
+    dag = wflow.dag
+    nodes = {}
+    for n in dag.nodes():
+        if n in committed and not dag.materialized(n):
+            continue
+        serialized = serializer(wflow.nodeJSON(n))
+        if committed.get(n) != serialized:
+            nodes[n] = serialized
+    removed_nodes = [n for n in committed if n not in dag]
+    return nodes, removed_nodes
+
+
+class JournaledModel(object):
+    """
+    model that holds data on disk as a JSON snapshot and an append-only
+    journal of per-transaction changes. The journal is compacted into a
+    new snapshot every ``compact_every`` records.
+    """
+
+    def __init__(
+        self, filename, deserialization_opts=None, initmodel=None, compact_every=100
+    ):
+        self.filename = filename
+        self.journalfile = "{}.journal".format(filename)
+        self.deserialization_opts = deserialization_opts
+        self.compact_every = compact_every
+        self.nrecords = 0
+        self.committed = None
+        self.snapshot_version = None
+        if initmodel:
+            self.compact(copy.deepcopy(_split_state(initmodel.json())))
+
+    def compact(self, parts):
+        """
+        write a full snapshot and truncate the journal
+
+        :param parts: the split workflow state to snapshot
+        :return: the version token of the written state
+        """
+        log.debug("compacting journal into snapshot")
+        tmpfile = "{}.tmp".format(self.filename)
+        with open(tmpfile, "w") as statefile:
+            json.dump(_join_state(parts), statefile)
+        self.snapshot_version = _file_version(tmpfile)
+        os.replace(tmpfile, self.filename)
+        with open(self.journalfile, "w") as journal:
+            journal_version = _stat_version(os.fstat(journal.fileno()))
+        self.nrecords = 0
+        self.committed = parts
+        return (self.snapshot_version, journal_version)
+
+    def commit(self, data):
+        """
+        :param data: data to commit to disk. needs to have '.json()' method
+        :return: the version token of the written state, None if nothing changed
+        """
+        log.debug("committing model")
+        if self.committed is None:
+            return self.compact(copy.deepcopy(_split_state(data.json())))
+
+        delta = _workflow_delta(self.committed, data)
+        if not delta:
+            log.debug("nothing changed, skipping commit")
+            return None
+
+        self.nrecords += 1
+        delta["seq"] = self.nrecords
+        with open(self.journalfile, "a") as journal:
+            journal.write(json.dumps(delta, separators=(",", ":")) + "\n")
+            journal.flush()
+            journal_version = _stat_version(os.fstat(journal.fileno()))
+        _apply_delta(self.committed, delta)
+        if self.nrecords >= self.compact_every:
+            return self.compact(self.committed)
+        return (self.snapshot_version, journal_version)
+
+    def load(self):
+        """
+        :return: the adage workflow object holding rules and the graph
+        """
+        log.debug("loading model")
+        with open(self.filename) as statefile:
+            self.snapshot_version = _stat_version(os.fstat(statefile.fileno()))
+            parts = _split_state(json.load(statefile))
+
+        self.nrecords = 0
+        if os.path.exists(self.journalfile):
+            with open(self.journalfile) as journal:
+                lines = journal.readlines()
+            for i, line in enumerate(lines):
+                try:
+                    delta = json.loads(line)
+                except ValueError:
+                    # only the last record may be incomplete, from an
+                    # interrupted commit
+                    if i != len(lines) - 1:
+                        raise RuntimeError(
+                            "corrupt journal record {} in {}".format(
+                                i + 1, self.journalfile
+                            )
+                        )
+                    log.warning("ignoring incomplete journal record")
+                    break
+                if delta.get("seq") != self.nrecords + 1:
+                    raise RuntimeError(
+                        "journal {} out of sequence: expected record {}, got {}".format(
+                            self.journalfile, self.nrecords + 1, delta.get("seq")
+                        )
+                    )
+                _apply_delta(parts, delta)
+                self.nrecords += 1
+
+        self.committed = parts
+        jsondata = copy.deepcopy(_join_state(parts))
+        return YadageWorkflow.fromJSON(jsondata, self.deserialization_opts)
+
+    def version(self):
+        """
+        :return: a token that changes whenever the state is committed
+        """
+        return (_file_version(self.filename), _file_version(self.journalfile))
+
+
+class SQLiteBackedModel(object):
+    """
+    model that holds the workflow state in a SQLite database with one row
+    per node, edge, rule and index structure. Commits only write rows that
+    changed and loads only deserialize nodes when they are accessed.
+    """
+
+    schema = [
+        """CREATE TABLE IF NOT EXISTS nodes (
+            id TEXT PRIMARY KEY, state TEXT, submit_time REAL,
+            ready_by_time REAL, has_proxy INTEGER, data TEXT)""",
+        """CREATE TABLE IF NOT EXISTS edges (
+            parent TEXT, child TEXT, PRIMARY KEY (parent, child))""",
+        """CREATE TABLE IF NOT EXISTS rules (
+            id TEXT PRIMARY KEY, applied INTEGER, position INTEGER, data TEXT)""",
+        """CREATE TABLE IF NOT EXISTS indices (name TEXT PRIMARY KEY, data TEXT)""",
+        """CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)""",
+        """INSERT OR IGNORE INTO meta VALUES ('revision', 0)""",
+    ]
+
+    def __init__(self, filename, deserialization_opts=None, initmodel=None):
+        self.filename = filename
+        self.deserialization_opts = deserialization_opts
+        self.connection = sqlite3.connect(filename)
+        with self.connection:
+            for statement in self.schema:
+                self.connection.execute(statement)
+        self.committed = self.read_committed()
+        if initmodel:
+            self.commit(initmodel)
+
+    def read_committed(self):
+        """
+        :return: the serialized rows as they are currently stored
+        """
+        c = self.connection
+        return {
+            "nodes": {
+                k: v for k, v in c.execute("SELECT id, data FROM nodes ORDER BY rowid")
+            },
+            "edges": set(c.execute("SELECT parent, child FROM edges")),
+            "rules": {
+                k: (applied, position, data)
+                for k, applied, position, data in c.execute(
+                    "SELECT id, applied, position, data FROM rules"
+                )
+            },
+            "indices": {k: v for k, v in c.execute("SELECT name, data FROM indices")},
+        }
+
+    def commit(self, data):
+        """
+        :param data: the workflow object to commit
+        :return: the revision written by this commit, None if nothing changed
+        """
+        log.debug("committing model")
+        committed = self.committed
+        dag = data.dag
+
+        nodes, removed_nodes = _changed_nodes(data, committed["nodes"], json.dumps)
+
+        edges = set(dag.edges())
+
+        rules = {}
+        for applied, rulelist in enumerate([data.rules, data.applied_rules]):
+            for position, rule in enumerate(rulelist):
+                row = (applied, position, json.dumps(rule.json()))
+                if committed["rules"].get(rule.identifier) != row:
+                    rules[rule.identifier] = row
+        ruleids = set(r.identifier for r in data.rules + data.applied_rules)
+        removed_rules = [r for r in committed["rules"] if r not in ruleids]
+
+        indices = {}
+        for name in ["bookkeeping", "stepsbystage", "values", "specs"]:
+            value = data.specs.json() if name == "specs" else getattr(data, name)
+            serialized = json.dumps(value)
+            if committed["indices"].get(name) != serialized:
+                indices[name] = serialized
+
+        changed = any(
+            [nodes, removed_nodes, rules, removed_rules, indices]
+            + [edges != committed["edges"]]
+        )
+        with self.connection as c:
+            c.executemany(
+                "DELETE FROM nodes WHERE id = ?", [(n,) for n in removed_nodes]
+            )
+            # update in place, as a replaced row would move to the end of the
+            # rowid order the nodes are loaded in
+            c.executemany(
+                """INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    state = excluded.state,
+                    submit_time = excluded.submit_time,
+                    ready_by_time = excluded.ready_by_time,
+                    has_proxy = excluded.has_proxy,
+                    data = excluded.data""",
+                [
+                    (k,) + tuple(self.node_status(dag, k)) + (v,)
+                    for k, v in nodes.items()
+                ],
+            )
+            c.executemany(
+                "DELETE FROM edges WHERE parent = ? AND child = ?",
+                committed["edges"] - edges,
+            )
+            c.executemany("INSERT INTO edges VALUES (?, ?)", edges - committed["edges"])
+            c.executemany(
+                "DELETE FROM rules WHERE id = ?", [(r,) for r in removed_rules]
+            )
+            c.executemany(
+                "INSERT OR REPLACE INTO rules VALUES (?, ?, ?, ?)",
+                [(k,) + v for k, v in rules.items()],
+            )
+            c.executemany(
+                "INSERT OR REPLACE INTO indices VALUES (?, ?)", indices.items()
+            )
+            revision = None
+            if changed:
+                c.execute("UPDATE meta SET value = value + 1 WHERE name = 'revision'")
+                # read within the write transaction, so that it is our revision
+                revision = c.execute(
+                    "SELECT value FROM meta WHERE name = 'revision'"
+                ).fetchone()[0]
+
+        for n in removed_nodes:
+            committed["nodes"].pop(n)
+        committed["nodes"].update(nodes)
+        committed["edges"] = edges
+        for r in removed_rules:
+            committed["rules"].pop(r)
+        committed["rules"].update(rules)
+        committed["indices"].update(indices)
+        return revision
+
+    def version(self):
+        """
+        :return: the revision number, incremented by each commit that changes state
+        """
+        return self.connection.execute(
+            "SELECT value FROM meta WHERE name = 'revision'"
+        ).fetchone()[0]
+
+    @staticmethod
+    def node_status(dag, ident):
+        status = dag.nodeStatus(ident)
+        return (
+            str(status.state),
+            status.submit_time,
+            status.ready_by_time,
+            status.has_proxy,
+        )
+
+    def load(self):
+        """
+        :return: the workflow object. Nodes are deserialized on first access.
+        """
+        log.debug("loading model")
+        self.committed = self.read_committed()
+        indices = {k: json.loads(v) for k, v in self.committed["indices"].items()}
+        specs = SpecTable(indices.get("specs"))
+
+        def node_deserializer(data):
+            data = specs.resolve_node_json(json.loads(data))
+            return YadageNode.fromJSON(data, self.deserialization_opts)
+
+        dag = YadageDAG()
+        for row in self.connection.execute(
+            "SELECT id, state, submit_time, ready_by_time, has_proxy FROM nodes ORDER BY rowid"
+        ):
+            ident, state, submit_time, ready_by_time, has_proxy = row
+            status = NodeStatus(
+                getattr(adage.nodestate, state),
+                submit_time,
+                ready_by_time,
+                bool(has_proxy),
+            )
+            dag.addSerializedNode(
+                ident, self.committed["nodes"][ident], node_deserializer, status
+            )
+        for parent, child in self.committed["edges"]:
+            dag.add_edge(parent, child)
+
+        rules = sorted(self.committed["rules"].values())
+        return YadageWorkflow(
+            dag=dag,
+            rules=[
+                OffsetStage.fromJSON(json.loads(data), self.deserialization_opts)
+                for applied, _, data in rules
+                if not applied
+            ],
+            applied_rules=[
+                OffsetStage.fromJSON(json.loads(data), self.deserialization_opts)
+                for applied, _, data in rules
+                if applied
+            ],
+            bookkeeping=indices.get("bookkeeping"),
+            stepsbystage=indices.get("stepsbystage"),
+            values=indices.get("values"),
+            specs=specs,
+        )
@@ -1,10 +1,9 @@
 import logging
 
-import jsonpath_rw
 from jsonpointer import JsonPointer
 
 from .stages import JsonStage, OffsetStage
-from .utils import get_obj_id, init_stage_spec
+from .utils import get_obj_id, init_stage_spec, jsonpath_parse
 from .wflownode import YadageNode
 
 log = logging.getLogger(__name__)
@@ -38,7 +37,7 @@ class WorkflowView(object):
         """
         :return
         """
-        matches = jsonpath_rw.parse(query).find(collection)
+        matches = jsonpath_parse(query).find(collection)
         return matches
 
     def getScopes(self, query):
@@ -138,10 +137,12 @@ class WorkflowView(object):
         createOffsetMeta(thisoffset.path, self.bookkeeper)
 
         offsetstage = OffsetStage(rule, self._makeoffset(offset), identifier=identifier)
+        self.wflow.rule_index.changed(offsetstage.offset)
         self.rules += [offsetstage]
         thisoffset.resolve(self.bookkeeper)["_meta"]["stages"] += [
             offsetstage.identifier
         ]
+        self.wflow.scope_index.rule_added(offsetstage.offset, offsetstage.identifier)
         return offsetstage.identifier
 
     def addValue(self, key, value):
@@ -149,11 +150,39 @@ class WorkflowView(object):
         if key in v:
             raise RuntimeError("cannot overwrite value")
         v[key] = value
+        self.wflow.rule_index.changed(self.offset)
 
     def getValue(self, key):
         return self.values.setdefault("_values", {}).get(key)
 
-    def addStep(self, task, stage, depends_on=None):
+    def reserveSteps(self, stage, nsteps, openended=False):
+        """
+        reserve positions for steps that a stage will add later on (e.g. when
+        pipelining). Reserved positions are filled by addStep.
+
+        :param stage: the stage name
+        :param nsteps: number of steps to reserve
+        :param openended: whether the stage adds an unknown number of further
+                          steps (to be appended after releasing the positions)
+        """
+        reserved = {"_reserved": True}
+        if openended:
+            reserved["_openended"] = True
+        self.steps.setdefault(stage, []).extend(dict(reserved) for i in range(nsteps))
+        self.wflow.rule_index.changed(self.offset)
+
+    def releaseSteps(self, stage):
+        """
+        drop the trailing reserved positions of a stage
+
+        :param stage: the stage name
+        """
+        steps = self.steps.get(stage, [])
+        while steps and "_reserved" in steps[-1]:
+            steps.pop()
+        self.wflow.rule_index.changed(self.offset)
+
+    def addStep(self, task, stage, depends_on=None, index=None):
         """
         adds a node to the DAG connecting it to the passed depending nodes
         while tracking that it was added by the specified stage
@@ -161,19 +190,33 @@ class WorkflowView(object):
         :param task: the task object for the step
         :param stage: the stage name
         :param depends_on: dependencies of this step
+        :param index: a reserved position of the stage to fill with the step.
+                      If None, the step is appended to the stage.
         """
 
         self.steps.setdefault(stage, [])
-        node = YadageNode(task.metadata["name"], task, identifier=get_obj_id(task))
-        node.task.metadata["wflow_node_id"] = node.identifier
-        node.task.metadata["wflow_offset"] = self.offset
-        node.task.metadata["wflow_stage"] = stage
-        node.task.metadata["wflow_stage_node_idx"] = len(self.steps[stage])
-        node.task.metadata["wflow_hints"] = {"is_purepub": task.pubOnlyTask()}
+        if index is None:
+            index = len(self.steps[stage])
+            self.steps[stage].append(None)
+        elif "_reserved" not in self.steps[stage][index]:
+            raise RuntimeError(
+                "position {} of stage {} is not reserved".format(index, stage)
+            )
+        # steps with the same spec share it
+        _, task.spec = self.wflow.specs.intern(task.spec)
+        node = YadageNode(task.name, task, identifier=get_obj_id(task))
+        task.node_id = node.identifier
+        task.offset = self.offset
+        task.stage = stage
+        task.stage_node_idx = index
+        task.is_purepub = task.pubOnlyTask()
 
         self.dag.addNode(node, depends_on=depends_on)
-        self.steps[stage].append({"_nodeid": node.identifier})
+        self.steps[stage][index] = {"_nodeid": node.identifier}
         self.bookkeeper["_meta"]["steps"] += [node.identifier]
+        self.wflow.rule_index.changed(self.offset)
+        self.wflow.scope_index.step_added(self.offset, node.identifier)
+        self.wflow.ready_queue.node_added(node.identifier)
         log.info("added %s", node)
         return node
 
@@ -192,6 +235,7 @@ class WorkflowView(object):
 
             self.steps.setdefault(stage, []).append({})
             self.values.setdefault(stage, []).append({})
+            self.wflow.rule_index.changed(self.offset)
 
         for rule in rules:
             self.addRule(rule, offset)
@@ -1,4 +1,103 @@
 import yadageschemas
+from jsonschema import Draft4Validator, validators
+from yadageschemas.dialects.raw_with_defaults import DefaultValidatingDraft4Validator
+from yadageschemas.utils import schema_and_refresolver, schemabase_uri
+
+# properties of the multistep-stage scheduler that yadage supports on top of
+# the yadage-schemas definition
+STREAMING_PROPERTIES = {
+    "pipeline": {"type": "boolean"},
+    "window": {"type": "integer", "minimum": 1},
+    "autobatch": {"type": "number", "minimum": 0, "exclusiveMinimum": True},
+}
+
+TREEREDUCE_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-04/schema#",
+    "type": "object",
+    "title": "Tree Reduction Scheduler",
+    "additionalProperties": False,
+    "properties": {
+        "scheduler_type": {"type": "string", "enum": ["treereduce-stage"]},
+        "parameters": {"$ref": "parameterselection.json"},
+        "register_values": {"$ref": "value_registration.json"},
+        "step": {"$ref": "../../packtivity/packtivity-schema.json"},
+        "reduce": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "parameter": {"type": "string"},
+                "fanin": {"type": "integer", "minimum": 2},
+                "output": {"type": "string"},
+            },
+            "required": ["parameter", "fanin"],
+        },
+    },
+    "required": ["scheduler_type", "step", "reduce"],
+}
+
+
+def schema_overlay(schemadir):
+    """
+    the yadage-schemas definitions extended by the scheduler options of yadage
+    (streaming multistep stages and tree reductions)
+
+    :param schemadir: the schema directory
+    :return: dict of schema URIs to the schemas replacing them
+    """
+    schemabase = schemabase_uri(schemadir)
+    stage, _ = schema_and_refresolver("yadage/stage-schema", schemadir)
+    stage["properties"]["scheduler"]["oneOf"].append(
+        {"$ref": "scheduler/treereduce-stage-schema.json#"}
+    )
+    multistep, _ = schema_and_refresolver(
+        "yadage/scheduler/multistep-stage-schema", schemadir
+    )
+    multistep["properties"].update(STREAMING_PROPERTIES)
+    return {
+        "{}/yadage/stage-schema.json".format(schemabase): stage,
+        "{}/yadage/scheduler/multistep-stage-schema.json".format(schemabase): multistep,
+        "{}/yadage/scheduler/treereduce-stage-schema.json".format(
+            schemabase
+        ): TREEREDUCE_SCHEMA,
+    }
+
+
+def extend_with_treereduce(validator_class):
+    """
+    :return: validator class that also brings the parameters of tree reductions
+             into their array form
+    """
+    set_defaults = validator_class.VALIDATORS["properties"]
+
+    def properties(validator, properties, instance, schema):
+        if schema.get("title") == TREEREDUCE_SCHEMA["title"] and isinstance(
+            instance.get("parameters"), dict
+        ):
+            asarray = []
+            for k, v in instance["parameters"].items():
+                if type(v) == dict and any(x in v for x in ["steps", "stages", "step"]):
+                    v["expression_type"] = "stage-output-selector"
+                asarray.append({"key": k, "value": v})
+            instance["parameters"] = asarray
+        for error in set_defaults(validator, properties, instance, schema):
+            yield error
+
+    extended = validators.extend(validator_class, {"properties": properties})
+    extended.validate = validator_class.validate
+    return extended
+
+
+DefaultValidator = extend_with_treereduce(DefaultValidatingDraft4Validator)
+
+
+def validator(schema_name, schemadir, validator_class=Draft4Validator):
+    """
+    :return: validator of the schema, resolving the references to the
+             extended schemas
+    """
+    schema, resolver = schema_and_refresolver(schema_name, schemadir)
+    resolver.store.update(schema_overlay(schemadir))
+    return validator_class(schema, resolver=resolver)
 
 
 def workflow(
@@ -24,15 +123,17 @@ def workflow(
         "schemadir": schemadir,
         "load_as_ref": False,
     }
-    validopts = {"schema_name": schema_name, "schemadir": schemadir}
 
-    data = yadageschemas.load(
-        spec, specopts, validate=True, validopts=validopts, dialect=dialect
-    )
+    data = yadageschemas.load(spec, specopts, validate=False, dialect=dialect)
+    if dialect == "raw_with_defaults":
+        # the dialect sets the defaults of the plain yadage-schemas, this sets
+        # those of the schedulers yadage extends them with
+        validator(schema_name, schemadir, DefaultValidator).validate(data)
+    if validate:
+        validator(schema_name, schemadir).validate(data)
     return data
 
 
 def validate(data, schema_name="yadage/workflow-schema", schemadir=None):
     """validate workflow data"""
-    validopts = {"schema_name": schema_name, "schemadir": schemadir}
-    yadageschemas.validate_spec(data, validopts)
+    validator(schema_name, schemadir).validate(data)